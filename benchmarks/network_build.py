@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+# benchmark of network building: build time, time until the networkx graph exists, and peak RSS per depth
+#
+# Each depth is built in a fresh process (peak RSS cannot be reset), on the synthetic SQLite database of
+# tests/synthetic_db.py. To compare with another revision, check it out next to this one and pass it with --tree:
+#   git worktree add /tmp/before <revision>
+#   python benchmarks/network_build.py --tree /tmp/before
+#   python benchmarks/network_build.py
+
+from __future__ import print_function
+
+import os, sys
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+
+root = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+
+clp = argparse.ArgumentParser( description = "time network builds and measure their peak memory at several depths" )
+clp.add_argument( '-d', '--depths', metavar = "N", help = "shell depths to build (default: 1 2 3)", type = int, nargs = '+', default = [ 1, 2, 3 ] )
+clp.add_argument( '--tree', metavar = "DIR", help = "build with the miRNexpander package of this checkout (default: this one)", default = root )
+clp.add_argument( '--db', metavar = "FILE", help = "synthetic SQLite database (created if missing; default: a temporary file)" )
+clp.add_argument( '--config', metavar = "CONFIG_FILE", help = "configuration to base the database configuration on (default: setup.cfg.template)" )
+clp.add_argument( '--worker', metavar = "DEPTH", help = argparse.SUPPRESS, type = int )
+parameters = clp.parse_args( )
+
+
+def worker( depth, config ):
+    """build one network in this process and print its measurements"""
+
+    sys.path.insert( 0, os.path.abspath( parameters.tree ) )
+    import ConfigParser
+    from miRNexpander.DatabaseTools.DatabaseHandler import DatabaseHandler
+    from miRNexpander.NetworkTools.NetworkCreator import NetworkCreator
+    sys.path.insert( 1, os.path.join( root, "tests" ) )
+    import synthetic_db
+
+    conf = ConfigParser.ConfigParser( )
+    conf.readfp( open( config ) )
+    dh = DatabaseHandler( )
+    dh.connect( conf )
+    nc = NetworkCreator( dh )
+    nc.setName( "benchmark" )
+    start = time.time( )
+    nc.createNetwork( synthetic_db.seeds( ), depth )  # the configuration disables the build cache
+    build = time.time( ) - start
+    rss_build = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss / 1024.
+    g = nc.getGraph( ) if hasattr( nc, "getGraph" ) else nc.graph  # older revisions build the networkx graph directly
+    total = time.time( ) - start
+    print( "depth {:d}: {:d} nodes, {:d} edges, build {:.2f} s, with graph {:.2f} s, peak RSS after build {:.0f} MB, at the end {:.0f} MB" . format(
+            depth, g.number_of_nodes( ), g.number_of_edges( ), build, total, rss_build, resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss / 1024. ) )
+
+
+if parameters.worker != None:
+    worker( parameters.worker, parameters.config )
+    sys.exit( 0 )
+
+sys.path.insert( 0, os.path.join( root, "tests" ) )
+import synthetic_db
+
+workdir = tempfile.mkdtemp( prefix = "network_build_" )
+db = parameters.db or os.path.join( workdir, "synthetic.sqlite" )
+config = os.path.join( workdir, "benchmark.cfg" )
+conf = synthetic_db.write_config( config, os.path.abspath( db ), parameters.config or synthetic_db.template )
+if not os.path.exists( db ):
+    print( "Creating the synthetic database {!r}..." . format( db ), file = sys.stderr )
+synthetic_db.create_database( conf )
+
+print( "miRNexpander in {!r}, database {!r}" . format( os.path.abspath( parameters.tree ), db ) )
+with open( os.devnull, "w" ) as devnull:  # progress messages go to STDOUT as well
+    for depth in parameters.depths:
+        out = subprocess.check_output( [ sys.executable, os.path.abspath( __file__ ), "--worker", str( depth ), "--config", config, "--tree", parameters.tree ], stderr = devnull )
+        print( [  l for l in out.splitlines( ) if l.startswith( "depth " )  ][ -1 ] )
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+# scaling benchmark of query_for_references on the synthetic SQLite database of tests/synthetic_db.py: the whole lookup of
+# GENE1 .. GENEn, and the classification of its result rows alone, against the former classification (which compared every
+# candidate with every result row and is therefore only timed up to --former-max aliases):
+#   python benchmarks/query_for_references.py
+#
+# The time per alias should stay about the same from 1k to 1M aliases.
+
+from __future__ import print_function
+
+import os, sys
+import time
+import argparse
+import tempfile
+
+root = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+sys.path.insert( 0, root )
+from tests import synthetic_db
+from tests.test_query_for_references import former_classify
+
+clp = argparse.ArgumentParser( description = "time query_for_references for growing numbers of aliases" )
+clp.add_argument( '-n', '--sizes', metavar = "N", help = "numbers of aliases (default: 1000 10000 100000 1000000)", type = int, nargs = '+', default = [ 1000, 10000, 100000, 1000000 ] )
+clp.add_argument( '--former-max', metavar = "N", help = "largest number of aliases to classify the former way (default: 10000)", type = int, default = 10000 )
+clp.add_argument( '--db', metavar = "FILE", help = "synthetic SQLite database (created if missing; default: a temporary file)" )
+clp.add_argument( '--config', metavar = "CONFIG_FILE", help = "configuration to base the database configuration on (default: setup.cfg.template)" )
+parameters = clp.parse_args( )
+
+workdir = tempfile.mkdtemp( prefix = "query_for_references_" )
+db = parameters.db or os.path.join( workdir, "synthetic.sqlite" )
+dh = synthetic_db.create_database( synthetic_db.write_config( os.path.join( workdir, "benchmark.cfg" ), os.path.abspath( db ), parameters.config or synthetic_db.template ),
+        genes = max( parameters.sizes ) )
+
+
+def measure( function, *args ):
+    """return the result of function and the time it took, in s"""
+
+    start = time.time( )
+    result = function( *args )
+    return ( result, time.time( ) - start )
+
+
+print( "us per alias, database {!r}" . format( db ) )
+print( "{:>8}  {:>8}  {:>10}  {:>10} {:>10} {:>8}" . format( "aliases", "found", "query", "classify", "former", "ratio" ) )
+for size in parameters.sizes:
+    candidates = [  "GENE{:d}" . format( i ) for i in xrange( 1, size + 1 )  ]
+    requested = set( [  c.lower( ) for c in candidates  ] )
+    dh._alias_cache and dh._alias_cache.clear( )
+    ( identified, orphans, ambiguous ), query = measure( dh.query_for_references, candidates )
+    rows = [  ( int( r ), a, a.lower( ) ) for r, a in identified.iteritems( )  ]
+    classify = measure( dh._classify_references, candidates, requested, rows, False )[ 1 ]
+    former = measure( former_classify, candidates, requested, [  r[ :2 ] for r in rows  ] )[ 1 ] if size <= parameters.former_max else None
+    print( "{:8d}  {:8d}  {:10.2f}  {:10.2f} {:>10} {:>8}" . format( size, len( identified ), 1e6 * query / size, 1e6 * classify / size,
+            "-" if former is None else "{:.2f}" . format( 1e6 * former / size ), "-" if former is None else "{:.1f}" . format( former / classify ) ) )
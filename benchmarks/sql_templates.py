@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+# micro-benchmark of the alias lookup statement of query_for_references: the former construction (string concatenation,
+# values escaped by hand, .format( ) over the whole statement) against SQLTemplates (compiled once, values bound by the driver)
+#
+# Both are timed for statement construction alone and for construction plus execution, for several IN list lengths, on the
+# synthetic SQLite database of tests/synthetic_db.py:
+#   python benchmarks/sql_templates.py
+
+from __future__ import print_function
+
+import os, sys
+import time
+import argparse
+import tempfile
+
+root = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+sys.path.insert( 0, os.path.join( root, "tests" ) )
+import synthetic_db
+
+clp = argparse.ArgumentParser( description = "compare the former and the template-based construction of the alias lookup statement" )
+clp.add_argument( '-n', '--sizes', metavar = "N", help = "numbers of aliases per statement (default: 10 100 1000 5000)", type = int, nargs = '+', default = [ 10, 100, 1000, 5000 ] )
+clp.add_argument( '-r', '--repeat', metavar = "N", help = "statements per measurement (default: 200)", type = int, default = 200 )
+clp.add_argument( '--db', metavar = "FILE", help = "synthetic SQLite database (created if missing; default: a temporary file)" )
+clp.add_argument( '--config', metavar = "CONFIG_FILE", help = "configuration to base the database configuration on (default: setup.cfg.template)" )
+parameters = clp.parse_args( )
+
+workdir = tempfile.mkdtemp( prefix = "sql_templates_" )
+db = parameters.db or os.path.join( workdir, "synthetic.sqlite" )
+dh = synthetic_db.create_database( synthetic_db.write_config( os.path.join( workdir, "benchmark.cfg" ), os.path.abspath( db ), parameters.config or synthetic_db.template ) )
+lower_case = dh._has_alias_lc( )  # as in query_for_references
+static = dict( alias_select = "`Alias`, `Alias_lc`", alias_match = "`Alias_lc`" ) if lower_case else dict( alias_select = "`Alias`", alias_match = "`Alias`" )
+
+
+def former( chunk ):
+    """return the statement as query_for_references built it before SQLTemplates"""
+
+    query = "SELECT\n\t{}\nFROM\n\t`Actor_aliases`\nWHERE\n\t" . format( "`ref`, `Alias`" )
+    query += "`Alias` IN ( {} )" . format( ", " . join( dh._sqlescape( chunk ) ) )
+    return dh._compose_select( query )  # fills in the SQL mapping with .format( )
+
+
+def templated( chunk ):
+    """return the statement and its arguments as query_for_references builds them now"""
+    return dh._templates.bind( "references", dict( aliases = chunk ), **static )
+
+
+def measure( function, chunks ):
+    """return the mean time per call of function over the chunks, in ms"""
+
+    start = time.time( )
+    for c in chunks:
+        function( c )
+    return 1000 * ( time.time( ) - start ) / len( chunks )
+
+
+print( "ms per statement (mean of {:d}), database {!r}" . format( parameters.repeat, db ) )
+print( "{:>6}  {:>12} {:>12} {:>8}  {:>12} {:>12} {:>8}" . format( "IN", "build former", "build tmpl", "ratio", "run former", "run tmpl", "ratio" ) )
+for size in parameters.sizes:
+    chunks = [  [  "GENE{:d}" . format( ( i * size + j ) % 20000 + 1 ) for j in xrange( size )  ] for i in xrange( parameters.repeat )  ]
+    lowered = [  [  a.lower( ) for a in c  ] for c in chunks  ] if lower_case else chunks
+    build_former = measure( former, chunks )
+    build_templated = measure( templated, lowered )
+    run_former = measure( lambda c: dh._select( former( c ) ), chunks )
+    run_templated = measure( lambda c: dh._query( *templated( c ) ), lowered )
+    print( "{:6d}  {:12.3f} {:12.3f} {:8.1f}  {:12.3f} {:12.3f} {:8.1f}" . format( size, build_former, build_templated, build_former / build_templated,
+            run_former, run_templated, run_former / run_templated ) )
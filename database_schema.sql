@@ -85,9 +85,12 @@ CREATE  TABLE IF NOT EXISTS `miRNexpander`.`Actor_aliases` (
   `ref` INT NOT NULL ,
   `Alias` VARCHAR(200) NOT NULL ,
   `type` INT NOT NULL ,
+  `Alias_lc` VARCHAR(200) CHARACTER SET utf8 COLLATE utf8_bin AS (LOWER(`Alias`)) STORED ,
   INDEX `Aliases` (`Alias` ASC) ,
   INDEX `alias_actor` (`ref` ASC) ,
   INDEX `alias_type` (`type` ASC) ,
+  INDEX `alias_lookup` (`Alias_lc` ASC, `type` ASC, `ref` ASC, `Alias` ASC) ,
+  INDEX `alias_refs` (`ref` ASC, `type` ASC, `Alias` ASC) ,
   CONSTRAINT `alias_actor`
     FOREIGN KEY (`ref` )
     REFERENCES `miRNexpander`.`Actors` (`a_id` )
@@ -158,6 +161,8 @@ CREATE  TABLE IF NOT EXISTS `miRNexpander`.`TransmiR` (
   `target_orig` VARCHAR(40) NOT NULL ,
   INDEX `TramsmiR_source` (`source` ASC) ,
   INDEX `TransmiR_target` (`target` ASC) ,
+  INDEX `TransmiR_source_cover` (`source` ASC, `target` ASC, `source_orig` ASC, `target_orig` ASC) ,
+  INDEX `TransmiR_target_cover` (`target` ASC, `source` ASC, `source_orig` ASC, `target_orig` ASC) ,
   CONSTRAINT `TramsmiR_source`
     FOREIGN KEY (`source` )
     REFERENCES `miRNexpander`.`Actors` (`a_id` )
@@ -184,6 +189,8 @@ CREATE  TABLE IF NOT EXISTS `miRNexpander`.`TRANSFAC` (
   `target_orig` VARCHAR(40) NOT NULL ,
   INDEX `TRANSFAC_source` (`source` ASC) ,
   INDEX `TRANSFAC_target` (`target` ASC) ,
+  INDEX `TRANSFAC_source_cover` (`source` ASC, `target` ASC, `source_orig` ASC, `target_orig` ASC) ,
+  INDEX `TRANSFAC_target_cover` (`target` ASC, `source` ASC, `source_orig` ASC, `target_orig` ASC) ,
   CONSTRAINT `TRANSFAC_source`
     FOREIGN KEY (`source` )
     REFERENCES `miRNexpander`.`Actors` (`a_id` )
@@ -210,6 +217,8 @@ CREATE  TABLE IF NOT EXISTS `miRNexpander`.`HTRIdb` (
   `target_orig` VARCHAR(40) NOT NULL ,
   INDEX `HTRIdb_source` (`source` ASC) ,
   INDEX `HTRIdb_target` (`target` ASC) ,
+  INDEX `HTRIdb_source_cover` (`source` ASC, `target` ASC, `source_orig` ASC, `target_orig` ASC) ,
+  INDEX `HTRIdb_target_cover` (`target` ASC, `source` ASC, `source_orig` ASC, `target_orig` ASC) ,
   CONSTRAINT `HTRIdb_source`
     FOREIGN KEY (`source` )
     REFERENCES `miRNexpander`.`Actors` (`a_id` )
@@ -236,6 +245,8 @@ CREATE  TABLE IF NOT EXISTS `miRNexpander`.`HPRD` (
   `target_orig` VARCHAR(40) NOT NULL ,
   INDEX `HPRD_source` (`source` ASC) ,
   INDEX `HPRD_target` (`target` ASC) ,
+  INDEX `HPRD_source_cover` (`source` ASC, `target` ASC, `source_orig` ASC, `target_orig` ASC) ,
+  INDEX `HPRD_target_cover` (`target` ASC, `source` ASC, `source_orig` ASC, `target_orig` ASC) ,
   CONSTRAINT `HPRD_source`
     FOREIGN KEY (`source` )
     REFERENCES `miRNexpander`.`Actors` (`a_id` )
@@ -262,6 +273,8 @@ CREATE  TABLE IF NOT EXISTS `miRNexpander`.`RegPhos` (
   `target_orig` VARCHAR(40) NOT NULL ,
   INDEX `RegPhos_source` (`source` ASC) ,
   INDEX `RegPhos_target` (`target` ASC) ,
+  INDEX `RegPhos_source_cover` (`source` ASC, `target` ASC, `source_orig` ASC, `target_orig` ASC) ,
+  INDEX `RegPhos_target_cover` (`target` ASC, `source` ASC, `source_orig` ASC, `target_orig` ASC) ,
   CONSTRAINT `RegPhos_source`
     FOREIGN KEY (`source` )
     REFERENCES `miRNexpander`.`Actors` (`a_id` )
@@ -288,6 +301,8 @@ CREATE  TABLE IF NOT EXISTS `miRNexpander`.`STRING` (
   `target_orig` VARCHAR(40) NOT NULL ,
   INDEX `STRING_source` (`source` ASC) ,
   INDEX `target` (`target` ASC) ,
+  INDEX `STRING_source_cover` (`source` ASC, `target` ASC, `source_orig` ASC, `target_orig` ASC) ,
+  INDEX `STRING_target_cover` (`target` ASC, `source` ASC, `source_orig` ASC, `target_orig` ASC) ,
   CONSTRAINT `STRING_source`
     FOREIGN KEY (`source` )
     REFERENCES `miRNexpander`.`Actors` (`a_id` )
@@ -314,6 +329,8 @@ CREATE  TABLE IF NOT EXISTS `miRNexpander`.`miRBase` (
   `target_orig` VARCHAR(40) NOT NULL ,
   INDEX `miRBase_source` (`source` ASC) ,
   INDEX `miRBase_target` (`target` ASC) ,
+  INDEX `miRBase_source_cover` (`source` ASC, `target` ASC, `source_orig` ASC, `target_orig` ASC) ,
+  INDEX `miRBase_target_cover` (`target` ASC, `source` ASC, `source_orig` ASC, `target_orig` ASC) ,
   CONSTRAINT `miRBase_source`
     FOREIGN KEY (`source` )
     REFERENCES `miRNexpander`.`Actors` (`a_id` )
@@ -340,6 +357,8 @@ CREATE  TABLE IF NOT EXISTS `miRNexpander`.`TarBase` (
   `target_orig` VARCHAR(40) NOT NULL ,
   INDEX `TarBase_source` (`source` ASC) ,
   INDEX `TarBase_target` (`target` ASC) ,
+  INDEX `TarBase_source_cover` (`source` ASC, `target` ASC, `source_orig` ASC, `target_orig` ASC) ,
+  INDEX `TarBase_target_cover` (`target` ASC, `source` ASC, `source_orig` ASC, `target_orig` ASC) ,
   CONSTRAINT `TarBase_source`
     FOREIGN KEY (`source` )
     REFERENCES `miRNexpander`.`Actors` (`a_id` )
@@ -366,6 +385,8 @@ CREATE  TABLE IF NOT EXISTS `miRNexpander`.`miRTarBase` (
   `target_orig` VARCHAR(40) NOT NULL ,
   INDEX `miRTarBase_source` (`source` ASC) ,
   INDEX `miRTarBase_target` (`target` ASC) ,
+  INDEX `miRTarBase_source_cover` (`source` ASC, `target` ASC, `source_orig` ASC, `target_orig` ASC) ,
+  INDEX `miRTarBase_target_cover` (`target` ASC, `source` ASC, `source_orig` ASC, `target_orig` ASC) ,
   CONSTRAINT `miRTarBase_source`
     FOREIGN KEY (`source` )
     REFERENCES `miRNexpander`.`Actors` (`a_id` )
@@ -392,6 +413,8 @@ CREATE  TABLE IF NOT EXISTS `miRNexpander`.`miRecords` (
   `target_orig` VARCHAR(40) NOT NULL ,
   INDEX `miRecords_source` (`source` ASC) ,
   INDEX `miRecords_target` (`target` ASC) ,
+  INDEX `miRecords_source_cover` (`source` ASC, `target` ASC, `source_orig` ASC, `target_orig` ASC) ,
+  INDEX `miRecords_target_cover` (`target` ASC, `source` ASC, `source_orig` ASC, `target_orig` ASC) ,
   CONSTRAINT `miRecords_source`
     FOREIGN KEY (`source` )
     REFERENCES `miRNexpander`.`Actors` (`a_id` )
@@ -418,6 +441,8 @@ CREATE  TABLE IF NOT EXISTS `miRNexpander`.`starBase` (
   `target_orig` VARCHAR(40) NOT NULL ,
   INDEX `starBase_source` (`source` ASC) ,
   INDEX `starBase_target` (`target` ASC) ,
+  INDEX `starBase_source_cover` (`source` ASC, `target` ASC, `source_orig` ASC, `target_orig` ASC) ,
+  INDEX `starBase_target_cover` (`target` ASC, `source` ASC, `source_orig` ASC, `target_orig` ASC) ,
   CONSTRAINT `starBase_source`
     FOREIGN KEY (`source` )
     REFERENCES `miRNexpander`.`Actors` (`a_id` )
@@ -444,6 +469,8 @@ CREATE  TABLE IF NOT EXISTS `miRNexpander`.`Drugbank` (
   `target_orig` VARCHAR(40) NOT NULL ,
   INDEX `HTRIdb_source` (`source` ASC) ,
   INDEX `HTRIdb_target` (`target` ASC) ,
+  INDEX `Drugbank_source_cover` (`source` ASC, `target` ASC, `source_orig` ASC, `target_orig` ASC) ,
+  INDEX `Drugbank_target_cover` (`target` ASC, `source` ASC, `source_orig` ASC, `target_orig` ASC) ,
   CONSTRAINT `Drugbank_source`
     FOREIGN KEY (`source` )
     REFERENCES `miRNexpander`.`Actors` (`a_id` )
@@ -458,6 +485,25 @@ ENGINE = InnoDB;
 
 
 
+-- -----------------------------------------------------
+-- Table `miRNexpander`.`Update_manifest`
+-- -----------------------------------------------------
+DROP TABLE IF EXISTS `miRNexpander`.`Update_manifest` ;
+
+CREATE  TABLE IF NOT EXISTS `miRNexpander`.`Update_manifest` (
+  `tablename` VARCHAR(64) NOT NULL ,
+  `path` VARCHAR(255) NOT NULL ,
+  `size` BIGINT NOT NULL ,
+  `mtime` BIGINT NOT NULL ,
+  `sha1` CHAR(40) NOT NULL ,
+  `release` VARCHAR(40) NOT NULL DEFAULT '' ,
+  `reldate` VARCHAR(40) NOT NULL DEFAULT '' ,
+  `updated` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ,
+  PRIMARY KEY (`tablename`, `path`) )
+ENGINE = InnoDB;
+
+
+
 SET SQL_MODE=@OLD_SQL_MODE;
 SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS;
 SET UNIQUE_CHECKS=@OLD_UNIQUE_CHECKS;
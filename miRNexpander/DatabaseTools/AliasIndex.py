@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+
+import os
+import json
+import time
+import numpy
+from miRNexpander.mWBBase import mWBBaseClass
+
+# file names of the arrays that make up an alias index (each is stored as '<name>.npy')
+_arrays = (
+        "key_hash",  # hashes of the lower-cased aliases (see _hash), sorted; row i of the following arrays belongs to key_hash[ i ]
+        "key", "alias",  # string indices of the lower-cased alias and of its original spelling
+        "ref", "type", "species",  # reference, alias type (x_id), and species of the reference (-1 if it is not in Actors)
+        "by_ref", "ref_sorted",  # rows ordered by reference, and their references (for binary search)
+        "x_id", "x_namespace",  # alias types
+        "str_blob", "str_offsets",  # string table: string i is str_blob[ str_offsets[ i ] : str_offsets[ i + 1 ] ]
+)
+_version = 1
+_chunk = 100000  # strings hashed at a time, bounds the size of the padded byte matrix
+
+
+def _hash( strings ):
+    """return the 64-bit FNV-1a hashes of byte strings, computed for all strings at once, one byte position after the other"""
+
+    strings = list( strings )
+    h = numpy.empty( len( strings ), dtype = numpy.uint64 )
+    prime = numpy.uint64( 0x100000001b3 )
+    for c in xrange( 0, len( strings ), _chunk ):
+        chunk = strings[ c : c + _chunk ]
+        lengths = numpy.array( [  len( s ) for s in chunk  ] )
+        width = max( lengths.max( ), 1 )
+        padded = numpy.array( chunk, dtype = "S{:d}" . format( width ) ).view( numpy.uint8 ).reshape( len( chunk ), width )
+        part = numpy.full( len( chunk ), 0xcbf29ce484222325, dtype = numpy.uint64 )
+        for j in xrange( width ):
+            live = lengths > j
+            part[ live ] = ( part[ live ] ^ padded[ live, j ] ) * prime  # wraps around modulo 2 ** 64
+        h[ c : c + _chunk ] = part
+    return h
+
+
+def _ranges( lo, hi ):
+    """return the concatenation of the ranges [ lo[ i ], hi[ i ] ) and, for each element, the i it came from"""
+
+    lengths = hi - lo
+    total = lengths.sum( )
+    if not total:
+        return numpy.zeros( 0, dtype = numpy.int64 ), numpy.zeros( 0, dtype = numpy.int64 )
+    steps = numpy.arange( total ) + numpy.repeat( lo - ( numpy.cumsum( lengths ) - lengths ), lengths )
+    return steps, numpy.repeat( numpy.arange( len( lo ) ), lengths )
+
+
+class AliasIndex( mWBBaseClass ):
+    """read-only, memory-mapped copy of Actor_aliases for alias resolution without database round trips
+
+    Aliases are found by the hash of their lower-cased spelling (binary search in the sorted
+    hashes, then a comparison with the stored spelling against collisions), references by
+    binary search in the rows ordered by reference. The index is written by update_db next
+    to the SQL files whenever the alias tables change, and stamped with the update manifest
+    of these tables, so that an outdated index is not used (see DatabaseHandler.writeAliasIndex).
+"""
+
+    def __init__( self, path ):
+        """load (memory-map) the alias index stored in directory path"""
+
+        self.path = path
+        try:
+            stream = open( os.path.join( path, "meta.json" ) )
+        except IOError:
+            raise IOError( "No alias index found in {!r}." . format( path ) )
+        self.meta = json.load( stream )
+        stream.close( )
+        if self.meta[ "version" ] != _version:
+            raise IOError( "Alias index in {!r} has version {}, expected {}." . format( path, self.meta[ "version" ], _version ) )
+
+        for name in _arrays:
+            setattr( self, name, numpy.load( os.path.join( path, name + ".npy" ), mmap_mode = "r" ) )
+        self._blob = buffer( self.str_blob )  # slices of a buffer are plain strings, which is much faster than numpy's tobytes( )
+
+
+    ############################################################
+    #### export                                             ####
+    ############################################################
+
+    @staticmethod
+    def export( db_handler, path, digest = None ):
+        """write an alias index of Actor_aliases (with the species from Actors) and Actor_xrefs to directory path
+    - db_handler: connected DatabaseHandler
+    - path: target directory (created if missing, an existing index is replaced)
+    - digest: update manifest digest of the alias tables, stored to recognize an outdated index
+    - returns the number of aliases written
+"""
+
+        start = time.time( )
+        strings = { }  # string -> index in the string table
+
+        ### internal subroutine ###
+        def intern( value ):
+            """return the index of value in the string table"""
+
+            try:
+                return strings[ value ]
+            except KeyError:
+                strings[ value ] = len( strings )
+                return strings[ value ]
+
+        key, alias, ref, typ, species = [ ], [ ], [ ], [ ], [ ]
+        for r in db_handler._sql_iter( "SELECT `a`.`ref`, `a`.`type`, `a`.`Alias`, `g`.`species` FROM `Actor_aliases` AS `a` LEFT JOIN `Actors` AS `g` ON `g`.`a_id` = `a`.`ref`" ):
+            a = r[ 2 ].encode( "utf-8" ) if type( r[ 2 ] ) == unicode else str( r[ 2 ] )
+            key.append( intern( a.lower( ) ) )
+            alias.append( intern( a ) )
+            ref.append( r[ 0 ] )
+            typ.append( r[ 1 ] )
+            species.append( -1 if r[ 3 ] == None else r[ 3 ] )
+        xrefs = db_handler._sql( "SELECT `x_id`, `namespace` FROM `Actor_xrefs`" )
+        if xrefs == 1:
+            xrefs = [ ]
+        x_namespace = [  intern( str( r[ 1 ] ) ) for r in xrefs  ]
+        ordered = sorted( strings, key = strings.get )
+        strings.clear( )
+
+        # hash every distinct key once, then sort the rows by hash (and reference, for a stable layout)
+        key = numpy.array( key, dtype = numpy.int32 )
+        distinct = numpy.unique( key )
+        key_hash = _hash( [  ordered[ k ] for k in distinct  ] )[ numpy.searchsorted( distinct, key ) ]
+        ref = numpy.array( ref, dtype = numpy.int64 )
+        order = numpy.lexsort( ( ref, key_hash ) )
+        arrays = dict(
+                key_hash = key_hash[ order ],
+                key = key[ order ],
+                alias = numpy.array( alias, dtype = numpy.int32 )[ order ],
+                ref = ref[ order ],
+                type = numpy.array( typ, dtype = numpy.int32 )[ order ],
+                species = numpy.array( species, dtype = numpy.int64 )[ order ],
+                x_id = numpy.array( [  r[ 0 ] for r in xrefs  ], dtype = numpy.int32 ),
+                x_namespace = numpy.array( x_namespace, dtype = numpy.int32 ),
+                )
+        del key, alias, ref, typ, species, order
+        arrays[ "by_ref" ] = numpy.argsort( arrays[ "ref" ], kind = "mergesort" ).astype( numpy.int64 )
+        arrays[ "ref_sorted" ] = arrays[ "ref" ][ arrays[ "by_ref" ] ]
+        arrays[ "str_offsets" ] = numpy.concatenate( ( [ 0 ], numpy.cumsum( [ len( s ) for s in ordered ] ) ) ).astype( numpy.int64 )
+        arrays[ "str_blob" ] = numpy.array( bytearray( "" . join( ordered ) ), dtype = numpy.uint8 )
+
+        if not os.path.isdir( path ):
+            os.makedirs( path )
+        for name in _arrays:
+            numpy.save( os.path.join( path, name + ".npy" ), arrays[ name ] )
+        stream = open( os.path.join( path, "meta.json" ), "w" )
+        json.dump( dict( version = _version, created = time.strftime( "%Y-%m-%d %H:%M:%S" ), digest = digest, aliases = len( arrays[ "ref" ] ) ), stream, indent = 1 )
+        stream.close( )
+
+        db_handler._spill( "Alias index: {:d} aliases ({:d} strings) written to {!r} in {:.1f} s." . format(
+                len( arrays[ "ref" ] ), len( ordered ), path, time.time( ) - start ) )
+        return len( arrays[ "ref" ] )
+
+
+    ############################################################
+    #### lookups                                            ####
+    ############################################################
+
+    def _strings( self, indices ):
+        """return the strings with the given indices of the string table"""
+
+        blob = self._blob
+        return [  blob[ s : e ] for s, e in zip( self.str_offsets[ indices ].tolist( ), self.str_offsets[ indices + 1 ].tolist( ) )  ]
+
+
+    def references( self, lalias_list, types = None, species = None ):
+        """return ( ref, Alias, lower-cased alias ) rows for the lower-cased aliases
+    - types: alias type ids to keep (None keeps all)
+    - species: species of the references to keep (None keeps all)
+"""
+
+        lalias_list = list( lalias_list )
+        if not lalias_list:
+            return [ ]
+        h = _hash( lalias_list )
+        rows, owner = _ranges( numpy.searchsorted( self.key_hash, h, "left" ), numpy.searchsorted( self.key_hash, h, "right" ) )
+        if types != None:
+            keep = numpy.in1d( self.type[ rows ], list( types ) )
+            rows, owner = rows[ keep ], owner[ keep ]
+        if species != None:
+            keep = numpy.in1d( self.species[ rows ], list( species ) )
+            rows, owner = rows[ keep ], owner[ keep ]
+
+        result = [ ]
+        for lalias, key, alias, ref in zip( [  lalias_list[ o ] for o in owner.tolist( )  ], self._strings( self.key[ rows ] ), self._strings( self.alias[ rows ] ), self.ref[ rows ].tolist( ) ):
+            if key == lalias:  # otherwise a different alias with the same hash
+                result.append( ( ref, alias, lalias ) )
+        return result
+
+
+    def aliases( self, refs, types = None ):
+        """return ( ref, type, Alias ) rows for the references
+    - types: alias type ids to keep (None keeps all)
+"""
+
+        refs = numpy.unique( numpy.array( list( refs ), dtype = numpy.int64 ) )
+        steps, owner = _ranges( numpy.searchsorted( self.ref_sorted, refs, "left" ), numpy.searchsorted( self.ref_sorted, refs, "right" ) )
+        rows = self.by_ref[ steps ]
+        if types != None:
+            rows = rows[ numpy.in1d( self.type[ rows ], list( types ) ) ]
+        return zip( self.ref[ rows ].tolist( ), self.type[ rows ].tolist( ), self._strings( self.alias[ rows ] ) )
+
+
+    def xref_ids( self, namespaces = None ):
+        """return { x_id : namespace } for the given alias type namespaces (compared case-insensitively, as by MySQL; None returns all)"""
+
+        wanted = None if namespaces == None else set( [  str( n ).lower( ) for n in namespaces  ] )
+        return dict( [  ( x, n ) for x, n in zip( self.x_id.tolist( ), self._strings( self.x_namespace ) ) if wanted == None or n.lower( ) in wanted  ] )
@@ -0,0 +1,399 @@
+#!/usr/bin/env python
+
+# database backends of DatabaseConnector: MySQL (the default) and SQLite (a local database file, e.g. for compute nodes or CI runs without a MySQL server)
+# The backends hand out connections and cover the differences between the SQL dialects; the schema is written for
+# MySQL (see database_schema.sql) and translated for SQLite.
+
+from __future__ import print_function
+
+import re
+import threading
+import sqlite3
+from miRNexpander.mWBBase import mWBBaseClass
+
+try:
+    import MySQLdb
+except ImportError:  # SQLite-only installation
+    MySQLdb = None
+
+
+# exception classes of the available drivers, for except clauses that serve both backends
+# (sqlite3 raises Warning for misuse like several statements in one call, so it counts as an error here)
+DatabaseError = ( sqlite3.Error, sqlite3.Warning ) + ( ( MySQLdb.Error, ) if MySQLdb else ( ) )
+DatabaseWarning = ( MySQLdb.Warning, ) if MySQLdb else ( )
+
+# SQLite supports generated columns since 3.31
+SQLITE_GENERATED = sqlite3.sqlite_version_info >= ( 3, 31, 0 )
+
+
+def _split_items( body ):
+    """split the body of a CREATE TABLE or ALTER TABLE statement at the commas that are not enclosed in parentheses or quotes"""
+
+    items = [ ]
+    depth = 0
+    quoted = False
+    start = 0
+    for i, c in enumerate( body ):
+        if c == "'":
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "," and depth == 0:
+            items.append( body[ start:i ].strip( ) )
+            start = i + 1
+    items.append( body[ start: ].strip( ) )
+    return [  i for i in items if i  ]
+
+
+def index_name( table, name ):
+    """return the SQLite name of an index; index names are unique per table in MySQL, but per database in SQLite"""
+
+    if name.lower( ).startswith( table.lower( ) + "_" ):
+        return name
+    return table + "_" + name
+
+
+def _sqlite_column( item, alter = False ):
+    """translate a MySQL column definition; return ( name, definition ), definition is None if SQLite cannot hold the column"""
+
+    m = re.match( r"`(\w+)`\s+(\w+)(?:\s*\([^)]*\))?\s*(.*)$", item, re.S )
+    name, mysql_type, rest = m.group( 1 ), m.group( 2 ).lower( ), m.group( 3 )
+
+    if "int" in mysql_type:
+        parts = [ "INTEGER" ]
+    elif mysql_type in ( "float", "double", "decimal", "real", "numeric" ):
+        parts = [ "REAL" ]
+    elif "blob" in mysql_type or "binary" in mysql_type:
+        parts = [ "BLOB" ]
+    else:
+        parts = [ "TEXT" ]
+
+    generated = re.search( r"(?i)\bAS\s*\((.*)\)\s*(?:STORED|VIRTUAL|PERSISTENT)", rest, re.S )
+    if generated:
+        if not SQLITE_GENERATED:
+            return name, None
+        # MySQL reports LOWER( ... ) as lcase( ... ) in SHOW CREATE TABLE; ALTER TABLE can only add virtual columns
+        expression = re.sub( r"(?i)\blcase\s*\(", "lower(", generated.group( 1 ).strip( ) )
+        parts.append( "GENERATED ALWAYS AS ( {} ) {}" . format( expression, "VIRTUAL" if alter else "STORED" ) )
+        return name, "`{}` {}" . format( name, " " . join( parts ) )
+
+    if re.search( r"(?i)\bNOT\s+NULL\b", rest ):
+        parts.append( "NOT NULL" )
+    default = re.search( r"(?i)\bDEFAULT\s+('(?:[^']|'')*'|[^\s,]+)", rest )
+    if default:
+        parts.append( "DEFAULT " + default.group( 1 ) )
+    if parts[ 0 ] == "TEXT" and not re.search( r"(?i)_bin\b", rest ):
+        parts.append( "COLLATE NOCASE" )  # comparisons are case-insensitive with MySQL's default collations
+    return name, "`{}` {}" . format( name, " " . join( parts ) )
+
+
+def _sqlite_index( table, unique, name, columns ):
+    """return a CREATE INDEX statement for SQLite"""
+
+    columns = re.sub( r"`\s*\(\d+\)", "`", columns )  # SQLite does not index prefixes
+    return "CREATE {}INDEX IF NOT EXISTS `{}` ON `{}` ( {} )" . format( "UNIQUE " if unique else "", index_name( table, name ), table, " " . join( columns.split( ) ) )
+
+
+def translate_ddl( text ):
+    """translate MySQL DDL (database_schema.sql, SHOW CREATE TABLE output, ALTER TABLE ... ADD) into a list of SQLite statements
+
+    Table options, foreign keys, and statements without an SQLite counterpart (SET, USE,
+    CREATE SCHEMA, ...) are dropped; indexes become separate CREATE INDEX statements, which
+    follow all table statements. Generated columns (and the indexes on them) are dropped if
+    the SQLite library is too old to support them.
+"""
+
+    text = re.sub( r"(?m)^\s*--.*$", "", text )
+    tables = [ ]
+    indexes = [ ]
+    for statement in text.split( ";" ):
+        statement = " " . join( statement.split( ) )
+        m = re.match( r"(?i)DROP TABLE (IF EXISTS )?(?:`\w+`\.)?`(\w+)`$", statement )
+        if m:
+            tables.append( "DROP TABLE {}`{}`" . format( m.group( 1 ) or "", m.group( 2 ) ) )
+            continue
+        m = re.match( r"(?i)CREATE\s+TABLE (IF NOT EXISTS )?(?:`\w+`\.)?`(\w+)`\s*\((.*)\)[^)]*$", statement )
+        if m:
+            table = m.group( 2 )
+            columns = [ ]
+            missing = set( )
+            for item in _split_items( m.group( 3 ) ):
+                k = re.match( r"(?i)(?:(UNIQUE|PRIMARY|FULLTEXT|SPATIAL)\s+)?(?:INDEX|KEY)\s*(?:`(\w+)`)?\s*\((.*)\)$", item )
+                if item.startswith( "`" ):
+                    name, definition = _sqlite_column( item )
+                    if definition:
+                        columns.append( definition )
+                    else:
+                        missing.add( name )
+                elif k and k.group( 1 ) and k.group( 1 ).upper( ) == "PRIMARY":
+                    columns.append( "PRIMARY KEY ( {} )" . format( " " . join( k.group( 3 ).split( ) ) ) )
+                elif k and ( k.group( 1 ) or "" ).upper( ) in ( "", "UNIQUE" ):
+                    if not missing & set( re.findall( r"`(\w+)`", k.group( 3 ) ) ):
+                        indexes.append( _sqlite_index( table, k.group( 1 ), k.group( 2 ), k.group( 3 ) ) )
+                # foreign keys (CONSTRAINT ..., FOREIGN KEY ...) and full-text indexes are not translated
+            tables.append( "CREATE TABLE {}`{}` (\n\t{} )" . format( m.group( 1 ) or "", table, ",\n\t" . join( columns ) ) )
+            continue
+        m = re.match( r"(?i)ALTER TABLE (?:`\w+`\.)?`(\w+)` (.*)$", statement )
+        if m:
+            table = m.group( 1 )
+            for item in _split_items( m.group( 2 ) ):
+                k = re.match( r"(?i)ADD (UNIQUE )?(?:INDEX|KEY) `(\w+)`\s*\((.*)\)$", item )
+                c = re.match( r"(?i)ADD (?:COLUMN )?(`.*)$", item )
+                if k:
+                    indexes.append( _sqlite_index( table, k.group( 1 ), k.group( 2 ), k.group( 3 ) ) )
+                elif c:
+                    name, definition = _sqlite_column( c.group( 1 ), alter = True )
+                    if definition:
+                        tables.append( "ALTER TABLE `{}` ADD COLUMN {}" . format( table, definition ) )
+            continue
+        m = re.match( r"(?i)CREATE (UNIQUE )?INDEX `(\w+)` ON (?:`\w+`\.)?`(\w+)`\s*\((.*)\)$", statement )
+        if m:
+            indexes.append( _sqlite_index( m.group( 3 ), m.group( 1 ), m.group( 2 ), m.group( 4 ) ) )
+
+    return tables + indexes
+
+
+def _literal( value ):
+    """return value as an SQLite literal"""
+
+    if value is None:
+        return "NULL"
+    elif type( value ) == bool:
+        return str( int( value ) )
+    elif type( value ) == float:
+        return repr( value )
+    elif isinstance( value, ( int, long ) ):
+        return str( value )
+    elif type( value ) == unicode:
+        value = value.encode( "utf-8" )
+    else:
+        value = str( value )
+    return "'" + value.replace( "'", "''" ) + "'"
+
+
+
+class MySQLBackend( mWBBaseClass ):
+    """connections to a MySQL server, handed out by a ConnectionPool"""
+
+    name = "mysql"
+    placeholder = "%s"
+    local_infile = True  # tables can be filled with LOAD DATA LOCAL INFILE
+
+    def __init__( self, connect_args, size = 4, retries = 3 ):
+        """initialize values
+    - connect_args, size, retries: see ConnectionPool
+"""
+
+        if MySQLdb is None:
+            raise ImportError( "The MySQL backend requires MySQLdb (MySQL-python)." )
+        from miRNexpander.DatabaseTools.ConnectionPool import ConnectionPool, is_disconnect
+        from MySQLdb.converters import conversions
+        from _mysql import escape
+        import MySQLdb.cursors
+
+        self._pool = ConnectionPool( connect_args, size, retries = retries )
+        self._is_disconnect = is_disconnect
+        self._escape = escape
+        self._conversions = conversions
+
+
+    def checkout( self, timeout = None ):
+        return self._pool.checkout( timeout )
+
+
+    def checkin( self, conn ):
+        self._pool.checkin( conn )
+
+
+    def reconnect( self, conn ):
+        return self._pool.reconnect( conn )
+
+
+    def close( self ):
+        self._pool.close( )
+
+
+    def stats( self ):
+        return self._pool.stats( )
+
+
+    def is_disconnect( self, error ):
+        """return whether the error means the connection was lost"""
+        return self._is_disconnect( error )
+
+
+    def stream_cursor( self, conn ):
+        """return a cursor that leaves the result set on the server until it is fetched"""
+        return conn.cursor( MySQLdb.cursors.SSCursor )
+
+
+    def escape( self, elements ):
+        """return the elements as SQL literals"""
+        return self._escape( list( elements ), self._conversions )
+
+
+    def ddl( self, statement ):
+        """return the statements that carry out a (MySQL) DDL statement"""
+        return [ statement ]
+
+
+    def index_name( self, table, name ):
+        return name
+
+
+    def tables( self, execute ):
+        """return the names of all tables"""
+        return [  r[ 0 ] for r in execute( "SHOW TABLES" ).fetchall( )  ]
+
+
+    def columns( self, execute, table ):
+        """return ( name, generated ) for the columns of a table (in table order)"""
+        return [  ( c[ 0 ], "GENERATED" in str( c[ 5 ] ).upper( ) ) for c in execute( "SHOW COLUMNS IN `{}`" . format( table ) ).fetchall( )  ]
+
+
+    def indexes( self, execute, table ):
+        """return the index names of a table"""
+        return set( [  i[ 2 ] for i in execute( "SHOW INDEX FROM `{}`" . format( table ) ).fetchall( )  ] )
+
+
+    def delete_one( self, table, columns ):
+        """return a statement that deletes one row with the given (NULL-safe compared) column values"""
+        return "DELETE FROM `{}` WHERE {} LIMIT 1" . format( table, " AND " . join( [  "`{}` <=> %s" . format( c ) for c in columns  ] ) )
+
+
+    def explain( self, execute, statement, args ):
+        """return ( table, used index, covering ) for the tables read by statement"""
+
+        cursor = execute( "EXPLAIN " + statement, args )
+        fields = [  d[ 0 ] for d in cursor.description  ]
+        result = [ ]
+        for row in cursor.fetchall( ):
+            row = dict( zip( fields, row ) )
+            result.append( ( row[ "table" ], row[ "key" ] or "-", "Using index" in ( row.get( "Extra" ) or "" ) ) )
+        return result
+
+
+
+class SQLiteBackend( mWBBaseClass ):
+    """connections to a local SQLite database file in WAL mode with memory-mapped I/O
+
+    Opening a connection to a local file is cheap, so connections are not pooled: each
+    handler (and clone) opens its own one and closes it when it is checked in. WAL mode lets
+    readers run alongside a writer, e.g. when workers of a service read while a table is
+    updated.
+"""
+
+    name = "sqlite"
+    placeholder = "?"
+    local_infile = False
+
+    def __init__( self, path, mmap_mb = 1024, cache_mb = 64, timeout = 60 ):
+        """initialize values
+    - path: database file, created if it does not exist
+    - mmap_mb: size of the memory-mapped part of the file
+    - cache_mb: page cache per connection
+    - timeout: seconds to wait for a lock held by another connection
+"""
+
+        self._path = path
+        self._mmap = int( mmap_mb * 2 ** 20 )
+        self._cache_kb = int( cache_mb * 1024 )
+        self._timeout = timeout
+        self._lock = threading.Lock( )
+        self._opened = 0
+
+        self.reconnects = 0
+
+
+    def _open( self ):
+        """open a new connection and configure it"""
+
+        conn = sqlite3.connect( self._path, timeout = self._timeout, check_same_thread = False )  # handlers may be used by other threads than their creator, but by one at a time
+        conn.text_factory = str  # byte strings, as returned by MySQLdb
+        for pragma in ( "journal_mode = WAL", "synchronous = NORMAL", "mmap_size = {:d}" . format( self._mmap ), "cache_size = -{:d}" . format( self._cache_kb ), "temp_store = MEMORY" ):
+            conn.execute( "PRAGMA " + pragma )
+        return conn
+
+
+    def checkout( self, timeout = None ):
+        conn = self._open( )
+        with self._lock:
+            self._opened += 1
+        return conn
+
+
+    def checkin( self, conn ):
+        conn.close( )
+        with self._lock:
+            self._opened -= 1
+
+
+    def reconnect( self, conn ):
+        try:
+            conn.close( )
+        except sqlite3.Error:
+            pass
+        self.reconnects += 1
+        return self._open( )
+
+
+    def close( self ):
+        pass  # connections are closed on checkin
+
+
+    def stats( self ):
+        return dict( path = self._path, opened = self._opened, reconnects = self.reconnects )
+
+
+    def is_disconnect( self, error ):
+        return False  # there is no server to lose
+
+
+    def stream_cursor( self, conn ):
+        return conn.cursor( )  # SQLite steps through the result set as it is fetched anyway
+
+
+    def escape( self, elements ):
+        return [  _literal( v ) for v in elements  ]
+
+
+    def ddl( self, statement ):
+        return translate_ddl( statement )
+
+
+    def index_name( self, table, name ):
+        return index_name( table, name )
+
+
+    def tables( self, execute ):
+        return [  r[ 0 ] for r in execute( "SELECT `name` FROM `sqlite_master` WHERE `type` = 'table' AND `name` NOT LIKE 'sqlite_%'" ).fetchall( )  ]
+
+
+    def columns( self, execute, table ):
+        # table_xinfo also lists generated columns, which are hidden (2: virtual, 3: stored)
+        try:
+            return [  ( c[ 1 ], c[ 6 ] in ( 2, 3 ) ) for c in execute( "PRAGMA table_xinfo( '{}' )" . format( table ) ).fetchall( )  ]
+        except sqlite3.Error:
+            return [  ( c[ 1 ], False ) for c in execute( "PRAGMA table_info( '{}' )" . format( table ) ).fetchall( )  ]
+
+
+    def indexes( self, execute, table ):
+        return set( [  i[ 1 ] for i in execute( "PRAGMA index_list( '{}' )" . format( table ) ).fetchall( )  ] )
+
+
+    def delete_one( self, table, columns ):
+        return "DELETE FROM `{0}` WHERE rowid IN ( SELECT rowid FROM `{0}` WHERE {1} LIMIT 1 )" . format( table, " AND " . join( [  "`{}` IS ?" . format( c ) for c in columns  ] ) )
+
+
+    def explain( self, execute, statement, args ):
+        # the plan rows read like "SEARCH a USING COVERING INDEX alias_lookup (Alias_lc=?)" or "SCAN TABLE miRTarBase"
+        result = [ ]
+        for row in execute( "EXPLAIN QUERY PLAN " + statement, args ).fetchall( ):
+            m = re.match( r"(?:SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS \w+)?(?: USING (COVERING )?INDEX (\w+))?", row[ -1 ] )
+            if m:
+                result.append( ( m.group( 1 ), m.group( 3 ) or "-", bool( m.group( 2 ) ) ) )
+        return result
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+
+import time
+import threading
+import Queue
+import MySQLdb
+from miRNexpander.mWBBase import mWBBaseClass
+
+# MySQL client errors after which the connection is unusable, but a new one may well succeed
+# (2006: server has gone away, 2013: lost connection during query, 2055: lost connection at system error)
+DISCONNECT_ERRORS = ( 2006, 2013, 2055 )
+
+
+def is_disconnect( error ):
+    """return whether the MySQLdb error means the connection was lost"""
+
+    return isinstance( error, MySQLdb.OperationalError ) and bool( error.args ) and error.args[ 0 ] in DISCONNECT_ERRORS
+
+
+class ConnectionPool( mWBBaseClass ):
+    """hand out up to a fixed number of MySQL connections, checking their health and replacing broken ones"""
+
+    def __init__( self, connect_args, size = 4, ping_after = 30, retries = 3 ):
+        """initialize values
+    - connect_args: keyword arguments for MySQLdb.connect
+    - size: maximum number of connections; checkout blocks while all of them are in use
+    - ping_after: connections idle for longer than this (in seconds) are pinged before they are handed out
+    - retries: number of further attempts if connecting fails
+"""
+
+        self._connect_args = connect_args
+        self._size = max( 1, size )
+        self._ping_after = ping_after
+        self._retries = retries
+        self._idle = Queue.LifoQueue( )  # ( connection, time of checkin ); the most recently used connection is the likeliest to be alive
+        self._lock = threading.Lock( )
+        self._opened = 0
+
+        self.reconnects = 0
+
+
+    def _open( self ):
+        """open a new connection, retrying with increasing delays"""
+
+        for attempt in xrange( self._retries + 1 ):
+            try:
+                return MySQLdb.connect( **self._connect_args )
+            except MySQLdb.OperationalError as e:
+                if attempt == self._retries or e.args and e.args[ 0 ] not in DISCONNECT_ERRORS + ( 2002, 2003 ):  # give up, or not a connectivity issue (e.g. access denied)
+                    raise
+                self._spill( "Connecting to the database failed ({}), retrying..." . format( e ) )
+                time.sleep( 0.5 * ( attempt + 1 ) )
+
+
+    def checkout( self, timeout = None ):
+        """return a healthy connection; opens a new one while the pool is not full, otherwise waits for a checkin"""
+
+        try:
+            conn, since = self._idle.get_nowait( )
+        except Queue.Empty:
+            with self._lock:
+                grow = self._opened < self._size
+                if grow:
+                    self._opened += 1
+            if grow:
+                try:
+                    return self._open( )
+                except MySQLdb.Error:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            try:
+                conn, since = self._idle.get( timeout = timeout )
+            except Queue.Empty:
+                raise MySQLdb.OperationalError( 2013, "No database connection became available within {} s." . format( timeout ) )
+
+        if time.time( ) - since > self._ping_after:
+            try:
+                conn.ping( )
+            except MySQLdb.Error:
+                conn = self.reconnect( conn )
+        return conn
+
+
+    def checkin( self, conn ):
+        """return a connection to the pool"""
+        self._idle.put( ( conn, time.time( ) ) )
+
+
+    def reconnect( self, conn ):
+        """replace a broken connection (which stays checked out) with a new one"""
+
+        try:
+            conn.close( )
+        except MySQLdb.Error:
+            pass
+        self.reconnects += 1
+        return self._open( )
+
+
+    def close( self ):
+        """close all idle connections"""
+
+        while True:
+            try:
+                conn, since = self._idle.get_nowait( )
+            except Queue.Empty:
+                break
+            try:
+                conn.close( )
+            except MySQLdb.Error:
+                pass
+            with self._lock:
+                self._opened -= 1
+
+
+    def stats( self ):
+        """return a dictionary describing the pool usage"""
+        return dict( size = self._size, opened = self._opened, idle = self._idle.qsize( ), reconnects = self.reconnects )
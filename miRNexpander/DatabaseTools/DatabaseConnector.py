@@ -3,10 +3,11 @@
 from __future__ import print_function
 
 from miRNexpander.mWBBase import mWBBaseClass
-import MySQLdb
+from miRNexpander.DatabaseTools.Backends import MySQLBackend, SQLiteBackend, DatabaseError
 #from webcolors import name_to_hex, rgb_to_hex
 import ConfigParser
 import sys, os
+from copy import copy
 from inspect import stack
 
 
@@ -19,6 +20,13 @@ class DatabaseConnector( mWBBaseClass ):
         self._config = None
         self._cursor = None
         self._serv = None
+        self._backend = None  # MySQL or SQLite backend, hands out the connections of this handler and its clones, see connect( ) and clone( )
+        self._retries = 3  # attempts to re-run a statement after the connection was lost, see connect( )
+        self._checkout_timeout = 60  # seconds a clone waits for a free pooled connection, see connect( ) and clone( )
+        self._session = { }  # session variables set with _set_session, set again after a reconnect
+        self._chunk_size = 5000  # maximum number of values per IN ( ... ) list, see connect( )
+        self._fetch_batch = 10000  # rows per round trip when streaming result sets, see _execute_iter( )
+        self._workers = 1  # number of processes reading database files during updates, see connect( )
 
         self._db_keys = set( [ "INDEX", "UNIQUE" ] )
 
@@ -34,14 +42,54 @@ class DatabaseConnector( mWBBaseClass ):
         self._config = conf
         self._conf_dict = self._read_conf( self._config )
 
-        host = self._config.get( 'database', 'host' )
-        user = self._config.get( 'database', 'user' )
-        passwd = self._config.get( 'database', 'passwd' )
-        db = self._config.get( 'database', 'database' )
+        try:
+            self._chunk_size = max( 1, self._config.getint( 'database', 'chunk_size' ) )
+        except ( ConfigParser.NoOptionError, ValueError ):
+            pass  # keep the default
+        try:
+            self._workers = max( 1, self._config.getint( 'database', 'workers' ) )
+        except ( ConfigParser.NoOptionError, ValueError ):
+            pass  # keep the default
+        try:
+            self._fetch_batch = max( 1, self._config.getint( 'database', 'fetch_batch' ) )
+        except ( ConfigParser.NoOptionError, ValueError ):
+            pass  # keep the default
+
+        try:
+            self._retries = max( 0, self._config.getint( 'database', 'reconnect_retries' ) )
+        except ( ConfigParser.NoOptionError, ValueError ):
+            pass  # keep the default
+        try:
+            self._checkout_timeout = max( 0, self._config.getfloat( 'database', 'pool_timeout' ) )
+        except ( ConfigParser.NoOptionError, ValueError ):
+            pass  # keep the default
 
         try:
-            self._serv = MySQLdb.connect( host, user, passwd, db )
-        except MySQLdb.Error as e:
+            backend = self._config.get( 'database', 'backend' ).strip( ).lower( )
+        except ConfigParser.NoOptionError:
+            backend = "mysql"
+        if backend == "sqlite":
+            try:
+                mmap_mb = max( 0, self._config.getint( 'database', 'sqlite_mmap_mb' ) )
+            except ( ConfigParser.NoOptionError, ValueError ):
+                mmap_mb = 1024
+            self._backend = SQLiteBackend( self._config.get( 'database', 'sqlite_file' ), mmap_mb )
+        elif backend == "mysql":
+            host = self._config.get( 'database', 'host' )
+            user = self._config.get( 'database', 'user' )
+            passwd = self._config.get( 'database', 'passwd' )
+            db = self._config.get( 'database', 'database' )
+            try:
+                pool_size = max( 1, self._config.getint( 'database', 'pool_size' ) )
+            except ( ConfigParser.NoOptionError, ValueError ):
+                pool_size = 4
+            # local_infile is needed for bulk loading
+            self._backend = MySQLBackend( dict( host = host, user = user, passwd = passwd, db = db, local_infile = 1 ), pool_size, retries = self._retries )
+        else:
+            return ValueError( "Unknown database backend {!r}, expected mysql or sqlite." . format( backend ) )
+        try:
+            self._serv = self._backend.checkout( )
+        except DatabaseError as e:
             return e
         self._cursor = self._serv.cursor( )
         #self._cursor.connection.autocommit( True )
@@ -427,6 +475,14 @@ class DatabaseConnector( mWBBaseClass ):
         return self._config.get( "database", "hardcoded" )
 
 
+    def getBulkLoadTables( self ):
+        """return the (lower-case) tables that are filled via LOAD DATA LOCAL INFILE instead of INSERT statements"""
+        try:
+            return set( self._config.get( "database", "bulk_load" ).lower( ).split( ) )
+        except ConfigParser.NoOptionError:
+            return set( )
+
+
     def getTablesConf( self ):
         """return all table configuration"""
         return self._conf_dict[ "tables" ]
@@ -450,6 +506,121 @@ class DatabaseConnector( mWBBaseClass ):
             return None
 
 
+    def clone( self ):
+        """return a handler that shares configuration, caches, and connection pool, but uses its own connection (give it back with close)
+
+    Waits at most pool_timeout seconds for a free connection if the pool is exhausted, then
+    raises the backend's OperationalError.
+"""
+
+        other = copy( self )  # configuration, caches, and backend are shared
+        for name, value in self._per_connection( ).iteritems( ):
+            setattr( other, name, value )
+        other._serv = self._backend.checkout( self._checkout_timeout )
+        other._cursor = other._serv.cursor( )
+        return other
+
+
+    def _per_connection( self ):
+        """return fresh values of the fields that every handler (and clone) keeps for itself, see clone( )"""
+        return dict( _serv = None, _cursor = None, _session = { } )
+
+
+    def close( self ):
+        """return the connection of this handler to the pool"""
+
+        if self._serv != None:
+            self._cursor.close( )
+            self._backend.checkin( self._serv )
+            self._serv = self._cursor = None
+
+
+    def getPoolStats( self ):
+        """return a dictionary describing the usage of the connection pool"""
+        return self._backend.stats( ) if self._backend else { }
+
+
+    def _execute( self, query, args = None, many = False ):
+        """execute a statement (or executemany, if many is set) and return the cursor
+
+    If the connection was lost ("MySQL server has gone away"), the statement is re-run on a
+    new connection, up to the configured number of retries. Uncommitted changes of the lost
+    session are gone at that point; session variables set with _set_session are set again.
+"""
+
+        for attempt in xrange( self._retries + 1 ):
+            try:
+                if many:
+                    self._cursor.executemany( query, args )
+                elif args is None:
+                    self._cursor.execute( query )  # sqlite3 does not take None for "no arguments"
+                else:
+                    self._cursor.execute( query, args )
+                return self._cursor
+            except DatabaseError as e:
+                if not self._backend.is_disconnect( e ) or attempt == self._retries:
+                    raise
+                self._spill( "Lost the database connection ({}), reconnecting..." . format( e ) )
+                self._reconnect( )
+
+
+    def _execute_iter( self, query, args = None ):
+        """execute a query on a server-side cursor and yield its rows, fetching them in batches
+
+    With MySQL, the result set stays on the server and is transferred batch by batch, so memory does not
+    grow with the number of rows. Until the generator is exhausted (or closed), no other
+    statement may be run on this connection. A lost connection is only recovered from before
+    the first row was fetched, since the rows yielded so far cannot be taken back.
+"""
+
+        for attempt in xrange( self._retries + 1 ):
+            cursor = self._backend.stream_cursor( self._serv )
+            try:
+                if args is None:
+                    cursor.execute( query )
+                else:
+                    cursor.execute( query, args )
+                break
+            except DatabaseError as e:
+                cursor.close( )
+                if not self._backend.is_disconnect( e ) or attempt == self._retries:
+                    raise
+                self._spill( "Lost the database connection ({}), reconnecting..." . format( e ) )
+                self._reconnect( )
+
+        try:
+            while True:
+                rows = cursor.fetchmany( self._fetch_batch )
+                if not rows:
+                    break
+                for r in rows:
+                    yield r
+        finally:
+            cursor.close( )  # also discards unread rows if the consumer stopped early
+
+
+    def _reconnect( self ):
+        """replace the lost connection and restore the session variables set with _set_session on the new one"""
+
+        self._serv = self._backend.reconnect( self._serv )
+        self._cursor = self._serv.cursor( )
+        if self._session:
+            self._cursor.execute( "SET " + ", " . join( [  "{} = {}" . format( k, v ) for k, v in sorted( self._session.items( ) )  ] ) )
+
+
+    def _set_session( self, settings, keep = True ):
+        """set session variables (SET name = value, ...) from a dictionary
+    - keep: set them again on the new connection after a reconnect (otherwise they are forgotten, e.g. when restoring the defaults)
+"""
+
+        self._execute( "SET " + ", " . join( [  "{} = {}" . format( k, v ) for k, v in sorted( settings.items( ) )  ] ) )
+        for k, v in settings.iteritems( ):
+            if keep:
+                self._session[ k ] = v
+            else:
+                self._session.pop( k, None )
+
+
     def _commit_db( self ):
         """induce the necessary SQL command to commit all executed INSERT, UPDATE, and DELETE statements"""
         self._serv.commit( )
@@ -10,17 +10,49 @@ from __future__ import print_function
 import sys, os, re, tempfile
 import math  # for log10 and ceil
 import codecs  # for file objects ('open( )') with utf-8 writer support
-from Bio import SeqIO
 from operator import itemgetter
-from glob import glob
+from collections import defaultdict, Counter
+import hashlib
+from glob import has_magic
 from getpass import getpass
-import MySQLdb
+import ConfigParser
 from xml.dom.minidom import parse
 import time
+from multiprocessing import Pool
+from miRNexpander import RunProfile
 from miRNexpander.DatabaseTools.DatabaseConnector import DatabaseConnector
+from miRNexpander.DatabaseTools.Backends import DatabaseError, DatabaseWarning
+from miRNexpander.DatabaseTools.LRUCache import LRUCache
+from miRNexpander.DatabaseTools.SQLTemplates import SQLTemplates
+from miRNexpander.DatabaseTools.GeneStore import GeneStore, peak_rss
+from miRNexpander.DatabaseTools.InputFiles import open_input, find_inputs, strip_compression
 from miRNexpander.DatabaseTools.SpeciesChecker import get_latin_abbr, get_scientific_name
 
 
+_reader = None  # DatabaseHandler of a process pool worker, see _init_reader( )
+
+def _init_reader( conf ):
+    """connect a process pool worker to the database"""
+
+    global _reader
+    _reader = DatabaseHandler( )
+    _reader.connect( conf )
+
+
+def _run_reader( job ):
+    """read the input of a table in a process pool worker and return ( tables, inserts, seconds spent reading ), with inserts None if reading failed"""
+
+    ( tables, db_files, sep ) = job
+    start = time.time( )
+    try:
+        inserts = _reader.getConfItem( "db_input_methods" )[ tables[ 0 ] ]( db_files, sep )
+    except IOError:
+        return ( tables, None, time.time( ) - start )  # read again by update_db, which reports the error
+    if type( inserts ) == dict:  # row iterables are materialized, since only picklable values can be returned
+        inserts = dict( [  ( t, v if type( v ) == list else [ tuple( r ) for r in v ] ) for t, v in inserts.iteritems( )  ] )
+    return ( tables, inserts, time.time( ) - start )
+
+
 class DatabaseHandler( DatabaseConnector ):
     """setup, update and query the database"""
 
@@ -29,6 +61,7 @@ class DatabaseHandler( DatabaseConnector ):
         DatabaseConnector.__init__( self )
 
         self._setup_order = [ "DROP", "CREATE", "INSERT" ]  # the usual query order for database setups/updates
+        self._streaming_readers = ( "_read_genes_file", )  # readers returning row generators, never run in a process pool
         self._db_input_methods = {
                 "Actors" . lower( ) : self._read_genes_file,
                 "Actor_aliases" . lower( ) : self._read_genes_file,
@@ -53,6 +86,29 @@ class DatabaseHandler( DatabaseConnector ):
                 }
         self._allowed_species = None
         self._db_restriction = None
+        self._alias_cache = None  # LRUCache for query_for_references, set up in connect( )
+        self._templates = None  # SQLTemplates for the query_for_* methods, set up in connect( )
+        self._alias_lc = None  # whether Actor_aliases has the lower-cased Alias_lc column (see SchemaMigrator), checked on first use
+        self._alias_index = None  # AliasIndex for query_for_references and query_for_aliases, loaded on first use (False if missing or outdated)
+        self._alias_index_path = None  # directory of the alias index, set up in connect( )
+        self._alias_tables = ( "Actor_aliases", "Actors", "Actor_xrefs" )  # tables the alias index is built from
+        self._actor_manifest_path = "<Actors, Actor_aliases, Actor_xrefs>"  # manifest entry of interaction tables for the state of the actor tables (see update_db)
+        self._neighbourhood_index = None  # NeighbourhoodIndex for expand_shell, loaded on first use (False if missing or outdated)
+        self._neighbourhood_index_path = None  # directory of the neighbourhood index, set up in connect( )
+        self._two_hop_max = 10000  # largest 2-hop neighbour set stored in the neighbourhood index
+        self._build_cache_path = None  # directory of the network build cache (see NetworkCreator.createNetwork), set up in connect( )
+        self._build_cache_mb = 512  # size budget of the network build cache
+        self._manifest_checked = False
+        self._manifest_schema = """CREATE TABLE IF NOT EXISTS `Update_manifest` (
+                `tablename` VARCHAR(64) NOT NULL,
+                `path` VARCHAR(255) NOT NULL,
+                `size` BIGINT NOT NULL,
+                `mtime` BIGINT NOT NULL,
+                `sha1` CHAR(40) NOT NULL,
+                `release` VARCHAR(40) NOT NULL DEFAULT '',
+                `reldate` VARCHAR(40) NOT NULL DEFAULT '',
+                `updated` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (`tablename`, `path`) ) ENGINE = InnoDB"""
 
         self.unknown_entity = int( 1e9 )  # located at border between genes and complexes; MySQL int is 4 bytes signed, so max is 2.147e9
 
@@ -62,12 +118,6 @@ class DatabaseHandler( DatabaseConnector ):
                         }
         self._key_replace = re.compile( "[^a-z0-9.]" )
 
-        from MySQLdb.converters import conversions #as self._mysql_escape_conversions
-        from _mysql import escape #as self._mysql_escape
-        self._mysql_escape_conversions = conversions
-        self._mysql_escape = escape
-        del conversions, escape
-
 
     def connect( self, conf ):
         """add some method definitions to the configuration"""
@@ -75,9 +125,58 @@ class DatabaseHandler( DatabaseConnector ):
         res = DatabaseConnector.connect( self, conf )
         self._db_restriction = self.getConfItem( "query_dbs" )
         self._add_to_conf( "db_input_methods", self._db_input_methods )
+
+        try:
+            cache_mb = self._config.getfloat( 'database', 'alias_cache_mb' )
+        except ( ConfigParser.NoOptionError, ValueError ):
+            cache_mb = 64
+        if cache_mb > 0:
+            self._alias_cache = LRUCache( int( cache_mb * 2 ** 20 ) )
+        else:
+            self._alias_cache = None
+        try:
+            self._alias_index_path = self._config.get( 'database', 'alias_index' ) or None
+        except ConfigParser.NoOptionError:
+            pass  # no alias index
+        try:
+            self._neighbourhood_index_path = self._config.get( 'database', 'neighbourhood_index' ) or None
+        except ConfigParser.NoOptionError:
+            pass  # no neighbourhood index
+        try:
+            self._two_hop_max = self._config.getint( 'database', 'two_hop_max' )
+        except ( ConfigParser.NoOptionError, ValueError ):
+            pass
+        try:
+            self._build_cache_path = self._config.get( 'database', 'build_cache' ) or None
+        except ConfigParser.NoOptionError:
+            pass  # no build cache
+        try:
+            self._build_cache_mb = self._config.getfloat( 'database', 'build_cache_mb' )
+        except ( ConfigParser.NoOptionError, ValueError ):
+            pass
+        if self._backend != None:
+            self._templates = SQLTemplates( self.getSQLMapping( ), self._backend.placeholder )
+
         return res
 
 
+    def _per_connection( self ):
+        """return fresh values of the fields that every handler (and clone) keeps for itself, see DatabaseConnector.clone( )"""
+
+        fields = DatabaseConnector._per_connection( self )
+        fields[ "_allowed_species" ] = None if self._allowed_species is None else type( self._allowed_species )( self._allowed_species )  # set per request by the service workers
+        fields[ "_db_restriction" ] = None if self._db_restriction is None else set( self._db_restriction )
+        return fields
+
+
+    def getAliasCacheStats( self ):
+        """return usage statistics of the alias resolution cache (None if caching is disabled)"""
+
+        if self._alias_cache is None:
+            return None
+        return self._alias_cache.stats( )
+
+
 ############################################################
 #### SETUP/UPDATE METHODS                               ####
 ############################################################
@@ -106,23 +205,38 @@ class DatabaseHandler( DatabaseConnector ):
                 "complexes" : "Complexes",
                 "mirbase" : "miRBase",
         }
-        # empty the database by redoing the setup; this drops the whole database schema and is very fast
-        user = self._config.get( 'database', 'user' )
-        db = self._config.get( 'database', 'database' )
-        prompt = """You have requested to update the whole database. This may take minutes to several hours to complete.
+        if self._backend.name == "sqlite":
+            # recreate the tables in the database file from the (translated) schema
+            with open( "database_schema.sql" ) as f:
+                for statement in self._backend.ddl( f.read( ) ):
+                    if self._sql( statement ) == 1:
+                        self._spill( "There was a problem while emptying the database. Please do a manual setup using database_schema.sql!" )
+                        sys.exit( )
+            self._alias_lc = None
+            self._manifest_checked = False
+        else:
+            # empty the database by redoing the setup; this drops the whole database schema and is very fast
+            user = self._config.get( 'database', 'user' )
+            db = self._config.get( 'database', 'database' )
+            prompt = """You have requested to update the whole database. This may take minutes to several hours to complete.
 You will have to wait for the update to finish before you can run queries
 WARNING: Before anything else, all database content will be dropped if you enter the correct password!
 To proceed, enter the database password for MySQL user {}: """ . format( user )
-        if os.system( "mysql -u {} --password={} {} < database_schema.sql" . format( user, getpass( prompt ), db ) ):
-            self._spill( "There was a problem while emptying the database. Please do a manual setup using database_schema.sql!" )
-            sys.exit( )
+            if os.system( "mysql -u {} --password={} {} < database_schema.sql" . format( user, getpass( prompt ), db ) ):
+                self._spill( "There was a problem while emptying the database. Please do a manual setup using database_schema.sql!" )
+                sys.exit( )
         self._spill( "Database was emptied - starting update process..." )
         for tables in [ "taxa", "taxon_aliases", "actor_xrefs" ], [ "actor_roles", "actors", "actor_aliases", "complexes", "mirbase" ]:
             self.update_db( tables )
 
 
-    def update_db( self, table_list, target_list = [ ], source_list = [ ], always_update = False ):
-        """reload the specified databases, write SQL to the specified files, use the specified input files"""
+    def update_db( self, table_list, target_list = [ ], source_list = [ ], always_update = False, force = False ):
+        """reload the specified databases, write SQL to the specified files, use the specified input files
+
+        Tables whose input files are unchanged since their last update (see Update_manifest) are skipped,
+        and interaction tables only receive the rows that changed, unless force is set. Interaction
+        tables are not skipped after the actor tables changed, since their a_ids may have shifted.
+"""
 
         # 1st condition line checks: update the listed databases, or all of them (if True)
         # 2nd condition line checks: write to the listed sql files, or the standard ones (if True)
@@ -147,7 +261,62 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         table_list = dict( [  ( t, self.getTableConf( t )[ "update-order" ] ) for t in tables  ] )
         table_list = zip( *sorted( table_list.iteritems( ), key = itemgetter( 1 ) ) )[ 0 ]
         lowered_set = { t.lower( ) for t in table_list }
-
+        self._ensure_manifest_table( )
+        scans = { }  # input files -> manifest entries, so that every file is hashed at most once
+
+        ### internal subroutines ###
+        def _input_manifest( c, db_files ):
+            """return the stored and the current manifest of a table's input files
+    - interaction tables (with a src entry) also record the manifest digest of the actor tables, since their a_ids are resolved against these
+"""
+
+            previous = self._read_manifest( c[ "name" ] )
+            key = tuple( db_files )
+            if key not in scans:
+                scans[ key ] = self._scan_inputs( db_files, previous )
+            current = dict( [  ( path, v + ( c.get( "release", "" ), c.get( "reldate", "" ) ) ) for path, v in scans[ key ].iteritems( )  ] )
+            if "src" in c:
+                current[ self._actor_manifest_path ] = ( 0, 0, self.getManifestDigest( self._alias_tables ) or "", "", "" )
+            return ( previous, current )
+
+        def _unchanged( previous, current ):
+            """return whether the input files have the same size, content, and release as recorded before"""
+
+            if force or not previous or set( previous ) != set( current ):
+                return False
+            return all( [  previous[ path ][ 0 ] == v[ 0 ] and previous[ path ][ 2: ] == v[ 2: ] for path, v in current.iteritems( )  ] )
+
+        def _wave_jobs( start ):
+            """return ( table, files, separator ) reader jobs for the tables sharing the update order of table_list[ start ]"""
+
+            jobs = [ ]
+            order = self.getTableConf( table_list[ start ] )[ "update-order" ]
+            for j in xrange( start, len( table_list ) ):
+                tj = table_list[ j ].lower( )
+                c = self.getTableConf( tj )
+                try:
+                    if c[ "update-order" ] != order:
+                        break  # table_list is sorted by update order
+                    c[ "sources" ]
+                except ( TypeError, KeyError ):
+                    continue
+                if tj not in lowered_set or tj not in self.getConfItem( "db_input_methods" ) \
+                    or not always_update and unspecific and not c[ "update" ]:
+                    continue
+                try:
+                    sources = source_list[ j ]
+                except ( IndexError, TypeError ):
+                    sources = None
+                ( db_files, sep ) = self._update_input( c, sources )
+                if not _unchanged( *_input_manifest( c, db_files ) ):
+                    jobs.append( ( tj, db_files, sep ) )
+            return jobs
+
+        ### end of internal subroutines ###
+
+        updated = set( )  # tables that were rewritten
+        wave = None  # update order of the tables whose input was read ahead
+        prefetched = { }  # table -> ( inserts, seconds spent reading ), see _prefetch_inputs( )
         #print( "List: ", table_list )
         for i in xrange( len( table_list ) ):
             table = table_list[ i ]
@@ -171,15 +340,25 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
                     self._spill( "Updates for database {!r} disabled in configuration, skipping." . format( table ) )
                     continue
 
-            self._spill( "Processing input for {}..." . format( table_name ) )
             try:
-                db_files = source_list[ i ].split( "," )  # fails if source_list[ i ] is non-existing or None
+                sources = source_list[ i ]
             except ( IndexError, TypeError ):
-                db_files = t_conf[ "paths" ]
+                sources = None
+            ( db_files, sep ) = self._update_input( t_conf, sources )
+
+            ( previous, manifest ) = _input_manifest( t_conf, db_files )
+            if _unchanged( previous, manifest ):
+                if any( [  previous[ path ][ 1 ] != v[ 1 ] for path, v in manifest.iteritems( )  ] ):
+                    self._write_manifest( table_name, manifest )  # files were only touched, remember the new timestamps
+                self._spill( "Input for {} is unchanged since the last update, skipping." . format( table_name ) )
+                continue
 
-            sep = t_conf[ "sep" ]
-            if sep == r"\t":
-                sep = "\t"
+            # tables with the same update order do not depend on each other, so their input can be read concurrently
+            if self._workers > 1 and t_conf[ "update-order" ] != wave:
+                wave = t_conf[ "update-order" ]
+                prefetched = self._prefetch_inputs( _wave_jobs( i ) )
+
+            self._spill( "Processing input for {}..." . format( table_name ) )
 
             try:
                 input_method = self.getConfItem( "db_input_methods" )[ tl ]
@@ -187,7 +366,17 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
                 self._alert( "Warning: No method definition for database {!r}, skipping update." . format( table ) )
                 continue
 
-            inserts = input_method( db_files, sep )
+            try:
+                ( inserts, read_time ) = prefetched.pop( tl )
+            except KeyError:
+                start = time.time( )
+                try:
+                    inserts = input_method( db_files, sep )
+                except IOError as e:  # e.g. a truncated compressed file, which must not be recorded as loaded
+                    self._alert( "Failed to read the input of {}, the table is left unchanged: {}" . format( table_name, e ) )
+                    continue
+                read_time = time.time( ) - start
+            start = time.time( )
 
             try:
                 write_file = target_list[ i ]
@@ -199,7 +388,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
 
             ### internal subroutine ###
             def _insert_template( out_type, elements, row_length = None ):
-                """return a structured string of MySQL-escaped values"""
+                """return a structured string of SQL-escaped values"""
 
                 count = len( elements )
                 if count < 1:
@@ -220,11 +409,11 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
                     while c < rows:
                         rem = min( row_limit_per_query, rows - c )
                         h = ",\n\t" . join( [ "( " + ", " . join( [ "{}" ] * row_length ) + " )" ] * rem ) + ";\n\n"
-                        s.append( h.format( *self._mysql_escape( elements[ c * row_length : ( c + rem ) * row_length ], self._mysql_escape_conversions ) ) )
+                        s.append( h.format( *self._sqlescape( elements[ c * row_length : ( c + rem ) * row_length ] ) ) )
                         c += row_limit_per_query
                 elif out_type == "txt":
                     s = [ "\n" . join( [ "\t" . join( [ "{}" ] * row_length ) ] * rows ) + "\n" ]
-                    s[ 0 ] = s[ 0 ].format( *self._mysql_escape( elements, self._mysql_escape_conversions ) )
+                    s[ 0 ] = s[ 0 ].format( *self._sqlescape( elements ) )
                 else:
                     s = [ "" ]
                 return s
@@ -232,6 +421,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
             ### end of internal subroutine ###
 
             ( queries, elements_per_row ) = self._prepare_setup_frame( inserts.keys( ) )
+            bulk_tables = self.getBulkLoadTables( )
             #print( table_list, inserts.keys( ), queries.keys( ), elements_per_row.keys( ) )
             for table in table_list:
                 if table.lower( ) not in {  q.lower( ) for q in queries  }:  # prevents another table that is read from the same file from updating
@@ -247,21 +437,42 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
                 # add inserts
                 ins_stmt = queries[ table ][ self._setup_order[ 2 ] ]
                 queries[ table ][ self._setup_order[ 2 ] ] = [ ]
+                mysql_table = re.match( r"INSERT INTO (\S+) (?:\(.*\) )?VALUES", ins_stmt ).group( 1 )
+
+                if { table.lower( ), mysql_table.lower( ) } & bulk_tables:
+                    # stream the rows to a tab-separated file and let the server read it in one go
+                    self._spill( "Processing table setup for {} (bulk load)..." . format( table ) )
+                    self._execute_setup_queries( "sql", queries[ table ] )  # only runs the DROP/DELETE statement here
+                    self._bulk_load( mysql_table, self._iter_rows( inserts[ table ], elements_per_row[ table ] ) )
+                    inserts[ table ] = None  # allow the rows to be garbage-collected before the next table is processed
+                    self._write_manifest( mysql_table, manifest )
+                    self._invalidate_caches( table )
+                    continue
+
+                if not force and not write_file and "src" in ( self.getTableConf( table ) or { } ) and self._read_manifest( mysql_table ):
+                    # the interaction table was filled before, so only the difference needs to be applied
+                    self._spill( "Processing table setup for {} (changed rows only)..." . format( table ) )
+                    self._apply_row_diff( mysql_table, self._iter_rows( inserts[ table ], elements_per_row[ table ] ) )
+                    inserts[ table ] = None
+                    self._write_manifest( mysql_table, manifest )
+                    self._invalidate_caches( table )
+                    continue
+
+                if type( inserts[ table ] ) != list:  # row iterables are flattened for the INSERT path
+                    inserts[ table ] = [  v for row in inserts[ table ] for v in row  ]
                 #for ins in _insert_template( t_conf[ "write" ], inserts[ table ], elements_per_row[ table ] ):
                 for ins in _insert_template( "sql", inserts[ table ], elements_per_row[ table ] ):
                     queries[ table ][ self._setup_order[ 2 ] ].append( ins_stmt + ins )
-#            tmp = tempfile.NamedTemporaryFile( )
-#            tmp.write( queries[ -1 ] )
-#            LOAD DATA LOCAL INFILE "/tmp/taxa.sql" REPLACE INTO TABLE taxa IGNORE 1 LINES
-#            Need to start mysql client with --local-infile=1 for the above to work.
 
                 self._spill( "Processing table setup for {}..." . format( table ) )
                 with codecs.open( "data/sql/" + table + ".sql", "w", "utf-8" ) as f:
                     for l in queries[ table ][ "INSERT" ]:
                         f.write( l )
                 #self._execute_setup_queries( t_conf[ "write" ], queries[ table ] )
-                if table != "actor_aliases":
+                if table != "actor_aliases":  # loaded from data/sql/actor_aliases.sql outside of update_db
                     self._execute_setup_queries( "sql", queries[ table ] )
+                self._write_manifest( mysql_table, manifest )  # the inputs of the SQL file, so that indexes built on the former aliases count as outdated
+                self._invalidate_caches( table )
 
 
             #if table not in self.getHardcodedTables( ):
@@ -269,6 +480,48 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
             #    self._resolve_table_dependencies( queries )
             self._spill( "...Table setup finished." )
             self._store_setup_data( t_conf[ "write" ], queries, write_file )
+            self._spill( "Timing for {}: {:.1f} s reading, {:.1f} s loading." . format( ", " . join( sorted( queries ) ), read_time, time.time( ) - start ) )
+            if self._alias_index_path and set( [  q.lower( ) for q in queries  ] ) & set( [  t.lower( ) for t in self._alias_tables  ] ):
+                self.writeAliasIndex( )
+            updated |= set( [  q.lower( ) for q in queries  ] )
+
+        # the neighbourhood index covers all interaction tables, so it is rewritten once after all of them were updated
+        if self._neighbourhood_index_path and updated & set( [  t.lower( ) for t in self._neighbourhood_sources( )  ] ):
+            self.writeNeighbourhoodIndex( )
+
+
+    def writeAliasIndex( self, path = None ):
+        """write the memory-mapped alias index (see AliasIndex) to path (default: the alias_index directory of the configuration), return the number of aliases"""
+
+        path = path or self._alias_index_path
+        if not path:
+            self._alert( "No directory for the alias index given (see alias_index in the [database] section)." )
+            return 0
+        try:
+            from miRNexpander.DatabaseTools.AliasIndex import AliasIndex  # numpy is only needed here
+        except ImportError:
+            self._alert( "The alias index requires numpy, skipping it." )
+            return 0
+        count = AliasIndex.export( self, path, self.getManifestDigest( self._alias_tables ) )
+        self._alias_index = None
+        return count
+
+
+    def writeNeighbourhoodIndex( self, path = None ):
+        """write the compressed neighbourhood index (see NeighbourhoodIndex) of all queryable interaction tables to path (default: the neighbourhood_index directory of the configuration), return the number of interactions"""
+
+        path = path or self._neighbourhood_index_path
+        if not path:
+            self._alert( "No directory for the neighbourhood index given (see neighbourhood_index in the [database] section)." )
+            return 0
+        try:
+            from miRNexpander.DatabaseTools.NeighbourhoodIndex import NeighbourhoodIndex  # numpy is only needed here
+        except ImportError:
+            self._alert( "The neighbourhood index requires numpy, skipping it." )
+            return 0
+        count = NeighbourhoodIndex.export( self, path, self._neighbourhood_tables( ), self.getManifestDigest( self._neighbourhood_sources( ) ), self._two_hop_max )
+        self._neighbourhood_index = None
+        return count
 
 
     ############################################################
@@ -289,13 +542,13 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         if set( [ "taxa", "taxon_aliases" ] ) & set( db_ids ):
             queries = {
                 "taxa" : {
-                    "CREATE" : "SHOW TABLES;",
-                    "DROP" : "SHOW TABLES;",
+                    "CREATE" : "SELECT 1;",
+                    "DROP" : "SELECT 1;",
                     "INSERT" : "INSERT INTO Taxa VALUES\n\t"
                 },
                 "taxon_aliases" : {
-                    "CREATE" : "SHOW TABLES;",
-                    "DROP" : "SHOW TABLES;",
+                    "CREATE" : "SELECT 1;",
+                    "DROP" : "SELECT 1;",
                     "INSERT" : "INSERT INTO Taxon_aliases VALUES\n\t"
                 },
             }
@@ -307,33 +560,33 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         elif set( [ "actors", "actor_roles", "actor_xrefs", "actor_aliases", "complexes", "mirbase" ] ) & set( db_ids ):
             queries = {
                 "actor_roles" : {
-                    "CREATE" : "SHOW TABLES;",
-                    "DROP" : "SHOW TABLES;",
+                    "CREATE" : "SELECT 1;",
+                    "DROP" : "SELECT 1;",
                     "INSERT" : "INSERT INTO Actor_roles VALUES\n\t",
                 },
                 "actors" : {
-                    "CREATE" : "SHOW TABLES;",
-                    "DROP" : "SHOW TABLES;",
+                    "CREATE" : "SELECT 1;",
+                    "DROP" : "SELECT 1;",
                     "INSERT" : "INSERT INTO Actors VALUES\n\t",
                 },
                 "actor_aliases" : {
-                    "CREATE" : "SHOW TABLES;",
-                    "DROP" : "SHOW TABLES;",
-                    "INSERT" : "INSERT INTO Actor_aliases VALUES\n\t",
+                    "CREATE" : "SELECT 1;",
+                    "DROP" : "SELECT 1;",
+                    "INSERT" : "INSERT INTO Actor_aliases ( `ref`, `Alias`, `type` ) VALUES\n\t",  # Alias_lc is generated (see SchemaMigrator)
                 },
                 "actor_xrefs" : {
-                    "CREATE" : "SHOW TABLES;",
-                    "DROP" : "SHOW TABLES;",
+                    "CREATE" : "SELECT 1;",
+                    "DROP" : "SELECT 1;",
                     "INSERT" : "INSERT INTO Actor_xrefs VALUES\n\t",
                 },
                 "complexes" : {
-                    "CREATE" : "SHOW TABLES;",
-                    "DROP" : "SHOW TABLES;",
+                    "CREATE" : "SELECT 1;",
+                    "DROP" : "SELECT 1;",
                     "INSERT" : "INSERT INTO Complexes VALUES\n\t",
                 },
                 "mirbase" : {
-                    "CREATE" : "SHOW TABLES;",
-                    "DROP" : "SHOW TABLES;",
+                    "CREATE" : "SELECT 1;",
+                    "DROP" : "SELECT 1;",
                     "INSERT" : "INSERT INTO miRBase VALUES\n\t",
                 },
             }
@@ -353,14 +606,14 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
 
             # extract information for this table
             if table_id in self.getHardcodedTables( ):
-                t = dict( name = table_id, columns = self._sql( "SHOW COLUMNS IN {};" . format( table_id ) ) )
+                t = dict( name = table_id, columns = [  c[ 0 ] for c in self._table_columns( table_id )  ] )
                 delete_table_stmt = "DELETE FROM {};\n" . format( t[ "name" ] )
-                create_table_stmt = "SHOW TABLES;\n"  # stand in since MySQL does not accept empty commands
+                create_table_stmt = "SELECT 1;\n"  # stand in since MySQL does not accept empty commands
                 hardcoded = True
             else:
                 t = self.getTableConf( table_id )
                 delete_table_stmt = "DELETE FROM {};\n" . format( t[ "name" ] )
-                create_table_stmt = "SHOW TABLES;\n"  # stand in since MySQL does not accept empty commands
+                create_table_stmt = "SELECT 1;\n"  # stand in since MySQL does not accept empty commands
 
             if out_type == "sql":
                 insert_scaffold = "INSERT INTO {} VALUES\n\t" . format( t[ "name" ] )
@@ -380,6 +633,258 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         return ( queries, elements )
 
 
+    def getManifestDigest( self, tables = None ):
+        """return a SHA-1 digest over the recorded input files of all (or the given) tables, which changes whenever any of them is updated (None if no input files are recorded)"""
+
+        self._ensure_manifest_table( )
+        where = "WHERE `tablename` IN ( {} ) " . format( self._sqllist( tables ) ) if tables else ""
+        rows = self._sql( "SELECT `tablename`, `path`, `size`, `sha1`, `release`, `reldate` FROM `Update_manifest` {}ORDER BY `tablename`, `path`" . format( where ) )
+        if rows == 1 or not rows:
+            return None
+        return hashlib.sha1( "\n" . join( [  "\t" . join( map( str, r ) ) for r in rows  ] ) ).hexdigest( )
+
+
+    def _ensure_manifest_table( self ):
+        """create the bookkeeping table for input files in databases set up before it existed (see database_schema.sql)"""
+
+        if not self._manifest_checked:
+            for statement in self._backend.ddl( self._manifest_schema ):
+                self._sql( statement )
+            self._manifest_checked = True
+
+
+    def _read_manifest( self, table_name ):
+        """return { path : ( size, mtime, sha1, release, reldate ) } as recorded by the last update of the table"""
+
+        rows = self._sql( "SELECT `path`, `size`, `mtime`, `sha1`, `release`, `reldate` FROM `Update_manifest` WHERE `tablename` = {}" . format( self._sqllist( [ table_name ] ) ) )
+        if rows == 1:
+            return { }
+        return dict( [  ( r[ 0 ], ( int( r[ 1 ] ), int( r[ 2 ] ), r[ 3 ], r[ 4 ], r[ 5 ] ) ) for r in rows  ] )
+
+
+    def _write_manifest( self, table_name, manifest ):
+        """replace the recorded input files of the table"""
+
+        self._sql( "DELETE FROM `Update_manifest` WHERE `tablename` = {}" . format( self._sqllist( [ table_name ] ) ) )
+        if manifest:
+            self._sql( "INSERT INTO `Update_manifest` ( `tablename`, `path`, `size`, `mtime`, `sha1`, `release`, `reldate` ) VALUES\n\t( {} )" . format(
+                " ),\n\t( " . join( [  self._sqllist( ( table_name, path ) + v ) for path, v in sorted( manifest.iteritems( ) )  ] ) ) )
+        self._commit_db( )
+
+
+    def _scan_inputs( self, db_files, known = { } ):
+        """return { path : ( size, mtime, sha1 ) } of the input files; hashes in known are reused for files of unchanged size and mtime"""
+
+        result = { }
+        for pattern in db_files:
+            for path in ( find_inputs( pattern ) if has_magic( pattern ) else [ pattern ] ):
+                try:
+                    st = os.stat( path )
+                except OSError:
+                    continue  # missing files are reported by the readers
+                size, mtime = st.st_size, int( st.st_mtime )
+                try:
+                    if known[ path ][ :2 ] == ( size, mtime ):
+                        result[ path ] = known[ path ][ :3 ]
+                        continue
+                except KeyError:
+                    pass
+                h = hashlib.sha1( )
+                with open( path, "rb" ) as f:
+                    for block in iter( lambda: f.read( 2 ** 20 ), "" ):
+                        h.update( block )
+                result[ path ] = ( size, mtime, h.hexdigest( ) )
+        return result
+
+
+    def _apply_row_diff( self, table_name, rows ):
+        """bring the table in line with rows by deleting vanished and inserting new rows only"""
+
+        def norm( row ):
+            return tuple( [  v if isinstance( v, basestring ) or v is None else str( v ) for v in row  ] )
+
+        columns = self._writable_columns( table_name )
+        wanted = Counter( [  norm( r ) for r in rows  ] )
+        present = Counter( [  norm( r ) for r in self._sql( "SELECT {} FROM `{}`" . format( ", " . join( [  "`{}`" . format( c ) for c in columns  ] ), table_name ) ) ] )
+        vanished = present - wanted
+        added = wanted - present
+        self._spill( "\t-> {} rows vanished, {} rows added, {} rows unchanged." . format( sum( vanished.values( ) ), sum( added.values( ) ), sum( ( wanted & present ).values( ) ) ) )
+
+        try:
+            if vanished:
+                query = self._backend.delete_one( table_name, columns )
+                self._execute( query, list( vanished.elements( ) ), many = True )
+            if added:
+                query = "INSERT INTO `{}` ( {} ) VALUES ( {} )" . format( table_name, ", " . join( [  "`{}`" . format( c ) for c in columns  ] ), ", " . join( [ self._backend.placeholder ] * len( columns ) ) )
+                self._execute( query, list( added.elements( ) ), many = True )
+        except DatabaseWarning:
+            pass
+        except DatabaseError as e:
+            self._alert( "SQL QUERY Error.\nDescription: {}\nQuery started with:\n{!r}\n" . format( e, query[ 0:76 ] ) )
+        self._commit_db( )
+
+
+    def _update_input( self, t_conf, sources ):
+        """return the input files (comma-separated sources or the configured paths) and the field separator of a table"""
+
+        try:
+            db_files = sources.split( "," )  # fails if sources is None
+        except AttributeError:
+            db_files = t_conf[ "paths" ]
+        # missing input files may be present in compressed form
+        db_files = [  f if has_magic( f ) or os.path.exists( f ) else ( find_inputs( f ) or [ f ] )[ 0 ] for f in db_files  ]
+
+        sep = t_conf[ "sep" ]
+        if sep == r"\t":
+            sep = "\t"
+        return ( db_files, sep )
+
+
+    def _prefetch_inputs( self, jobs ):
+        """read the input of independent tables in a process pool and return { table : ( inserts, seconds spent reading ) }
+
+        - jobs: ( table, files, separator ) tuples; tables sharing a reader and its input files are read only once
+"""
+
+        groups = { }
+        for tl, db_files, sep in jobs:
+            reader = self.getConfItem( "db_input_methods" )[ tl ]
+            if reader.__name__ in self._streaming_readers:
+                continue  # streamed output cannot be sent between processes, so these are read when loading
+            groups.setdefault( ( reader.__name__, tuple( db_files ), sep ), [ ] ).append( tl )
+        if len( groups ) < 2:
+            return { }  # nothing to gain from a process pool
+
+        self._spill( "Reading input for {} tables in up to {} processes..." . format( len( groups ), self._workers ) )
+        result = { }
+        pool = Pool( min( self._workers, len( groups ) ), _init_reader, ( self._config, ) )
+        try:
+            for tables, inserts, elapsed in pool.imap_unordered( _run_reader, [  ( tables, list( k[ 1 ] ), k[ 2 ] ) for k, tables in groups.iteritems( )  ] ):
+                if inserts is None:
+                    continue
+                self._spill( "\t-> Input for {} read in {:.1f} s." . format( ", " . join( tables ), elapsed ) )
+                result.update( [  ( tl, ( inserts, elapsed ) ) for tl in tables  ] )
+        finally:
+            pool.close( )
+            pool.join( )
+        return result
+
+
+    def _iter_rows( self, elements, row_length ):
+        """return an iterator over the rows of elements, which is either a flat list of values or an iterable of rows"""
+
+        if type( elements ) == list:
+            return (  elements[ i : i + row_length ] for i in xrange( 0, len( elements ), row_length )  )
+        return iter( elements )
+
+
+    def _tsvescape( self, value ):
+        """return value as a field of a tab-separated file in the format expected by LOAD DATA INFILE"""
+
+        if value is None:
+            return "\\N"
+        elif type( value ) == bool:
+            return str( int( value ) )
+        elif type( value ) == float:
+            return repr( value )
+        elif type( value ) == unicode:
+            value = value.encode( "utf-8" )
+        else:
+            value = str( value )
+        return value.replace( "\\", "\\\\" ).replace( "\t", "\\t" ).replace( "\n", "\\n" ).replace( "\r", "\\r" ).replace( "\0", "\\0" )
+
+
+    def _bulk_load( self, table_name, rows ):
+        """write rows to a temporary tab-separated file and fill the table from it via LOAD DATA LOCAL INFILE"""
+
+        if not self._backend.local_infile:
+            return self._insert_batches( table_name, rows )
+
+        count = 0
+        with tempfile.NamedTemporaryFile( prefix = table_name + "_", suffix = ".tsv", delete = False ) as tmp:
+            for row in rows:
+                tmp.write( "\t" . join( [  self._tsvescape( v ) for v in row  ] ) + "\n" )
+                count += 1
+
+        # index maintenance and consistency checks are deferred until all rows are in (the checks also after a reconnect, see _set_session)
+        statements = [
+            ( dict( unique_checks = 0, foreign_key_checks = 0 ), True ),
+            "ALTER TABLE `{}` DISABLE KEYS;" . format( table_name ),
+            "LOAD DATA LOCAL INFILE {} INTO TABLE `{}` CHARACTER SET utf8\n\tFIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'\n\tLINES TERMINATED BY '\\n'\n\t( {} );" . format( self._sqlescape( [ tmp.name ] )[ 0 ], table_name, ", " . join( [  "`{}`" . format( c ) for c in self._writable_columns( table_name )  ] ) ),
+            "ALTER TABLE `{}` ENABLE KEYS;" . format( table_name ),
+            ( dict( unique_checks = 1, foreign_key_checks = 1 ), False ),
+        ]
+        self._spill( "\t-> Loading {} rows into {}..." . format( count, table_name ) )
+        try:
+            for q in statements:
+                try:
+                    if type( q ) == tuple:  # session variables, and whether to restore them after a reconnect
+                        self._set_session( *q )
+                    else:
+                        self._execute( q )
+                except DatabaseWarning:
+                    pass
+                except DatabaseError as e:
+                    self._alert( "SQL QUERY Error.\nDescription: {}\nQuery started with:\n{!r}\n" . format( e, str( q )[ 0:76 ] ) )
+                    continue
+            self._commit_db( )
+        finally:
+            os.remove( tmp.name )
+
+        return count
+
+
+    def _insert_batches( self, table_name, rows ):
+        """fill the table with rows via executemany in batches (for backends without LOAD DATA)"""
+
+        columns = self._writable_columns( table_name )
+        query = "INSERT INTO `{}` ( {} ) VALUES ( {} )" . format( table_name, ", " . join( [  "`{}`" . format( c ) for c in columns  ] ), ", " . join( [ self._backend.placeholder ] * len( columns ) ) )
+        self._spill( "\t-> Loading rows into {}..." . format( table_name ) )
+        count = 0
+        batch = [ ]
+        try:
+            for row in rows:
+                batch.append( row )
+                if len( batch ) >= self._fetch_batch:
+                    self._execute( query, batch, many = True )
+                    count += len( batch )
+                    batch = [ ]
+            if batch:
+                self._execute( query, batch, many = True )
+                count += len( batch )
+        except DatabaseError as e:
+            self._alert( "SQL QUERY Error.\nDescription: {}\nQuery started with:\n{!r}\n" . format( e, query[ 0:76 ] ) )
+        self._commit_db( )
+
+        return count
+
+
+    def _writable_columns( self, table_name ):
+        """return the columns of a table that take values on INSERT, i.e. all but generated columns (in table order)"""
+        return [  c for c, generated in self._table_columns( table_name ) if not generated  ]
+
+
+    def _table_columns( self, table_name ):
+        """return ( name, generated ) for the columns of a table (in table order)"""
+
+        try:
+            return self._backend.columns( self._execute, table_name )
+        except DatabaseError as e:
+            self._alert( "SQL Error.\nDescription: {}\nColumns of table {!r} could not be read.\n" . format( e, table_name ) )
+            return [ ]
+
+
+    def _invalidate_caches( self, table ):
+        """drop cached query results that depend on the given (just rewritten) table"""
+
+        if table.lower( ) in ( "actor_aliases", "actors", "actor_xrefs" ):
+            self._alias_index = None  # check again whether the index is up to date
+            if self._alias_cache is not None:
+                self._alias_cache.clear( )
+        if table.lower( ) in [  t.lower( ) for t in self._neighbourhood_sources( )  ]:
+            self._neighbourhood_index = None
+
+
     def _execute_setup_queries( self, out_type, queries ):
         """execute the queries and commit the database"""
 
@@ -392,10 +897,10 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
             self._spill( "\t-> Executing " + query_type + "..." )
             for q in queries[ query_type ]:
                 try:
-                    self._cursor.execute( q )
-                except MySQLdb.Warning:
+                    self._execute( q )
+                except DatabaseWarning:
                     pass
-                except MySQLdb.Error as e:
+                except DatabaseError as e:
                     self._alert( "SQL QUERY Error.\nDescription: {}\nQuery started with:\n{!r}\n" . format( e, q[ 0:76 ] ) )
                     continue
 
@@ -456,7 +961,8 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         MIRIAM = dict( )  # result variable
         for db_file in db_files:
             try:
-                xml_object = parse( db_file )
+                with open_input( db_file ) as stream:
+                    xml_object = parse( stream )
             except IOError:
                 self._spill( "Unable to read input file {!r}, aborting." . format( db_file ) )
                 continue
@@ -505,7 +1011,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         taxa = dict( )  # result variable
         for db_file in db_files:
             try:
-                stream = open( db_file, "r" )
+                stream = open_input( db_file )
             except IOError as e:
                 self._alert( e.strerror + ": {}" . format ( db_file ) )
                 return taxa
@@ -540,7 +1046,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
 
         for db_file in db_files:
             try:
-                stream = open( db_file, "r" )
+                stream = open_input( db_file )
             except IOError as e:
                 self._alert( e.strerror + ": {}" . format ( db_file ) )
                 return taxa
@@ -585,7 +1091,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
 
         taxo = self.getTableConf( "taxa" )
 
-        nodes_files, names_files = map( glob, taxo[ "paths" ] )
+        nodes_files, names_files = map( find_inputs, taxo[ "paths" ] )
         names_sep = nodes_sep = "|"
 
         d1 = self._read_NCBI_taxnode_files( nodes_files, nodes_sep )
@@ -617,7 +1123,13 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
 
     ### encapsulated method for compiling data from database files ###
     def _read_genes_file( self, db_files, sep ):
-        """read the database file and return a dict of VALUE lists for the INSERT query"""
+        """read the database files and return a dict of row iterables for the INSERT queries
+
+        The input is streamed source by source into an on-disk GeneStore, which joins the
+        cross-references of all sources; rows are only emitted when update_db consumes them.
+        - db_files: gene_info, gene.tab, factor.tab, gene2accession, uniprot_idmapping, miRNA.dat, miRNA_aliases.txt, and drugs.csv files (in this order)
+        - sep: ignored, all files are tab-separated
+"""
 
         monicker = "actor"
         tAnnot = monicker + "s"
@@ -625,11 +1137,6 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         tXrefs = monicker + "_xrefs"
         tRoles = monicker + "_roles"
         tCompl = "complexes"
-        insert_values = {
-                tAnnot : [ ],
-                tAlias : [ ],
-                tCompl : [ ],
-        }
 
         miriam = dict( self._sql( "SELECT `namespace`, `x_id` FROM `Actor_xrefs`" ) )
         # calculate lowest index for additional databases to be inserted (MIRIAM does not account for TRANSFAC, Vega, etc)
@@ -648,342 +1155,264 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
 
         no_gene = self.unknown_entity
 
-        annot = { }
-        complexes = { }
-        drugs = { }
-        xrefs = { no_gene : set( [ ( miriam[ "ncbigene" ], "0" ) ] ) }
-        entrez_mapper = { }
-        aliased_mirnas = { }
-        symbols = { }  # necessary to translate between gene_info and factor.tab
-        uniprot = { }  # necessary to translate between gene_info and drugs.csv
-        transfac = { }  # necessary to translate between gene.tab and factor.tab + site.tab
-        sep = "\t"
-        rem = set( [ "", "-" ] )
-        roles = set( [ "protein", "miRNA", "gene", "transcript" ] )
-        dbf = [ ]
-        for f in map( glob, db_files ):
-            dbf.extend( f )
-        db_files = dbf
-        for db_file in db_files:
-            try:
-                stream = open( db_file, "r" )
-            except IOError as e:
-                self._alert( "Failed to read {}" . format( db_file ) )
-                continue
-            self._spill( "\t-> Reading {}..." . format( os.path.abspath( db_file ) ) )
-            fn = os.path.basename( db_file )
-
-            if fn[ :9 ] == "gene_info":
-                # add every single obscure and un-MIRIAMed database that NCBI loves to reference
-                miriam[ "imgt/gene-db" ] = nmiriam
-                new_miriams.add( ( nmiriam, nm.format( nmiriam ), "IMG/Gene-DB", "imgt.gene_db", "from NCBI's gene_info", "urn:new:imgt.gene_db", "http://www.imgt.org/IMGT_GENE-DB/GENElect?species=Homo+sapiens&query=2+" ) )
-                nmiriam += 1
-
-                miriam[ "mgi" ] = nmiriam
-                new_miriams.add( ( nmiriam, nm.format( nmiriam ), "MGI", "mgi", "JAXLab's MGI mouse database", "urn:new:mgi", "http://www.informatics.jax.org/marker/" ) )
-                nmiriam += 1
-
-                miriam[ "vega" ] = nmiriam
-                new_miriams.add( ( nmiriam, nm.format( nmiriam ), "VEGA", "vega", "from NCBI's gene_info", "urn:new:vega", "http://vega.sanger.ac.uk/id/" ) )
-                nmiriam += 1
-
-                index = len( annot )
-                for record in stream:
-                    line = record.split( sep )
-                    try:
-                        tax_id = line[ 0 ].strip( )
-                        gene_id = int( line[ 1 ].strip( ) )
-                        symbol = line[ 2 ].strip( )
-                        desc = line[ 8 ].strip( )
-                        info = {  "tax_id" : int( tax_id ), "symbol" : symbol, "desc" : desc   }#, "Entrez" : gene_id  }
-
-                        synonyms = set( line[ 4 ].strip( ).split( "|" ) ) - rem
-                        xref = set( zip( [ miriam[ "synonym" ] ] * len( synonyms ), synonyms ) )
-                        xref.add( ( miriam[ "hgnc.symbol" ], symbol ), )
-                        xref.add( ( miriam[ "ncbigene" ], str( gene_id ) ), )
-                        symbols[ tax_id + ":" + symbol ] = gene_id
-                        for dbxref in set( line[ 5 ].strip( ).split( "|" ) ) - rem:
-                            entry = dbxref.split( ":" )
-                            entry[ 0 ] = miriam[ entry[ 0 ].lower( ) ]
-                            entry[ 1 ] = ":" . join( entry[ 1: ] )  # necessary to reconstitute identifiers that contain a colon, e.g. MGI markers
-                            xref.add( tuple( entry ) )
-
-                        annot[ gene_id ] = info
-                        xrefs[ gene_id ] = xref
-
-                    except ( IndexError, ValueError ):
-                        self._alert( "Notice: Incompatible line in {!r}." . format( db_file ) )
-                stream.close( )
-            elif fn[ :8 ] == "gene.tab":
-                #AC ID  SD  OS  DR  BS  RX
+        store = GeneStore( )
+        pending = set( )  # stages whose rows update_db has not consumed yet; the store is closed once none is left
+
+        ### internal subroutine ###
+        def emit( stage, rows ):
+            """return a generator of the rows of a stage that closes the store after the last stage (also if update_db drops or skips the rows)"""
+
+            def generate( ):
                 try:
-                    miriam[ "transfac" ]
-                except KeyError:
-                    miriam[ "transfac" ] = nmiriam
-                    new_miriams.add( ( nmiriam, nm.format( nmiriam ), "TRANSFAC", "transfac", "TRANSFAC identifiers", "urn:new:transfac", "" ) )
-                    nmiriam += 1
-                alias_pos = ( 0, miriam[ "transfac" ] ),
-                for record in stream:
-                    line = record.split( "\t" )
-                    if line[ 3 ] not in ( "Homo sapiens", "Mus musculus" ):
-                        continue
-                    gene_id = None
-                    aliases = [ ]
-                    for r in line[ 4 ].split( "," ):
-                        try:
-                            gene_id = int( r )
-                        except ValueError:
-                            aliases.append( ( miriam[ "ensembl" ], r ) )
-                    if not gene_id:
-                        continue
-                    aliases.append( ( miriam[ "transfac" ], line[ 0 ] ) )
-                    transfac[ line[ 0 ] ] = gene_id
-                    try:
-                        xrefs[ gene_id ] |= set( aliases )
-                    except KeyError:
-                        pass
-                stream.close( )
-            elif fn[ :10 ] == "factor.tab":
-                #AC  ID  FA  GE  OS  DR  BS  RX
-                # empty GE means complex or derived factor (e.g. phosphorylation); translating those must rely on the factor symbol in column FA
+                    yield  # started right away, so that the finally clause runs even for rows that are never read
+                    for row in self._emit_stage( stage, rows ):
+                        yield row
+                finally:
+                    pending.discard( stage )
+                    if not pending:
+                        store.close( )
+
+            pending.add( stage )
+            g = generate( )
+            next( g )
+            return g
+
+        try:
+            store.add_actor( no_gene, store.UNKNOWN, 1, "UNMAPPABLE_IDENTIFIER", "marks agents whose identity remains unclear" )
+            store.add_xrefs( [ ( no_gene, miriam[ "ncbigene" ], "0" ) ] )
+            aliased_mirnas = { }
+            mapped_mirnas = { }
+            mirna_refs = { }
+            transfac = { }  # necessary to translate between gene.tab and factor.tab + site.tab
+            sep = "\t"
+            rem = set( [ "", "-" ] )
+            roles = set( [ "protein", "miRNA", "gene", "transcript" ] )
+            dbf = [ ]
+            for f in map( find_inputs, db_files ):
+                dbf.extend( f )
+            db_files = dbf
+
+            ### stage 1: stream every source into the join store ###
+            for db_file in db_files:
                 try:
-                    miriam[ "transfac" ]
-                except KeyError:
-                    miriam[ "transfac" ] = nmiriam
-                    new_miriams.add( ( nmiriam, nm.format( nmiriam ), "TRANSFAC", "transfac", "TRANSFAC identifiers", "urn:new:transfac", "" ) )
+                    stream = open_input( db_file )
+                except IOError as e:
+                    self._alert( "Failed to read {}" . format( db_file ) )
+                    continue
+                self._spill( "\t-> Reading {}..." . format( os.path.abspath( db_file ) ) )
+                fn = strip_compression( os.path.basename( db_file ) )
+
+                if fn[ :9 ] == "gene_info":
+                    # add every single obscure and un-MIRIAMed database that NCBI loves to reference
+                    miriam[ "imgt/gene-db" ] = nmiriam
+                    new_miriams.add( ( nmiriam, nm.format( nmiriam ), "IMG/Gene-DB", "imgt.gene_db", "from NCBI's gene_info", "urn:new:imgt.gene_db", "http://www.imgt.org/IMGT_GENE-DB/GENElect?species=Homo+sapiens&query=2+" ) )
                     nmiriam += 1
-                alias_pos = ( 0, miriam[ "transfac" ] ), ( 3, miriam[ "transfac" ] )
-                unknown = set( )
-                # define observed symbol mutilations using regular expressions
-                removexps = [
-                    # first order
-                    re.compile( "^\(([^)]+)\)(\d+)$" ),  # e.g. (STAT3)2
-
-                    # second order
-                    re.compile( "^(.+)-isoform\d+[A-Za-z]*$" ),  # e.g. NF-kappaB-isoform1
-                    re.compile( "^([^{]+)(\{[^}]+\})+$" ),  # e.g. STAT1{pS478}
-                    re.compile( "^(.+)\([lI]\)$" ),  # e.g. Brn-3a(l)  (T24145)
-                    re.compile( "^(.+) \(\d+\)$" ),  # e.g. AP-3 (1)
-                    re.compile( "^(.+)\(-like\)$" ),  # e.g. NF-kappaB(-like)
-                    re.compile( "^(.+)-(LIP|LAP|FL)$" ),  # e.g. C/EBPbeta-LAP
-                    re.compile( "^(.+)-?([Ll]ong|[Ss]hort)$" ),  # e.g. GATA6short:GATA6long
-                ]
-                try:
-                    tr_factors = dict( [ ( l[ 0 ], l[ 1 ] ) for l in [ l.lower( ).split( "\t" ) for l in open( os.path.dirname( db_file ) + "/TRANSFAC.unmappables" ) ] ] )
-                except IOError:
-                    self._spill( "No file found for mapping dirty TRANSFAC entries: {}." . format( os.path.dirname( db_file ) ) )
-                    tr_factors = dict( )
-
-                i = no_gene
-                for record in stream:
-                    line = record.split( "\t" )
-                    if not line[ 7 ] or line[ 4 ] not in ( "Homo sapiens", "Mus musculus", "Mammalia" ):
-                        continue
-                    if line[ 4  ][ 0 ] == "H":
-                        tax_prefix = "9606:"
-                        case_convert = str.upper
-                    else:
-                        tax_prefix = "10090:"
-                        case_convert = str.capitalize
-                    # try to match the TRANSFAC id (GXXXXXXX) with an existing entry from gene.tab
-                    line[ 3 ] = line[ 3 ].strip( )
+
+                    miriam[ "mgi" ] = nmiriam
+                    new_miriams.add( ( nmiriam, nm.format( nmiriam ), "MGI", "mgi", "JAXLab's MGI mouse database", "urn:new:mgi", "http://www.informatics.jax.org/marker/" ) )
+                    nmiriam += 1
+
+                    miriam[ "vega" ] = nmiriam
+                    new_miriams.add( ( nmiriam, nm.format( nmiriam ), "VEGA", "vega", "from NCBI's gene_info", "urn:new:vega", "http://vega.sanger.ac.uk/id/" ) )
+                    nmiriam += 1
+
+                    store.ingest( self._genes_from_gene_info( stream, db_file, miriam, rem ) )
+                elif fn[ :8 ] == "gene.tab":
+                    #AC ID  SD  OS  DR  BS  RX
                     try:
-                        xrefs[ transfac[ line[ 3 ] ] ].add( ( miriam[ "transfac" ], line[ 0 ].strip( ) ), )
-                    except KeyError:  # emtpy GE
-                        members = line[ 2 ].strip( ).split( ":" )
-                        mem = [ ]
-                        # column FA uses synonyms instead of official identifiers, this makes a lot of black magic necessary
-                        ## step 1: resolve pesky "(ABC)2" strings by transforming them into nice and countable "ABC:ABC"
-                        for m in members:
-                            x = removexps[ 0 ].match( m )
-                            try:
-                                mem.extend( [ x.group( 1 ) ] * int( x.group( 2 ) ) )
-                            except AttributeError:
-                                mem.append( m )
-                        members = mem[ : ]
-                        for j in xrange( len( members ) ):
-                            m = members[ j ]
-                            # try to use the imported rules for translating the factors' names
+                        miriam[ "transfac" ]
+                    except KeyError:
+                        miriam[ "transfac" ] = nmiriam
+                        new_miriams.add( ( nmiriam, nm.format( nmiriam ), "TRANSFAC", "transfac", "TRANSFAC identifiers", "urn:new:transfac", "" ) )
+                        nmiriam += 1
+                    for record in stream:
+                        line = record.split( "\t" )
+                        if line[ 3 ] not in ( "Homo sapiens", "Mus musculus" ):
+                            continue
+                        gene_id = None
+                        aliases = [ ]
+                        for r in line[ 4 ].split( "," ):
                             try:
-                                m = tr_factors[ m.lower( ) ]
-                            except KeyError:
-                                for r in removexps[ 1: ]:
-                                    m = r.sub( r'\1', m )
-                                m = m.lower( )
-                                # replace latin particles with their first letter
-                                for p in "alpha", "beta", "gamma", "delta", "epsilon", "kappa":
-                                    m = m.replace( p, p[ 0 ] )
-                                # remove hyphens and slashes, correct capitalization according to species entry
-                                m = case_convert( m.replace( "-", "" ).replace( "/", "" ) )
-                            else:
-                                # capitalization according to species
-                                if m == "":
-                                    m = "unmappable_identifier"
-                                m = case_convert( m )
-                            members[ j ] = m
-                        if len( members ) == 1:  # monomeric -> add factor ID to corresponding gene aliases
-                            try:  # try to match the symbol with an existing entry from gene.info
-                                xrefs[ symbols[ tax_prefix + members[ 0 ].strip( ) ] ].add( ( miriam[ "transfac" ], line[ 0 ].strip( ) ), )
-                            except KeyError:  # mark alias as unknown
-                                xrefs[ no_gene ].add( ( miriam[ "transfac" ], line[ 0 ].strip( ) ), )
-                                unknown.add( "\t" . join( [ tax_prefix, mem[ 0 ].strip( ), members[ 0 ].strip( ), line[ 7 ].strip( ), line[ 0 ] ] ) )
-                        else:  # multimeric -> create a complex entry and add the factor ID as alias
-                            members = sorted( members )  # keep subunit order fixed to ease analyses like occurrence counting etc.
-                            member_genes = set( )
-                            symbol = ":" . join( members )
-                            i += 1
-                            complexes[ i ] = { "tax_id" : int( tax_prefix[ :-1 ] ), "symbol" : symbol, "desc" : "from TRANSFAC", "members" : dict( ) }
+                                gene_id = int( r )
+                            except ValueError:
+                                aliases.append( ( miriam[ "ensembl" ], r ) )
+                        if not gene_id:
+                            continue
+                        aliases.append( ( miriam[ "transfac" ], line[ 0 ] ) )
+                        transfac[ line[ 0 ] ] = gene_id
+                        if store.has( gene_id ):
+                            store.add_xrefs( [  ( gene_id, t, a ) for t, a in aliases  ] )
+                elif fn[ :10 ] == "factor.tab":
+                    #AC  ID  FA  GE  OS  DR  BS  RX
+                    # empty GE means complex or derived factor (e.g. phosphorylation); translating those must rely on the factor symbol in column FA
+                    try:
+                        miriam[ "transfac" ]
+                    except KeyError:
+                        miriam[ "transfac" ] = nmiriam
+                        new_miriams.add( ( nmiriam, nm.format( nmiriam ), "TRANSFAC", "transfac", "TRANSFAC identifiers", "urn:new:transfac", "" ) )
+                        nmiriam += 1
+                    unknown = set( )
+                    # define observed symbol mutilations using regular expressions
+                    removexps = [
+                        # first order
+                        re.compile( "^\(([^)]+)\)(\d+)$" ),  # e.g. (STAT3)2
+
+                        # second order
+                        re.compile( "^(.+)-isoform\d+[A-Za-z]*$" ),  # e.g. NF-kappaB-isoform1
+                        re.compile( "^([^{]+)(\{[^}]+\})+$" ),  # e.g. STAT1{pS478}
+                        re.compile( "^(.+)\([lI]\)$" ),  # e.g. Brn-3a(l)  (T24145)
+                        re.compile( "^(.+) \(\d+\)$" ),  # e.g. AP-3 (1)
+                        re.compile( "^(.+)\(-like\)$" ),  # e.g. NF-kappaB(-like)
+                        re.compile( "^(.+)-(LIP|LAP|FL)$" ),  # e.g. C/EBPbeta-LAP
+                        re.compile( "^(.+)-?([Ll]ong|[Ss]hort)$" ),  # e.g. GATA6short:GATA6long
+                    ]
+                    try:
+                        tr_factors = dict( [ ( l[ 0 ], l[ 1 ] ) for l in [ l.lower( ).split( "\t" ) for l in open( os.path.dirname( db_file ) + "/TRANSFAC.unmappables" ) ] ] )
+                    except IOError:
+                        self._spill( "No file found for mapping dirty TRANSFAC entries: {}." . format( os.path.dirname( db_file ) ) )
+                        tr_factors = dict( )
+
+                    i = no_gene
+                    for record in stream:
+                        line = record.split( "\t" )
+                        if not line[ 7 ] or line[ 4 ] not in ( "Homo sapiens", "Mus musculus", "Mammalia" ):
+                            continue
+                        if line[ 4  ][ 0 ] == "H":
+                            tax_prefix = "9606:"
+                            case_convert = str.upper
+                        else:
+                            tax_prefix = "10090:"
+                            case_convert = str.capitalize
+                        tax_id = int( tax_prefix[ :-1 ] )
+                        # try to match the TRANSFAC id (GXXXXXXX) with an existing entry from gene.tab
+                        line[ 3 ] = line[ 3 ].strip( )
+                        if line[ 3 ] in transfac and store.has( transfac[ line[ 3 ] ] ):
+                            store.add_xrefs( [ ( transfac[ line[ 3 ] ], miriam[ "transfac" ], line[ 0 ].strip( ) ) ] )
+                        else:  # emtpy GE
+                            members = line[ 2 ].strip( ).split( ":" )
+                            mem = [ ]
+                            # column FA uses synonyms instead of official identifiers, this makes a lot of black magic necessary
+                            ## step 1: resolve pesky "(ABC)2" strings by transforming them into nice and countable "ABC:ABC"
+                            for m in members:
+                                x = removexps[ 0 ].match( m )
+                                try:
+                                    mem.extend( [ x.group( 1 ) ] * int( x.group( 2 ) ) )
+                                except AttributeError:
+                                    mem.append( m )
+                            members = mem[ : ]
                             for j in xrange( len( members ) ):
                                 m = members[ j ]
+                                # try to use the imported rules for translating the factors' names
                                 try:
-                                    gene_id = symbols[ tax_prefix + m ]
-                                    member_genes.add( gene_id )
+                                    m = tr_factors[ m.lower( ) ]
                                 except KeyError:
+                                    for r in removexps[ 1: ]:
+                                        m = r.sub( r'\1', m )
+                                    m = m.lower( )
+                                    # replace latin particles with their first letter
+                                    for p in "alpha", "beta", "gamma", "delta", "epsilon", "kappa":
+                                        m = m.replace( p, p[ 0 ] )
+                                    # remove hyphens and slashes, correct capitalization according to species entry
+                                    m = case_convert( m.replace( "-", "" ).replace( "/", "" ) )
+                                else:
+                                    # capitalization according to species
+                                    if m == "":
+                                        m = "unmappable_identifier"
+                                    m = case_convert( m )
+                                members[ j ] = m
+                            if len( members ) == 1:  # monomeric -> add factor ID to corresponding gene aliases
+                                gene_id = store.gene_by_symbol( tax_id, members[ 0 ].strip( ) )  # try to match the symbol with an existing entry from gene.info
+                                if gene_id is None:  # mark alias as unknown
                                     gene_id = no_gene
-                                    member_genes.add( 0 )
-                                    unknown.add( "\t" . join( [ tax_prefix, mem[ j ].strip( ), m, line[ 7 ].strip( ), line[ 0 ] ] ) )
-                                # count how often the member features in the complex
-                                try:
-                                    complexes[ i ][ "members" ][ ( gene_id, "protein" ) ] += 1
-                                except KeyError:
-                                    complexes[ i ][ "members" ][ ( gene_id, "protein" ) ] = 1
-                            # insert a derived Entrez ID alias for the complex
-                            xrefs[ i ] = set( [
-                                ( miriam[ "transfac" ], line[ 0 ].strip( ) ),
-                                ( miriam[ "synonym" ], line[ 2 ] ),
-                                ( miriam[ "hgnc.symbol" ], symbol ),
-                                ( miriam[ "ncbigene" ], "," . join( map( str, member_genes ) ) ),
-                            ] )
-                #[  print( l ) for l in unknown  ]
-            elif fn[ :14 ] == "gene2accession":
-                # the format is as follows: (first column has index 0):
-                # column 3 and 4 refer to RNA accessions, with 3 being either EMBL or RefSeq
-                # column 5 and 6 refer to protein accessions, with 5 being either Uniprot, EMBL, RefSeq, or RPF (last one has very few cases)
-                # columns 13 and 14 refer to mature peptide accessions, but only about 160 are present in a file with 50 million entries
-                alias_pos = ( 3, miriam[ "ensembl" ] ), ( 4, miriam[ "ncbigi" ] ), ( 5, miriam[ "uniprot" ] ), ( 6, miriam[ "ncbigi" ] ), ( 13, miriam[ "refseq" ] ), ( 14, miriam[ "ncbigi" ] )
-                for record in stream:
-                    line = record.split( sep )
-                    try:
-                        gene_id = int( line[ 1 ].strip( ) )
-                    except (IndexError, ValueError ):
-                        continue
-                    try:
-                        for p, ref_type in alias_pos:
-                            if line[ p ] not in rem:
-                                line[ p ] = line[ p ].strip( ).split( "." )[ 0 ]
-                                if p == 5:
-                                    if "_" in line[ p ]:
-                                        ref_type = miriam[ "refseq" ]
-                                    elif line[ p ][ 0 ] == "0":
-                                        ref_type = miriam[ "ncbigi" ]
-                                    elif len( line[ p ] ) > 6:
-                                        ref_type = miriam[ "ensembl" ]
+                                    unknown.add( "\t" . join( [ tax_prefix, mem[ 0 ].strip( ), members[ 0 ].strip( ), line[ 7 ].strip( ), line[ 0 ] ] ) )
+                                store.add_xrefs( [ ( gene_id, miriam[ "transfac" ], line[ 0 ].strip( ) ) ] )
+                            else:  # multimeric -> create a complex entry and add the factor ID as alias
+                                members = sorted( members )  # keep subunit order fixed to ease analyses like occurrence counting etc.
+                                member_genes = set( )
+                                counts = { }
+                                symbol = ":" . join( members )
+                                i += 1
+                                store.add_actor( i, store.COMPLEX, tax_id, symbol, "from TRANSFAC" )
+                                for j in xrange( len( members ) ):
+                                    m = members[ j ]
+                                    gene_id = store.gene_by_symbol( tax_id, m )
+                                    if gene_id is None:
+                                        gene_id = no_gene
+                                        member_genes.add( 0 )
+                                        unknown.add( "\t" . join( [ tax_prefix, mem[ j ].strip( ), m, line[ 7 ].strip( ), line[ 0 ] ] ) )
                                     else:
-                                        uniprot[ line[ p ] ] = gene_id
-                                elif p == 3 and "_" in line[ p ]:
-                                    ref_type = miriam[ "refseq" ]
-                                xrefs[ gene_id ].add( ( ref_type, line[ p ] ), )
-                    except IndexError:
-                        self._alert( "Notice: Incompatible line in {!r}." . format( db_file ) )
-                stream.close( )
-            elif fn[ :17 ] == "uniprot_idmapping":
-                alias_pos = ( 0, miriam[ "uniprot" ] ), ( 3, miriam[ "refseq" ] ), ( 13, miriam[ "omim" ] ), ( 16, miriam[ "ensembl" ] ), ( 18, miriam[ "ensembl" ] ), ( 19, miriam[ "ensembl" ] ), ( 20, miriam[ "ensembl" ] )
-                for record in stream:
-                    line = record.split( sep )
-                    try:
-                        gene_id = int( line[ 2 ].strip( ) )
-                    except ( IndexError, ValueError ):
-                        continue
-                    try:
-                        uniprot[ line[ 0 ] ] = gene_id
-                        for p, ref_type in alias_pos:
-                            helper = {  e.split( "." )[ 0 ] for e in line[ p ].strip( ).split( "; " )  } - rem
-                            xrefs[ gene_id ] |= set( zip( [ ref_type ] * len( helper ), helper ) )
-                    except KeyError:
-                        pass  # discontinued records
-                    except ( ValueError, IndexError ):
-                        self._alert( "Notice: Incompatible line in {!r}." . format( db_file ) )
-                stream.close( )
-            elif fn[ -9: ] == "miRNA.dat":
-                stream.close( )
-                mapped_mirnas = dict( )
-                mirna_refs = dict( )
-                # access all the data inside the .dat file
-                for seq_record in SeqIO.parse( db_file, "embl" ):
-
-                    if seq_record.name[ :3 ] not in ( "hsa", "mmu" ):  # NOTE: only include mouse and human for now
-                        continue
-                    d = dict( [ e.split( ":" )[ :2 ] for e in seq_record.dbxrefs ] )
-                    try:
-                        gene_id = int( d[ "ENTREZGENE" ] )
-                    except ( KeyError, ValueError ):
-                        continue
-
-                    mapped_mirnas[ seq_record.id ] = gene_id
-                    mirna_refs[ seq_record.id ] = dict( derived = set( ), PMIDs = set( ) )
-                    for feature in seq_record.features:
-                        # the acc number
-                        try:
-                            acc = feature.qualifiers[ 'accession' ][ 0 ]
-                        except KeyError:  # means that this is another feature, like 'modified base'
+                                        member_genes.add( gene_id )
+                                    # count how often the member features in the complex
+                                    counts[ gene_id ] = counts.get( gene_id, 0 ) + 1
+                                store.add_members( [  ( i, gene_id, "protein", c ) for gene_id, c in counts.iteritems( )  ] )
+                                # insert a derived Entrez ID alias for the complex
+                                store.add_xrefs( set( [
+                                    ( i, miriam[ "transfac" ], line[ 0 ].strip( ) ),
+                                    ( i, miriam[ "synonym" ], line[ 2 ] ),
+                                    ( i, miriam[ "hgnc.symbol" ], symbol ),
+                                    ( i, miriam[ "ncbigene" ], "," . join( map( str, member_genes ) ) ),
+                                ] ) )
+                    #[  print( l ) for l in unknown  ]
+                elif fn[ :14 ] == "gene2accession":
+                    store.ingest( self._genes_from_gene2accession( stream, db_file, miriam, rem ) )
+                elif fn[ :17 ] == "uniprot_idmapping":
+                    store.ingest( self._genes_from_uniprot_idmapping( stream, db_file, miriam, rem ) )
+                elif fn[ -9: ] == "miRNA.dat":
+                    from Bio import SeqIO  # Biopython is only needed for miRBase ingestion
+                    # access all the data inside the .dat file
+                    for seq_record in SeqIO.parse( stream, "embl" ):
+
+                        if seq_record.name[ :3 ] not in ( "hsa", "mmu" ):  # NOTE: only include mouse and human for now
                             continue
-                        else:
-                            mapped_mirnas[ acc ] = gene_id  # link between precursor miRNA and the corresponding gene
-                            mirna_refs[ seq_record.id ][ "derived" ].add( acc )  # link between precursor and mature miRNA
-
-                    for ref in seq_record.annotations[ "references" ]:
+                        d = dict( [ e.split( ":" )[ :2 ] for e in seq_record.dbxrefs ] )
                         try:
-                            mirna_refs[ seq_record.id ][ "PMIDs" ].add( ref.pubmed_id )
-                        except AttributeError:
+                            gene_id = int( d[ "ENTREZGENE" ] )
+                        except ( KeyError, ValueError ):
                             continue
 
-            elif fn[ -17: ] == "miRNA_aliases.txt":
-                border = re.compile( "\s*;\s*" )
-                # read in aliases
-                for line in stream:
-                    # line format is "miRBase_Accession    alias1;alias2;...", ending on a semicolon
-                    acc, aliases = line.split( )
-                    if aliases[ :3 ] not in ( "mmu", "hsa" ):  # NOTE: only include mouse and human for now
-                        continue
-                    acc = acc.strip( )
-                    iv = border.split( aliases )[ :-1 ]  # get names, discarding final value which will always be ''
-                    iv.reverse( )  # puts the current name up front
-                    iv.extend( [  n[ 4: ] for n in iv if n[ :4 ] in ( 'hsa-', 'mmu-' )  ] )  # map missing species prefixes to human and mouse per default
+                        mapped_mirnas[ seq_record.id ] = gene_id
+                        mirna_refs[ seq_record.id ] = dict( derived = set( ), PMIDs = set( ) )
+                        for feature in seq_record.features:
+                            # the acc number
+                            try:
+                                acc = feature.qualifiers[ 'accession' ][ 0 ]
+                            except KeyError:  # means that this is another feature, like 'modified base'
+                                continue
+                            else:
+                                mapped_mirnas[ acc ] = gene_id  # link between precursor miRNA and the corresponding gene
+                                mirna_refs[ seq_record.id ][ "derived" ].add( acc )  # link between precursor and mature miRNA
 
-                    aliased_mirnas[ acc ] = set( zip( [ miriam[ "synonym" ] ] * len( iv ), iv ) )
-                stream.close( )
-            elif fn[ -9: ] == "drugs.csv":  # Drugbank
-                i = 2 * no_gene  # start counting from 2e9
-                alias_pos = ( ( 0, miriam[ "drugbank" ] ), ( 1, miriam[ "synonym" ] ), ( 2, miriam[ "cas" ] ), ( 4, miriam[ "kegg.compound" ] ),
-                                ( 5, miriam[ "kegg.drug" ] ), ( 6, miriam[ "pubchem.compound" ] ), ( 7, miriam[ "pubchem.substance" ] ),
-                                ( 8, miriam[ "chebi" ] ), ( 9, miriam[ "pharmgkb.drug" ] ), ( 11, miriam[ "uniprot" ] )
-                            )
-                stream.readline( )  # skip header
-                for record in stream:
-                    line = record.split( sep )
-                    try:
-                        # column 12 contains the Uniprot Name (e.g. CDKN1_HUMAN)
-                        try:
-                            gene_id = uniprot[ line[ 11 ] ]
-                        except KeyError:
-                            gene_id = None
-                        if not gene_id:
-                            i += 1
-                            gene_id = i
-                            drugs[ gene_id ] = dict( symbol = line[ 1 ].strip( ), tax_id = 1, desc = "from Drugbank" )
-                            xrefs[ gene_id ] = set( )
-                        for p, ref_type in alias_pos:
-                            if line[ p ].strip( ):
-                                xrefs[ gene_id ].add( ( ref_type, line[ p ].strip( ) ), )
-                    except IndexError:
-                        self._alert( "Notice: Incompatible line in {!r}: {}" . format( db_file, line[ 0 ] ) )
+                        for ref in seq_record.annotations[ "references" ]:
+                            try:
+                                mirna_refs[ seq_record.id ][ "PMIDs" ].add( ref.pubmed_id )
+                            except AttributeError:
+                                continue
+
+                elif fn[ -17: ] == "miRNA_aliases.txt":
+                    border = re.compile( "\s*;\s*" )
+                    # read in aliases
+                    for line in stream:
+                        # line format is "miRBase_Accession    alias1;alias2;...", ending on a semicolon
+                        acc, aliases = line.split( )
+                        if aliases[ :3 ] not in ( "mmu", "hsa" ):  # NOTE: only include mouse and human for now
+                            continue
+                        acc = acc.strip( )
+                        iv = border.split( aliases )[ :-1 ]  # get names, discarding final value which will always be ''
+                        iv.reverse( )  # puts the current name up front
+                        iv.extend( [  n[ 4: ] for n in iv if n[ :4 ] in ( 'hsa-', 'mmu-' )  ] )  # map missing species prefixes to human and mouse per default
+
+                        aliased_mirnas[ acc ] = set( zip( [ miriam[ "synonym" ] ] * len( iv ), iv ) )
+                elif fn[ -9: ] == "drugs.csv":  # Drugbank
+                    store.ingest( self._genes_from_drugbank( stream, db_file, miriam, store ) )
+                else:
+                    self._spill( "Unrecognized file name schema: {!r}" . format( db_file ) )
                 stream.close( )
-            else:
-                self._spill( "Unrecognized file name schema: {!r}" . format( db_file ) )
+                self._report_stage( fn )
 
-        # map miRNA aliases to the corresponding gene
-        count = 0
-        try:
+            # map miRNA aliases to the corresponding gene
+            if aliased_mirnas and not mapped_mirnas:
+                self._alert( "A miRBase alias file needs to be read together with the corresponding miRBase data file." )
+            count = 0
             for mB_acc, al in aliased_mirnas.iteritems( ):
                 try:
                     gene_id = mapped_mirnas[ mB_acc ]
@@ -991,89 +1420,166 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
                     count += 1
                     #self._spill( "Warning: no matching gene for miRBase accession {}." . format( mB_acc ) )
                     continue
-                try:
-                    if mB_acc[ :5 ] == "MIMAT":
-                        xrefs[ gene_id ].add( ( miriam[ "mirbase.mature" ], mB_acc ), )
-                    xrefs[ gene_id ] |= al
-                except KeyError:
-                    continue
-            self._spill( "Info: {} miRBase identifiers lack gene annotation." . format( count ) )
-        except NameError:  # no variable named mapped_mirnas because no miRBase data file was specified
-            self._alert( "A miRBase alias file needs to be read together with the corresponding miRBase data file." )
-
-        # update annotation table with newly added types
-        if new_miriams:
-            query = "INSERT INTO `Actor_xrefs` VALUES ({})" . format( "),\n\t(" . join( [ self._sqllist( m ) for m in new_miriams ] ) )
-            self._sql( query )
-
-        # prepare entries for role table
-        roles = sorted( roles )
-        role_dict = dict( zip( roles, list( xrange( 2, len( roles ) + 2 ) ) ) )
-        insert_values[ tRoles ] = [ self.unknown_entity, "MISSING_VALUE" ]
-        for e, v in role_dict.items( ):
-            insert_values[ tRoles ].extend( [ v, e ] )
-
-        # prepare gene entries for actors table
-        i = 0
-        entrez_to_id = { }
-        for k, v in annot.iteritems( ):
-            i += 1
-            entrez_to_id[ k ] = i
-            try:
-                insert_values[ tAnnot ].extend( [ v[ "tax_id" ], i, v[ "symbol" ], v[ "desc" ] ] )
-            except:
-                print( tAnnot, k, v )
-                sys.exit( )
-            try:
-                for ref in xrefs[ k ]:
-                    insert_values[ tAlias ].extend( [ i, ref[ 1 ], ref[ 0 ] ] )
-            except ( IndexError, KeyError ):
-                self._spill( "Error: unmapped identifier: {}  {}  {}" . format( i, k, ref ) )
-                sys.exit( )
+                if mB_acc[ :5 ] == "MIMAT":
+                    store.add_xrefs( [ ( gene_id, miriam[ "mirbase.mature" ], mB_acc ) ] )
+                store.add_xrefs( [  ( gene_id, t, a ) for t, a in al  ] )
+            if aliased_mirnas:
+                self._spill( "Info: {} miRBase identifiers lack gene annotation." . format( count ) )
+            del aliased_mirnas
+
+            # update annotation table with newly added types
+            if new_miriams:
+                query = "INSERT INTO `Actor_xrefs` VALUES ({})" . format( "),\n\t(" . join( [ self._sqllist( m ) for m in new_miriams ] ) )
+                self._sql( query )
+
+            ### stage 2: assign database ids ###
+            store.number( )
+            self._report_stage( "id assignment" )
+
+            ### stage 3: emit rows while update_db consumes them ###
+            # prepare entries for role table
+            roles = sorted( roles )
+            role_dict = dict( zip( roles, list( xrange( 2, len( roles ) + 2 ) ) ) )
+            role_rows = [ ( self.unknown_entity, "MISSING_VALUE" ) ] + sorted( [  ( v, e ) for e, v in role_dict.items( )  ] )
+
+            def mirbase_rows( ):
+                for mi, miv in mirna_refs.iteritems( ):
+                    gene_id = store.a_id( mapped_mirnas.get( mi ) ) or no_gene
+                    pmids = "," . join( miv[ "PMIDs" ] )
+                    for mat in miv[ "derived" ]:
+                        yield ( gene_id, gene_id, pmids, mi, mat )
+
+            return {
+                    tRoles : role_rows,
+                    tAnnot : emit( tAnnot, store.actor_rows ),
+                    tAlias : emit( tAlias, store.alias_rows ),
+                    tCompl : emit( tCompl, lambda: (  ( c, m, role_dict[ r ], n ) for c, m, r, n in store.member_rows( no_gene )  ) ),
+                    "mirbase" : emit( "mirbase", mirbase_rows ),
+            }
+        finally:
+            if not pending:  # reading failed, nothing will be emitted
+                store.close( )
 
-        # the unknown entity needs to be treated separately
-        insert_values[ tAnnot ].extend( [ 1, no_gene, "UNMAPPABLE_IDENTIFIER", "marks agents whose identity remains unclear" ] )
-        entrez_to_id[ no_gene ] = no_gene
-        for ref in xrefs[ no_gene ]:
-            insert_values[ tAlias ].extend( [ no_gene, ref[ 1 ], ref[ 0 ] ] )
 
-        # prepare complex entries for actor table
-        for k, v in complexes.iteritems( ):
-            insert_values[ tAnnot ].extend( [ v[ "tax_id" ], k, v[ "symbol" ], v[ "desc" ] ] )
+    def _genes_from_gene_info( self, stream, db_file, miriam, rem ):
+        """yield ( actor, xrefs ) records from NCBI's gene_info"""
+
+        for record in stream:
+            line = record.split( "\t" )
             try:
-                for ref in xrefs[ k ]:
-                    insert_values[ tAlias ].extend( [ k, ref[ 1 ], ref[ 0 ] ] )
-            except ( IndexError, KeyError ):
-                self._spill( "Error: unmapped identifier: {}  {} " . format( k, ref ) )
-                sys.exit( )
-            for m, c in v[ "members" ].iteritems( ):
-                insert_values[ tCompl ].extend( [ k, entrez_to_id[ m[ 0 ] ], role_dict[ m[ 1 ] ], c ] )
+                tax_id = int( line[ 0 ].strip( ) )
+                gene_id = int( line[ 1 ].strip( ) )
+                symbol = line[ 2 ].strip( )
+                desc = line[ 8 ].strip( )
+
+                synonyms = set( line[ 4 ].strip( ).split( "|" ) ) - rem
+                xref = set( [  ( gene_id, miriam[ "synonym" ], s ) for s in synonyms  ] )
+                xref.add( ( gene_id, miriam[ "hgnc.symbol" ], symbol ), )
+                xref.add( ( gene_id, miriam[ "ncbigene" ], str( gene_id ) ), )
+                for dbxref in set( line[ 5 ].strip( ).split( "|" ) ) - rem:
+                    entry = dbxref.split( ":" )
+                    # joining is necessary to reconstitute identifiers that contain a colon, e.g. MGI markers
+                    xref.add( ( gene_id, miriam[ entry[ 0 ].lower( ) ], ":" . join( entry[ 1: ] ) ) )
+            except ( IndexError, ValueError ):
+                self._alert( "Notice: Incompatible line in {!r}." . format( db_file ) )
+                continue
+            yield ( gene_id, GeneStore.GENE, tax_id, symbol, desc ), xref
 
-        # prepare drug entries for actor table
-        for k, v in drugs.iteritems( ):
+
+    def _genes_from_gene2accession( self, stream, db_file, miriam, rem ):
+        """yield ( None, xrefs ) records from NCBI's gene2accession"""
+
+        # the format is as follows: (first column has index 0):
+        # column 3 and 4 refer to RNA accessions, with 3 being either EMBL or RefSeq
+        # column 5 and 6 refer to protein accessions, with 5 being either Uniprot, EMBL, RefSeq, or RPF (last one has very few cases)
+        # columns 13 and 14 refer to mature peptide accessions, but only about 160 are present in a file with 50 million entries
+        alias_pos = ( 3, miriam[ "ensembl" ] ), ( 4, miriam[ "ncbigi" ] ), ( 5, miriam[ "uniprot" ] ), ( 6, miriam[ "ncbigi" ] ), ( 13, miriam[ "refseq" ] ), ( 14, miriam[ "ncbigi" ] )
+        for record in stream:
+            line = record.split( "\t" )
             try:
-                insert_values[ tAnnot ].extend( [ v[ "tax_id" ], k, v[ "symbol" ], v[ "desc" ] ] )
-            except:
-                print( tAnnot, k, v )
-                sys.exit( )
+                gene_id = int( line[ 1 ].strip( ) )
+            except (IndexError, ValueError ):
+                continue
+            xref = [ ]
             try:
-                for ref in xrefs[ k ]:
-                    insert_values[ tAlias ].extend( [ k, ref[ 1 ], ref[ 0 ] ] )
-            except ( IndexError, KeyError ):
-                self._spill( "Error: unmapped identifier: {}  {}  {}" . format( i, k, ref ) )
-                sys.exit( )
-
-        # prepare miRBase table entries
-        insert_values[ "mirbase" ] = [ ]
-        for mi, miv in mirna_refs.iteritems( ):
+                for p, ref_type in alias_pos:
+                    if line[ p ] not in rem:
+                        line[ p ] = line[ p ].strip( ).split( "." )[ 0 ]
+                        if p == 5:
+                            if "_" in line[ p ]:
+                                ref_type = miriam[ "refseq" ]
+                            elif line[ p ][ 0 ] == "0":
+                                ref_type = miriam[ "ncbigi" ]
+                            elif len( line[ p ] ) > 6:
+                                ref_type = miriam[ "ensembl" ]
+                        elif p == 3 and "_" in line[ p ]:
+                            ref_type = miriam[ "refseq" ]
+                        xref.append( ( gene_id, ref_type, line[ p ] ) )
+            except IndexError:
+                self._alert( "Notice: Incompatible line in {!r}." . format( db_file ) )
+            yield None, xref
+
+
+    def _genes_from_uniprot_idmapping( self, stream, db_file, miriam, rem ):
+        """yield ( None, xrefs ) records from UniProt's idmapping_selected file"""
+
+        alias_pos = ( 0, miriam[ "uniprot" ] ), ( 3, miriam[ "refseq" ] ), ( 13, miriam[ "omim" ] ), ( 16, miriam[ "ensembl" ] ), ( 18, miriam[ "ensembl" ] ), ( 19, miriam[ "ensembl" ] ), ( 20, miriam[ "ensembl" ] )
+        for record in stream:
+            line = record.split( "\t" )
             try:
-                gene_id = entrez_to_id[ mapped_mirnas[ mi ] ]
-            except KeyError:
-                gene_id = entrez_to_id[ no_gene ]
-            for mat in miv[ "derived" ]:
-                insert_values[ "mirbase" ].extend( [ gene_id, gene_id, "," . join( miv[ "PMIDs" ] ), mi, mat ] )
+                gene_id = int( line[ 2 ].strip( ) )
+            except ( IndexError, ValueError ):
+                continue
+            xref = set( )
+            try:
+                for p, ref_type in alias_pos:
+                    helper = {  e.split( "." )[ 0 ] for e in line[ p ].strip( ).split( "; " )  } - rem
+                    xref |= set( [  ( gene_id, ref_type, h ) for h in helper  ] )
+            except ( ValueError, IndexError ):
+                self._alert( "Notice: Incompatible line in {!r}." . format( db_file ) )
+            yield None, xref
+
+
+    def _genes_from_drugbank( self, stream, db_file, miriam, store ):
+        """yield ( actor, xrefs ) records from Drugbank's drugs.csv; drugs with a known UniProt target become aliases of that gene"""
+
+        i = 2 * self.unknown_entity  # start counting from 2e9
+        alias_pos = ( ( 0, miriam[ "drugbank" ] ), ( 1, miriam[ "synonym" ] ), ( 2, miriam[ "cas" ] ), ( 4, miriam[ "kegg.compound" ] ),
+                        ( 5, miriam[ "kegg.drug" ] ), ( 6, miriam[ "pubchem.compound" ] ), ( 7, miriam[ "pubchem.substance" ] ),
+                        ( 8, miriam[ "chebi" ] ), ( 9, miriam[ "pharmgkb.drug" ] ), ( 11, miriam[ "uniprot" ] )
+                    )
+        stream.readline( )  # skip header
+        for record in stream:
+            line = record.split( "\t" )
+            actor = None
+            try:
+                # column 12 contains the Uniprot Name (e.g. CDKN1_HUMAN)
+                gene_id = store.gene_by_alias( miriam[ "uniprot" ], line[ 11 ] )
+                if not gene_id:
+                    i += 1
+                    gene_id = i
+                    actor = ( gene_id, GeneStore.DRUG, 1, line[ 1 ].strip( ), "from Drugbank" )
+                xref = set( [  ( gene_id, ref_type, line[ p ].strip( ) ) for p, ref_type in alias_pos if line[ p ].strip( )  ] )
+            except IndexError:
+                self._alert( "Notice: Incompatible line in {!r}: {}" . format( db_file, line[ 0 ] ) )
+                continue
+            yield actor, xref
 
-        return insert_values
+
+    def _report_stage( self, stage ):
+        """report the peak memory usage after a stage of the gene annotation compiler"""
+
+        rss = peak_rss( )
+        if rss is not None:
+            self._spill( "\t-> {} finished, peak RSS {:.1f} MB" . format( stage, rss ) )
+
+
+    def _emit_stage( self, stage, rows ):
+        """yield the rows produced by calling rows( ), then report the stage"""
+
+        for row in rows( ):
+            yield row
+        self._report_stage( "Emitting {}" . format( stage ) )
 
 
     ############################################################
@@ -1087,7 +1593,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         interactions = set( )
         for db_file in db_files:
             try:
-                stream = open( db_file, "r" )
+                stream = open_input( db_file )
             except IOError as e:
                 self._extalert( e.strerror )
                 return 1
@@ -1122,7 +1628,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         interactions = set( )
         for db_file in db_files:
             try:
-                stream = open( db_file, "r" )
+                stream = open_input( db_file )
             except IOError as e:
                 self._extalert( e.strerror )
                 return 1
@@ -1157,7 +1663,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         interactions = set( )
         for db_file in db_files:
             try:
-                stream = open( db_file, "r" )
+                stream = open_input( db_file )
             except IOError as e:
                 self._extalert( e.strerror + ": " + db_file )
                 return 1
@@ -1193,7 +1699,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         interactions = set( )
         for db_file in db_files:
             try:
-                stream = open( db_file, "r" )
+                stream = open_input( db_file )
             except IOError as e:
                 self._extalert( e.strerror )
                 return 1
@@ -1251,7 +1757,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         interactions = set( )
         for db_file in db_files:
             try:
-                stream = open( db_file, "r" )
+                stream = open_input( db_file )
             except IOError as e:
                 self._extalert( e.strerror + ": " + db_file )
                 return 1
@@ -1293,7 +1799,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         interactions = set( )
         for db_file in db_files:
             try:
-                stream = open( db_file, "r" )
+                stream = open_input( db_file )
             except IOError as e:
                 self._extalert( e.strerror )
                 return 1
@@ -1336,7 +1842,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         insert_values = [ ]
         for db_file in db_files:
             try:
-                stream = open( db_file, "r" )
+                stream = open_input( db_file )
             except IOError as e:
                 self._extalert( e.strerror )
                 return 1
@@ -1374,7 +1880,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
 
         for db_file in db_files:
             try:
-                stream = open( db_file, "r" )
+                stream = open_input( db_file )
             except IOError as e:
                 self._extalert( e.strerror )
                 return 1
@@ -1402,7 +1908,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         interactions = set( )
         for db_file in db_files:
             try:
-                stream = open( db_file, "r" )
+                stream = open_input( db_file )
             except IOError as e:
                 self._extalert( e.strerror )
                 return 1
@@ -1443,7 +1949,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         interactions = set( )
         for db_file in db_files:
             try:
-                stream = open( db_file, "r" )
+                stream = open_input( db_file )
             except IOError as e:
                 self._extalert( e.strerror )
                 return 1
@@ -1486,7 +1992,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         interactions = set( )
         for db_file in db_files:
             try:
-                stream = open( db_file, "r" )
+                stream = open_input( db_file )
             except IOError as e:
                 self._extalert( e.strerror )
                 return 1
@@ -1607,6 +2113,7 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
     #### aliases                                            ####
     ############################################################
 
+    @RunProfile.timed( "methods" )
     def query_for_references( self, candidates, restrict = { "alias_types" : None }, invert = False, silent = True ):
         """retrieve shared identifiers for the given aliases"""
 
@@ -1619,43 +2126,185 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         if type( restrict ) != dict or "alias_types" not in restrict:
             restrict = { "alias_types" : None }
         elif type( restrict[ "alias_types" ] ) == str:
-            restrict[ "alias_type" ] = set( [ restrict[ "alias_types" ] ] )
+            restrict = { "alias_types" : set( [ restrict[ "alias_types" ] ] ) }
 
         requested = {  str( e ).lower( ) for e in candidates  }
         if not requested:
             return ( identified, orphans, ambiguous )  # return empty dict for empty candidate list
 
-        c = 0
-        db = "Actor_aliases"
+        index = self._get_alias_index( )
+        if index:
+            types = index.xref_ids( restrict[ "alias_types" ] ).keys( ) if restrict[ "alias_types" ] else None
+            res = index.references( requested, types, self._allowed_species or None )
+            if invert:
+                res = [  ( alias, ref, lalias ) for ref, alias, lalias in res  ]
+            return self._classify_references( candidates, requested, res, invert, silent )
+
+        # the queries return ( ref, Alias, lower-cased Alias ) rows, which become ( Alias, ref, ... ) rows if invert is set
+        name = "references"
+        params = { }
+        if restrict[ "alias_types" ]:
+            name += "_typed"
+            params[ "alias_types" ] = restrict[ "alias_types" ]
+        table = ""
+        if self._allowed_species:
+            name += "_species"
+            params[ "species" ] = self._allowed_species
+            table = "`a`."
+        if self._has_alias_lc( ):  # the database lower-cases, and matches on an exact (binary) column
+            static = dict( alias_select = "{0}`Alias`, {0}`Alias_lc`" . format( table ), alias_match = table + "`Alias_lc`" )
+        else:
+            static = dict( alias_select = table + "`Alias`", alias_match = table + "`Alias`" )
+        def compose( chunk ):
+            params[ "aliases" ] = chunk
+            return self._templates.bind( name, params, **static )
+
+        # serve as many aliases as possible from the cache, which stores ( ref, Alias, lower-cased Alias ) rows per lower-cased alias
+        cache = self._alias_cache
+        if cache is not None:
+            context = (
+                    tuple( sorted( set( restrict[ "alias_types" ] ) ) ) if restrict[ "alias_types" ] else None,
+                    frozenset( self._allowed_species ) if self._allowed_species else None,
+                    )
+            res = [ ]
+            missing = [ ]
+            for a in requested:
+                hit = cache.get( ( a, ) + context )
+                if hit is None:
+                    missing.append( a )
+                elif invert:
+                    res.extend( [ ( alias, ref, lalias ) for ref, alias, lalias in hit ] )
+                else:
+                    res.extend( hit )
+        else:
+            res = [ ]
+            missing = requested
+
+        if missing:
+            fetched = self._select_chunked( missing, compose )
+            if not self._alias_lc:
+                fetched = [ ( ref, alias, alias.lower( ) ) for ref, alias in fetched ]
+            if invert:
+                res.extend( [ ( alias, ref, lalias ) for ref, alias, lalias in fetched ] )
+            else:
+                res.extend( fetched )
+
+            if cache is not None:
+                found = defaultdict( list )
+                for r in fetched:
+                    found[ r[ 2 ] ].append( r )
+                for a in missing:  # unknown aliases are cached as well (as empty tuples)
+                    cache.put( ( a, ) + context, tuple( found.get( a, ( ) ) ) )
+
+        return self._classify_references( candidates, requested, res, invert, silent )
+
+
+    def _get_alias_index( self ):
+        """return the AliasIndex in the configured directory, or None if there is none or it is outdated (checked on first use)"""
+
+        if self._alias_index is None:
+            self._alias_index = False
+            if self._alias_index_path and os.path.exists( os.path.join( self._alias_index_path, "meta.json" ) ):
+                try:
+                    from miRNexpander.DatabaseTools.AliasIndex import AliasIndex
+                    index = AliasIndex( self._alias_index_path )
+                except ( ImportError, IOError, ValueError ) as e:
+                    self._alert( "Alias index {!r} not used: {}" . format( self._alias_index_path, e ) )
+                else:
+                    if index.meta[ "digest" ] != self.getManifestDigest( self._alias_tables ):
+                        self._spill( "Alias index {!r} is outdated, resolving aliases in the database (rewrite it with --export-alias-index)." . format( self._alias_index_path ) )
+                    else:
+                        self._alias_index = index
+        return self._alias_index or None
+
+
+    def _neighbourhood_tables( self ):
+        """return the interaction tables (database keys) that the neighbourhood index covers: all queryable ones"""
+
+        dbi_defs = self.getConfItem( "db_types" )[ "interactions" ]
+        tables = set( )
+        for roles in dbi_defs.values( ):
+            for databases in roles.values( ):
+                tables |= set( [  db for db in databases if self.getTableConf( db ) and self.getTableConf( db )[ "name" ] in self._db_restriction  ] )
+        return sorted( tables )
+
+
+    def _neighbourhood_sources( self ):
+        """return the tables the neighbourhood index is built from (names as in Update_manifest)"""
+        return [  self.getTableConf( db )[ "name" ] for db in self._neighbourhood_tables( )  ] + [ "Actors" ]
+
+
+    def _get_neighbourhood_index( self ):
+        """return the NeighbourhoodIndex in the configured directory, or None if there is none or it is outdated (checked on first use)"""
+
+        if self._neighbourhood_index is None:
+            self._neighbourhood_index = False
+            if self._neighbourhood_index_path and os.path.exists( os.path.join( self._neighbourhood_index_path, "meta.json" ) ):
+                try:
+                    from miRNexpander.DatabaseTools.NeighbourhoodIndex import NeighbourhoodIndex
+                    index = NeighbourhoodIndex( self._neighbourhood_index_path )
+                except ( ImportError, IOError, ValueError, KeyError ) as e:
+                    self._alert( "Neighbourhood index {!r} not used: {}" . format( self._neighbourhood_index_path, e ) )
+                else:
+                    if index.meta[ "digest" ] != self.getManifestDigest( self._neighbourhood_sources( ) ):
+                        self._spill( "Neighbourhood index {!r} is outdated, querying the interaction tables (rewrite it with --export-neighbourhood-index)." . format( self._neighbourhood_index_path ) )
+                    else:
+                        self._neighbourhood_index = index
+        return self._neighbourhood_index or None
+
+
+    def _has_alias_lc( self ):
+        """return whether Actor_aliases has the lower-cased Alias_lc column (added by SchemaMigrator)"""
+
+        if self._alias_lc == None:
+            self._alias_lc = "Alias_lc" in [  c[ 0 ] for c in self._table_columns( "Actor_aliases" )  ]
+        return self._alias_lc
+
+
+    @RunProfile.timed( "methods" )
+    def _classify_references( self, candidates, requested, res, invert = False, silent = True ):
+        """sort alias query results into one-to-one, one-to-zero, and one-to-many mappings of the candidates
+    - requested: the lower-cased candidates
+    - res: ( ref, Alias, lower-cased Alias ) rows, or ( Alias, ref, lower-cased Alias ) rows if invert is set
+    - returns the same triple as 'query_for_references'
+"""
+
+        identified = { }
+        ambiguous = { }
+        orphans = set( )
         if invert:
-            order = "`Alias`, `ref`"
             p = { "ref" : 1, "Alias" : 0 }
         else:
-            order = "`ref`, `Alias`"
             p = { "ref" : 0, "Alias" : 1 }
-        query = "SELECT\n\t{}\nFROM\n\t`Actor_aliases`\nWHERE\n\t" . format( order )
-        if restrict[ "alias_types" ]:
-            query += "`type` IN ( SELECT `x_id` FROM `Actor_xrefs` WHERE `namespace` IN ( {} ) )\n\tAND\n\t" . format( ", " . join( self._sqlescape( restrict[ "alias_types" ] ) ) )
-        query += "`Alias` IN ( {} )" . format( ", " . join( self._sqlescape( list( requested ) ) ) )
-        if self._allowed_species:
-            query = "SELECT\n\t{}\nFROM\n\t( {} ) AS `a`\n\tJOIN `Actors` AS `g`\n\tON `a`.`ref` = `g`.`a_id`\nWHERE\n\t`g`.`species` IN ( {} )" . format( order, query.replace( "\n", "\n\t" ), ", " . join( self._sqlescape( self._allowed_species ) ) )
-        res = self._select( query )
-
-        if res == None:
-            self._alert( "Misformatted SQL query, exiting." )
-            sys.exit( 1 )
 
         if len( res ) == 0:
             orphans = requested  # nothing was found -> the whole input is classified as orphaned
         else:
+            # index the result in a single pass:
+            # - buckets maps each lower-cased alias to the set of references it hits
+            # - positions maps each reference to its aliases (first spelling per lower-cased alias, in result order)
+            buckets = defaultdict( set )
+            positions = { }
+            seen = set( )
+            ir, ia = p[ "ref" ], p[ "Alias" ]
+            for r in res:
+                ref, alias, lalias = r[ ir ], r[ ia ], r[ 2 ]
+                buckets[ lalias ].add( ref )
+                if ( ref, lalias ) in seen:
+                    continue
+                seen.add( ( ref, lalias ) )
+                try:
+                    positions[ ref ].append( alias )
+                except KeyError:
+                    positions[ ref ] = [ alias ]
+
             for alias in candidates:
-                lalias = alias.lower( )
-                s = {  t[ p[ "ref" ] ] for t in res if t[ p[ "Alias" ] ].lower( ) == lalias  }
+                s = buckets.get( alias.lower( ), ( ) )
                 if len( s ) > 1:  # spreading - one alias maps to more than one reference (can happen for histone 3, for example)
                     try:
                         ambiguous[ alias ] |= s
                     except KeyError:
-                        ambiguous[ alias ] =  s
+                        ambiguous[ alias ] = set( s )
                 elif len( s ) == 0:  # orphans - aliases without a matching reference
                     orphans.add( alias )
 
@@ -1665,32 +2314,19 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
                 self._spill( "Unresolvable aliases under given restrictions: {:d} (out of {:d})." . format( len( orphans ), len( candidates ) ) )
 
             # funneling - two or more aliases map to the same reference
-            l = len( set( zip( *res )[ p[ "ref" ] ] ) )
-            if l < len( res ):
-                if not silent:
-                    self._spill( "Identifier funneling reduced expected references by {:d}." .format( len( res ) - l ) )
-                positions = { }
-                for r in res:
-                    try:
-                        if r[ p[ "Alias" ] ].lower( ) not in {  a.lower( ) for a in positions[ r[ p[ "ref" ] ] ]  }:
-                            positions[ r[ p[ "ref" ] ] ].append( r[ p[ "Alias" ] ] )
-                    except KeyError:
-                        positions[ r[ p[ "ref" ] ] ] = [ r[ p[ "Alias" ] ] ]
-                if invert:
-                    for k, v in positions.items( ):
-                        identified.update( [ ( a.lower( ), k ) for a in v ] )
-                else:
-                    for k, v in positions.items( ):
-                        identified[ k ] = " " . join( v )
+            if not silent and len( positions ) < len( res ):
+                self._spill( "Identifier funneling reduced expected references by {:d}." .format( len( res ) - len( positions ) ) )
+            if invert:
+                for k, v in positions.iteritems( ):
+                    identified.update( [ ( a.lower( ), k ) for a in v ] )
             else:
-                if invert:
-                    identified = dict( [  ( e1.lower( ), e2 ) for e1, e2 in res  ] )
-                else:
-                    identified = dict( res )
+                for k, v in positions.iteritems( ):
+                    identified[ k ] = " " . join( v )
 
         return ( identified, orphans, ambiguous )
 
 
+    @RunProfile.timed( "methods" )
     def query_for_aliases( self, references, restrict = None, silent = False ):
         """retrieve all aliases for the given shared identifiers"""
 
@@ -1703,25 +2339,25 @@ To proceed, enter the database password for MySQL user {}: """ . format( user )
         if not requested:
             return aliased
 
-        query = """SELECT
-    ref, type, Alias
-FROM
-    Actor_aliases
-WHERE
-    ref IN ( {} )"""
-
         if restrict:
             if type( restrict ) not in ( tuple, list, dict, set ):
                 self._extalert( "Wrong parameter syntax, aborting: expected iterable for parameter 'restrict'" )
                 return 1
 
-            xrefs = dict( self._select( "SELECT `x_id`, `namespace` FROM `Actor_xrefs` WHERE `namespace` IN ( {} )" . format( ", " . join( self._sqlescape( restrict ) ) ) ) )
-            if len( xrefs ) == len( set( restrict ) ):
-                query += " AND type IN ( {} )" . format( ", " . join( self._sqlescape( xrefs.keys( ) ) ) )
-            else:
+        # with or without the alias index, the aliases are restricted to the xref types that were found (all types without restriction)
+        index = self._get_alias_index( )
+        if not restrict:
+            xrefs = index.xref_ids( ) if index else dict( self._query( *self._templates.bind( "xrefs", { } ) ) )
+        else:
+            xrefs = index.xref_ids( set( restrict ) ) if index else dict( self._query( *self._templates.bind( "xref_ids", dict( namespaces = set( restrict ) ) ) ) )
+            if len( xrefs ) != len( set( restrict ) ):
                 self._alert( "Warning: some xref types were funneled or not found: " + " " . join( restrict ) )
-
-        res = self._select( query . format( ", " . join( self._sqlescape( requested ) ) ), None, None )
+        if index:
+            res = index.aliases( requested, xrefs.keys( ) if restrict else None )
+        elif restrict:
+            res = self._select_chunked( requested, lambda chunk: self._templates.bind( "aliases_typed", dict( refs = chunk, types = xrefs.keys( ) ) ) )
+        else:
+            res = self._select_chunked( requested, lambda chunk: self._templates.bind( "aliases", dict( refs = chunk ) ) )
 
         d = aliased  # just another name to make typing easier
         found = set( )
@@ -1753,6 +2389,7 @@ WHERE
     #### annotations                                        ####
     ############################################################
 
+    @RunProfile.timed( "methods" )
     def query_for_annotations( self, candidates, silent = False ):
         """retrieve annotation data for the given identifiers"""
 
@@ -1771,24 +2408,11 @@ WHERE
             #continue
             return helper
 
-        selects = [
-                "`a_id`",  # entry id (fixed)
-                ]
-        fixed = len( selects )
-        selects += [
-                "'symbol'", "`symbol`",
-                "'description'", "`description`",
-                "'species'", "`species`",
-                ]
-        #selects.append( "`{" + prefix + "_i002}_db`" )
         #for i in t[ "retrieve" ]:
         #    i = "{:03d}" . format( i )
         #    selects.extend( [ "'{" + prefix + "_i" + i + "}'", "`{" + prefix + "_i" + i + "}`" ] )  # name and value for additional columns
 
-        froms = {  db : ""  }
-        conds = [  {  "`a_id`" : [ "IN" ] + list( id_list )  }  ]
-
-        res = self._select( selects, froms, conds )
+        res = self._select_chunked( id_list, lambda chunk: self._templates.bind( "annotations", dict( ids = chunk ) ) )
 
         lowered_list = id_list
         found_list = list( res )
@@ -1809,6 +2433,7 @@ WHERE
     #### interactions                                       ####
     ############################################################
 
+    @RunProfile.timed( "methods" )
     def query_for_interactions( self, candidates, restrict = {  "hooks" : None, "fish" : None, "ints" : None, "dbs" : None, "go" : None, "role" : None  } ):
         """retrieve interactions for the given identifiers, according to set of restrictions"""
 
@@ -1825,6 +2450,144 @@ WHERE
         elif not candidates:
             return ( )
 
+        tables = self._eligible_tables( restrict )
+        if tables == None:
+            return helper
+
+        id_list = list( set( candidates ) - set( [ self.unknown_entity ] ) )
+        fixed = 4  # the number of leading non-annotation columns in the query result: source, target, and their types
+        for db, t, pos in tables:
+            #for i in t[ "retrieve" ]:
+            #    i = "{:03d}" . format( i )
+            #    selects.extend( [ "'{" + prefix + "_i" + i + "}'", "`{" + prefix + "_i" + i + "}`" ] )  # name and value for additional columns
+            name, params, static = self._interaction_template( "interactions", db, t, pos )
+            # a two-way row may match in two different chunks, so merged results are made distinct again
+            res = self._select_chunked_iter( id_list, lambda chunk: self._templates.bind( name, dict( params, ids = chunk ), **static ), distinct = True )
+            for r in res:  # streamed, so only the converted rows are held in memory
+                helper.append( list( r[ :fixed ] ) + [ self._extract_dict( r, fixed ) ] )
+            #query = "SELECT\n\tsource, target, {}, {}, 'source_alias', source_orig, 'target_alias', target_orig, 'database"
+
+        return helper
+
+
+    @RunProfile.timed( "methods" )
+    def expand_shell( self, candidates, restrict = {  "hooks" : None, "fish" : None, "ints" : None, "dbs" : None, "go" : None, "role" : None  } ):
+        """retrieve interactions and partner annotations for the given identifiers in a single query (per chunk) across all eligible tables
+
+    The tables are combined with UNION (an interaction between two candidates is selected by both
+    of its role branches, but returned once) and joined with the Actors table, so that one
+    network shell costs one round trip instead of one per table plus an annotation query.
+    If an up-to-date neighbourhood index covers all eligible tables, it answers instead of
+    the database (see NeighbourhoodIndex).
+    - candidates: actor ids, e.g. the frontier of a network
+    - restrict: the same restrictions as for 'query_for_interactions'
+    - returns a tuple of rows in the format of 'query_for_interactions' (but as tuples), and a dictionary mapping all interaction partners to their annotation (as 'query_for_annotations' does)
+"""
+
+        if type( candidates ) not in ( tuple, list, dict, set ):
+            self._exalert( "Wrong parameter syntax, returning empty result." )
+            return ( ), { }
+        elif not candidates:
+            return ( ), { }
+
+        tables = self._eligible_tables( restrict )
+        if not tables:
+            return ( ), { }
+        index = self._get_neighbourhood_index( )
+        if index != None and not [  db for db, t, pos in tables if db not in index.tables  ]:
+            return index.expand_shell( set( candidates ) - set( [ self.unknown_entity ] ), tables )
+
+        branches = [  self._interaction_template( "shell", db, t, pos ) for db, t, pos in tables  ]
+
+        ### internal subroutine ###
+        def compose( chunk ):
+            """combine the SELECT statements of all eligible tables for a chunk of candidates"""
+
+            statements = [ ]
+            args = [ ]
+            for name, params, static in branches:
+                statement, a = self._templates.bind( name, dict( params, ids = chunk ), **static )
+                statements.append( statement )
+                args.extend( a )
+            return "\nUNION\n" . join( statements ), args
+
+        id_list = list( set( candidates ) - set( [ self.unknown_entity ] ) )
+        # a two-way row may match in two different chunks, so merged results are made distinct again
+        rows = [ ]
+        annot = { }
+        for r in self._select_chunked_iter( id_list, compose, distinct = True ):
+            rows.append( tuple( r[ :4 ] ) + ( dict( source_alias = r[ 4 ], target_alias = r[ 5 ], database = r[ 6 ], release = r[ 7 ], reldate = r[ 8 ], PMIDs = r[ 9 ] ), ) )
+            for a_id, offset in ( r[ 0 ], 10 ), ( r[ 1 ], 13 ):
+                if r[ offset ] != None and a_id not in annot:  # no annotation: LEFT JOIN found no matching actor
+                    annot[ a_id ] = dict( symbol = r[ offset ], description = r[ offset + 1 ], species = r[ offset + 2 ] )
+
+        return tuple( rows ), annot
+
+
+    @RunProfile.timed( "methods" )
+    def query_for_neighbours( self, candidates, hops = 1, kind = "all" ):
+        """return { a_id : set of the a_ids within hops (1 or 2) interactions } for the given identifiers
+    - kind: interaction type (see interdefs) of the interactions, or "all" for any queryable table
+    The neighbourhood index answers if it is up to date, otherwise the interactions are queried hop by hop.
+"""
+
+        if type( candidates ) not in ( tuple, list, dict, set ):
+            self._exalert( "Wrong parameter syntax, returning empty result." )
+            return { }
+        elif hops not in ( 1, 2 ):
+            self._alert( "Only 1 or 2 hops are supported, returning empty result." )
+            return { }
+
+        wanted = set( candidates ) - set( [ self.unknown_entity ] )
+        index = self._get_neighbourhood_index( )
+        if index != None and kind in index.types:
+            return index.neighbours( wanted, hops, kind )
+
+        restrict = { } if kind == "all" else { "ints" : kind }
+        partners = defaultdict( set )  # a_id -> interaction partners, complete for the queried ids
+        queried = set( )
+        todo = wanted
+        for hop in xrange( hops ):
+            res, annot = self.expand_shell( todo - queried, dict( restrict ) )
+            queried |= todo
+            for r in res:
+                partners[ r[ 0 ] ].add( r[ 1 ] )
+                partners[ r[ 1 ] ].add( r[ 0 ] )
+            todo = set( [  p for k in wanted for p in partners[ k ]  ] )
+
+        result = { }
+        for k in wanted:
+            found = set( partners[ k ] )
+            if hops > 1:
+                for p in partners[ k ]:
+                    found |= partners[ p ]
+            found.discard( k )
+            result[ k ] = found
+        return result
+
+
+    def _interaction_template( self, name, db, t, pos ):
+        """return template name, fixed parameters, and identifiers for querying an interaction table (see SQLTemplates)
+    - name: "interactions" or "shell"; two-way tables use the corresponding "_two_way" template
+    - db, t, pos: a triple as returned by '_eligible_tables'
+"""
+
+        mapping = self.getSQLMapping( )
+        static = dict( table = db, column = mapping[ t[ "affix" ] + "_i" + pos[ 0 ] ] )
+        if len( pos ) > 1:
+            name += "_two_way"
+            static[ "column2" ] = mapping[ t[ "affix" ] + "_i" + pos[ 1 ] ]
+        params = dict( src = t[ "src" ], tgt = t[ "tgt" ], database = db, release = t[ "release" ], reldate = t[ "reldate" ] )
+
+        return name, params, static
+
+
+    def _eligible_tables( self, restrict ):
+        """complete the restrictions (in place) and return the interaction tables that are eligible for querying
+    - restrict: dictionary of restrictions as accepted by 'query_for_interactions'
+    - returns a list of ( database, table configuration, candidate column numbers ) triples, or None if the restrictions cannot be interpreted
+"""
+
         dbi_defs = self.getConfItem( "db_types" )[ "interactions" ]  # maps mol_type to src-tgt relation with databases
         int_defs = self.getConfItem( "interdefs" )  # maps interactions to src-tgt definitions
         query_defs = self._db_restriction  # allowed databases
@@ -1837,12 +2600,11 @@ WHERE
                     restrict[ key ] = set( restrict[ key ] )  # works only if key element is an iterable
                 except:
                     self._alert( "The {!r} restriction is not a string and not iterable either, aborting." . format( key ) )
-                    return helper
+                    return None
             else:
                 restrict[ key ] = set( [ restrict[ key ] ] )  # string becomes the set's single element
 
-        _org = self.getConfItem( "suffixes" )[ "org" ]
-        id_list = list( set( candidates ) - set( [ self.unknown_entity ] ) )
+        tables = [ ]
         for mol_type in restrict[ "hooks" ]:  # only nodes of eligible types may serve as hooks
             for role, oppos, pos in ( "src", "tgt", ( "001", ) ), ( "tgt", "src", ( "002", ) ), ( "two-way", None, ( "001", "002" ) ):
                 if role not in dbi_defs[ mol_type ] or role not in restrict[ "role" ]:
@@ -1856,37 +2618,12 @@ WHERE
                         or t[ "tgt" ] not in set.union( *[ int_defs[ s ][ "tgt" ] for s in restrict[ "ints" ] ] )  # ... interaction type (partner 2)
                     ):
                         continue  # skip this table because it is not eligible for querying
-                    try:
-                        prefix = t[ "affix" ]
-                    except KeyError:
+                    if "affix" not in t:
                         self._extalert( "Warning: Table configuration for {!r} not found." . format( db ) )
                         continue
-                    selects = [
-                            "`source`", # source id (fixed)
-                            "`target`", # target id (fixed)
-                            "'" + t[ "src" ] + "'",  # source type (fixed)
-                            "'" + t[ "tgt" ] + "'",  # target type (fixed)
-                            ]
-                    fixed = len( selects )  # the number of leading non-annotation columns in the query result (comes from definition of 'selects' )
-                    selects = [ "DISTINCT" ] + selects + [
-                            "'source_alias'", "`source_orig`",
-                            "'target_alias'", "`target_orig`",
-                            "'database'", "'" + db + "'",
-                            "'release'", "'" + t[ "release" ] + "'",
-                            "'reldate'", "'" + t[ "reldate" ] + "'",
-                            "'PMIDs'", "`PMIDs`",
-                            ]
-                    #for i in t[ "retrieve" ]:
-                    #    i = "{:03d}" . format( i )
-                    #    selects.extend( [ "'{" + prefix + "_i" + i + "}'", "`{" + prefix + "_i" + i + "}`" ] )  # name and value for additional columns
-                    froms = {  db : ""  }
-                    conds = [ {  "{" + prefix + "_i" + p + "}" : [ "IN" ] + id_list  } for p in pos ]
-                    res = self._select( selects, froms, conds )
-                    for r in res:
-                        helper.append( list( r[ :fixed ] ) + [ self._extract_dict( r, fixed ) ] )
-                    #query = "SELECT\n\tsource, target, {}, {}, 'source_alias', source_orig, 'target_alias', target_orig, 'database"
+                    tables.append( ( db, t, pos ) )
 
-        return helper
+        return tables
 
 
     ############################################################
@@ -1895,16 +2632,123 @@ WHERE
 
     def _sqlescape( self, elements ):
         """escape the elements for an sql query"""
-        return self._mysql_escape( list( elements ), self._mysql_escape_conversions )
+        return self._backend.escape( elements )
 
     def _sqllist( self, elements ):
         """sql-escape elements and concatenate into string"""
-        return ", " . join( self._mysql_escape( list( elements ), self._mysql_escape_conversions ) )
+        return ", " . join( self._backend.escape( elements ) )
+
+
+    def _chunks( self, elements ):
+        """split elements into lists of at most the configured chunk size"""
+
+        elements = list( elements )
+        for i in xrange( 0, len( elements ), self._chunk_size ):
+            yield elements[ i : i + self._chunk_size ]
+
+
+    def _select_chunked( self, candidates, compose, distinct = False ):
+        """run one SELECT per chunk of candidates and merge the partial results
+    - compose: function that turns a chunk (list) into a statement and its arguments (see SQLTemplates.bind)
+    - distinct: drop rows that were already returned for a previous chunk
+"""
+
+        rows = [ ]
+        seen = set( )
+        for chunk in self._chunks( candidates ):
+            res = self._query( *compose( chunk ) )
+            if distinct:
+                res = [ r for r in res if r not in seen ]
+                seen.update( res )
+            rows.extend( res )
+
+        return tuple( rows )
+
+
+    def _select_chunked_iter( self, candidates, compose, distinct = False ):
+        """streaming variant of '_select_chunked' that yields the rows of one chunk after the other
+    - compose: function that turns a chunk (list) into a statement and its arguments (see SQLTemplates.bind)
+    - distinct: drop rows that were already returned for a previous chunk (only needs to remember rows if there is more than one chunk)
+"""
+
+        candidates = list( candidates )
+        seen = set( ) if distinct and len( candidates ) > self._chunk_size else None
+        for chunk in self._chunks( candidates ):
+            for r in self._query_iter( *compose( chunk ) ):
+                if seen != None:
+                    if r in seen:
+                        continue
+                    seen.add( r )
+                yield r
+
+
+    def _query( self, statement, args = None ):
+        """run a statement with bound arguments (e.g. from SQLTemplates.bind) and return all rows"""
+
+        start = time.time( )
+        try:
+            rows = self._execute( statement, args ).fetchall( )
+        except DatabaseError as e:
+            self._alert( "SQL Query Error.\nDescription: {}\nAffected SQL Query:\n{}\n\n" . format( e, statement ) )
+            return ( )
+        if RunProfile.enabled:
+            RunProfile.record( "queries", RunProfile.label( statement ), time.time( ) - start, len( rows ) )
+        return rows
+
+
+    def _query_iter( self, statement, args = None ):
+        """like '_query', but stream the rows from a server-side cursor"""
+
+        rows = self._execute_iter( statement, args )
+        if RunProfile.enabled:
+            rows = RunProfile.timed_rows( "queries", RunProfile.label( statement ), rows )
+        try:
+            for r in rows:
+                yield r
+        except DatabaseError as e:
+            self._alert( "SQL Query Error.\nDescription: {}\nAffected SQL Query:\n{}\n\n" . format( e, statement ) )
 
 
     def _select( self, sql_sel, sql_from = None, sql_where = None ):
         """handle arbitrary SELECT statements (by parsing a complicated syntax)"""
 
+        query = self._compose_select( sql_sel, sql_from, sql_where )
+        if query == None:
+            return
+        #print( query, "\n" )
+
+        start = time.time( )
+        try:
+            rows = self._execute( query ).fetchall( )
+            #print( "Queried {}, {:d} hits" . format( ", ".  join( sql_from.keys( ) ), len( rows ) ) )
+            if RunProfile.enabled:
+                RunProfile.record( "queries", RunProfile.label( query ), time.time( ) - start, len( rows ) )
+            return rows
+        except DatabaseError as e:
+            self._alert( "SQL Query Error.\nDescription: {}\nAffected SQL Query:\n{}\n\n" . format( e, query ) )
+            return ( )
+
+
+    def _select_iter( self, sql_sel, sql_from = None, sql_where = None ):
+        """like '_select', but stream the rows from a server-side cursor instead of collecting them (see DatabaseConnector._execute_iter)"""
+
+        query = self._compose_select( sql_sel, sql_from, sql_where )
+        if query == None:
+            return
+
+        rows = self._execute_iter( query )
+        if RunProfile.enabled:
+            rows = RunProfile.timed_rows( "queries", RunProfile.label( query ), rows )
+        try:
+            for r in rows:
+                yield r
+        except DatabaseError as e:
+            self._alert( "SQL Query Error.\nDescription: {}\nAffected SQL Query:\n{}\n\n" . format( e, query ) )
+
+
+    def _compose_select( self, sql_sel, sql_from = None, sql_where = None ):
+        """build the query string for '_select' from its arguments, or return None if they cannot be interpreted"""
+
         if [ type( sql_sel ), type( sql_from ), type( sql_where ) ] == [ list, dict, list ]:
 
             # The data structures are parsed according to the rules outlined below.
@@ -1957,7 +2801,7 @@ WHERE
                     if len( v ) == 1:
                         continue
                     try:
-                        v[ 1: ] = self._mysql_escape( v[ 1: ], self._mysql_escape_conversions )
+                        v[ 1: ] = self._sqlescape( v[ 1: ] )
                         if v[ 0 ] in ( "IN", "NOT IN" ):
                             helper.append( "{} {} ( {} )" . format( k, v[ 0 ], ", " . join( v[ 1: ] ) ) )
                         else:
@@ -1975,26 +2819,34 @@ WHERE
             query = sql_sel . format( **self.getSQLMapping( ) )
         else:
             self._alert( "Warning: Method '_select' takes either list, dict, list or one character string as arguments." )
-            return
-        #print( query, "\n" )
+            return None
 
-        try:
-            self._cursor.execute( query )
-            rows = self._cursor.fetchall( )
-            #print( "Queried {}, {:d} hits" . format( ", ".  join( sql_from.keys( ) ), len( rows ) ) )
-            return rows
-        except MySQLdb.Error as e:
-            self._alert( "SQL Query Error.\nDescription: {}\nAffected SQL Query:\n{}\n\n" . format( e, query ) )
-            return ( )
+        return query
 
 
     def _sql( self, sql_statement ):
         """execute arbitrary sql statements"""
 
+        start = time.time( )
         try:
-            self._cursor.execute( sql_statement )
-            return self._cursor.fetchall( )  # collect all rows that the query yielded
-        except MySQLdb.Error as e:
+            rows = self._execute( sql_statement ).fetchall( )  # collect all rows that the query yielded
+            if RunProfile.enabled:
+                RunProfile.record( "queries", RunProfile.label( sql_statement ), time.time( ) - start, len( rows ) )
+            return rows
+        except DatabaseError as e:
             self._alert( "SQL Error.\nDescription: {}\nAffected SQL Query:\n{}\n\n" . format( e, sql_statement ) )
             return 1
 
+
+    def _sql_iter( self, sql_statement ):
+        """execute an arbitrary query and stream its rows from a server-side cursor (yields nothing on errors)"""
+
+        rows = self._execute_iter( sql_statement )
+        if RunProfile.enabled:
+            rows = RunProfile.timed_rows( "queries", RunProfile.label( sql_statement ), rows )
+        try:
+            for r in rows:
+                yield r
+        except DatabaseError as e:
+            self._alert( "SQL Error.\nDescription: {}\nAffected SQL Query:\n{}\n\n" . format( e, sql_statement ) )
+
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+
+import sqlite3
+from miRNexpander.mWBBase import mWBBaseClass
+
+try:
+    import resource
+except ImportError:  # not available on every platform
+    resource = None
+
+
+def peak_rss( ):
+    """return the peak resident set size of this process in MB (None if unknown)"""
+
+    if resource is None:
+        return None
+    return resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss / 1024.0  # ru_maxrss is given in kB on Linux
+
+
+class GeneStore( mWBBaseClass ):
+    """on-disk join store that accumulates actors and their cross-references while the gene annotation is compiled"""
+
+    GENE, UNKNOWN, COMPLEX, DRUG = xrange( 4 )
+
+    def __init__( self, path = "", batch_size = 20000 ):
+        """initialize values"""
+
+        # the empty path creates a private temporary database, which SQLite removes once the connection is closed
+        self._db = sqlite3.connect( path )
+        self._db.text_factory = str
+        self._batch_size = batch_size
+        self._alias_index = False
+        self._db.executescript( """
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            PRAGMA temp_store = FILE;
+            CREATE TABLE actors ( key INTEGER PRIMARY KEY, kind INTEGER, tax INTEGER, symbol TEXT, descr TEXT );
+            CREATE TABLE symbols ( tax INTEGER, symbol TEXT, key INTEGER );
+            CREATE INDEX symbols_symbol ON symbols ( tax, symbol );
+            CREATE TABLE xrefs ( key INTEGER, type INTEGER, alias TEXT );
+            CREATE TABLE members ( complex INTEGER, member INTEGER, role TEXT, count INTEGER );
+            CREATE TABLE ids ( a_id INTEGER PRIMARY KEY, key INTEGER UNIQUE );
+        """ )
+
+
+    def ingest( self, records ):
+        """store an iterable of ( actor, xrefs ) pairs in batches; actor is ( key, kind, tax, symbol, descr ) or None, xrefs holds ( key, type, alias ) triples"""
+
+        actors, xrefs = [ ], [ ]
+        count = 0
+        for actor, refs in records:
+            if actor is not None:
+                actors.append( actor )
+            xrefs.extend( refs )
+            count += 1
+            if len( xrefs ) >= self._batch_size or len( actors ) >= self._batch_size:
+                self._flush( actors, xrefs )
+                actors, xrefs = [ ], [ ]
+        self._flush( actors, xrefs )
+        return count
+
+
+    def _flush( self, actors, xrefs ):
+        """write buffered rows to the store"""
+
+        if actors:
+            self._db.executemany( "INSERT OR REPLACE INTO actors VALUES ( ?, ?, ?, ?, ? )", actors )  # later records win, as in a dict
+            self._db.executemany( "INSERT INTO symbols VALUES ( ?, ?, ? )", [  ( a[ 2 ], a[ 3 ], a[ 0 ] ) for a in actors if a[ 1 ] == self.GENE  ] )
+        if xrefs:
+            self._db.executemany( "INSERT INTO xrefs VALUES ( ?, ?, ? )", xrefs )
+
+
+    def add_actor( self, key, kind, tax, symbol, descr ):
+        """store a single actor"""
+        self._db.execute( "INSERT OR REPLACE INTO actors VALUES ( ?, ?, ?, ?, ? )", ( key, kind, tax, symbol, descr ) )
+        if kind == self.GENE:
+            self._db.execute( "INSERT INTO symbols VALUES ( ?, ?, ? )", ( tax, symbol, key ) )
+
+
+    def add_xrefs( self, xrefs ):
+        """store ( key, type, alias ) triples"""
+        self._db.executemany( "INSERT INTO xrefs VALUES ( ?, ?, ? )", xrefs )
+
+
+    def add_members( self, members ):
+        """store ( complex, member, role, count ) quadruples"""
+        self._db.executemany( "INSERT INTO members VALUES ( ?, ?, ?, ? )", members )
+
+
+    def has( self, key ):
+        """return whether an actor with the given key is known"""
+        return self._db.execute( "SELECT 1 FROM actors WHERE key = ?", ( key, ) ).fetchone( ) is not None
+
+
+    def gene_by_symbol( self, tax, symbol ):
+        """return the key of the (last stored) gene with the given taxon and symbol, or None"""
+
+        r = self._db.execute( "SELECT key FROM symbols WHERE tax = ? AND symbol = ? ORDER BY rowid DESC LIMIT 1", ( tax, symbol ) ).fetchone( )
+        return r[ 0 ] if r else None
+
+
+    def gene_by_alias( self, ref_type, alias ):
+        """return the key of the (last stored) gene carrying the given alias, or None"""
+
+        if not self._alias_index:  # only needed by few sources, so the index is built on first use
+            self._db.execute( "CREATE INDEX xrefs_alias ON xrefs ( alias, type )" )
+            self._alias_index = True
+        r = self._db.execute( "SELECT x.key FROM xrefs AS x JOIN actors AS a ON a.key = x.key WHERE x.alias = ? AND x.type = ? AND a.kind = ? ORDER BY x.rowid DESC LIMIT 1",
+                              ( alias, ref_type, self.GENE ) ).fetchone( )
+        return r[ 0 ] if r else None
+
+
+    def number( self ):
+        """assign database ids: genes are numbered consecutively by key, all other actors keep their key"""
+
+        self._db.execute( "DELETE FROM ids" )
+        # rowids are handed out in insertion order, i.e. 1, 2, ... along the sorted gene keys
+        self._db.execute( "INSERT INTO ids ( key ) SELECT key FROM actors WHERE kind = ? ORDER BY key", ( self.GENE, ) )
+        self._db.execute( "INSERT INTO ids ( a_id, key ) SELECT key, key FROM actors WHERE kind != ?", ( self.GENE, ) )
+        self._db.commit( )
+
+
+    def a_id( self, key ):
+        """return the database id assigned to key, or None"""
+
+        r = self._db.execute( "SELECT a_id FROM ids WHERE key = ?", ( key, ) ).fetchone( )
+        return r[ 0 ] if r else None
+
+
+    def actor_rows( self ):
+        """yield ( species, a_id, symbol, description ) rows in id order"""
+        return self._db.execute( "SELECT a.tax, i.a_id, a.symbol, a.descr FROM actors AS a JOIN ids AS i ON i.key = a.key ORDER BY i.a_id" )
+
+
+    def alias_rows( self ):
+        """yield distinct ( a_id, alias, type ) rows of all known actors"""
+        return self._db.execute( "SELECT DISTINCT i.a_id, x.alias, x.type FROM xrefs AS x JOIN ids AS i ON i.key = x.key" )
+
+
+    def member_rows( self, unknown ):
+        """yield ( complex a_id, member a_id, role, count ) rows; unmappable members are assigned to unknown"""
+        return self._db.execute( "SELECT c.a_id, IFNULL( m.a_id, ? ), x.role, x.count FROM members AS x JOIN ids AS c ON c.key = x.complex LEFT JOIN ids AS m ON m.key = x.member", ( unknown, ) )
+
+
+    def close( self ):
+        """close the store (the temporary database is removed)"""
+        self._db.close( )
@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+
+import os
+import json
+import time
+import numpy
+from bisect import bisect_left, bisect_right
+from miRNexpander.mWBBase import mWBBaseClass
+from miRNexpander import RunProfile
+
+# file names of the arrays that make up a snapshot (each is stored as '<name>.npy')
+_arrays = (
+        "nodes",  # sorted a_ids of all actors and interaction partners; a node's position is its index in all other arrays
+        "symbol", "description", "species",  # actor annotation per node (string indices, -1 if not annotated)
+        "out_ptr", "out_edges", "in_ptr", "in_edges",  # CSR adjacency: edges of node i are [ *_edges[ j ] for j in *_ptr[ i ] : *_ptr[ i + 1 ] ]
+        "e_source", "e_target", "e_table", "e_source_orig", "e_target_orig", "e_pmids",  # edge columns
+        "al_key", "al_alias", "al_ref", "al_type",  # aliases, sorted by lower-cased alias (al_key)
+        "x_id", "x_namespace",  # alias types
+        "str_blob", "str_offsets",  # string table: string i is str_blob[ str_offsets[ i ] : str_offsets[ i + 1 ] ]
+)
+_version = 1
+
+
+class _StringColumn( object ):
+    """read-only sequence view of strings in the string table, as referenced by an index array (suited for bisect)"""
+
+    def __init__( self, snapshot, indices ):
+        self._snapshot = snapshot
+        self._indices = indices
+
+    def __len__( self ):
+        return len( self._indices )
+
+    def __getitem__( self, i ):
+        return self._snapshot.string( self._indices[ i ] )
+
+
+class GraphSnapshot( mWBBaseClass ):
+    """compact array representation of all queryable interaction tables, their actors, and aliases"""
+
+    def __init__( self, path ):
+        """load (memory-map) the snapshot stored in directory path"""
+
+        self.path = path
+        try:
+            stream = open( os.path.join( path, "meta.json" ) )
+        except IOError:
+            raise IOError( "No graph snapshot found in {!r}." . format( path ) )
+        self.meta = json.load( stream )
+        stream.close( )
+        if self.meta[ "version" ] != _version:
+            raise IOError( "Graph snapshot in {!r} has version {}, expected {}." . format( path, self.meta[ "version" ], _version ) )
+
+        for name in _arrays:
+            setattr( self, name, numpy.load( os.path.join( path, name + ".npy" ), mmap_mode = "r" ) )
+
+        self.tables = dict( [ ( t[ "database" ], i ) for i, t in enumerate( self.meta[ "tables" ] ) ] )  # database -> table code
+        self._alias_keys = _StringColumn( self, self.al_key )
+
+
+    ############################################################
+    #### export                                             ####
+    ############################################################
+
+    @staticmethod
+    def export( db_handler, path ):
+        """write a snapshot of all queryable interaction tables, Actors, and Actor_aliases to directory path
+    - db_handler: connected DatabaseHandler
+    - path: target directory (created if missing, existing snapshot files are replaced)
+    - returns the number of edges written
+"""
+
+        start = time.time( )
+        strings = { }  # string -> index in the string table
+
+        ### internal subroutine ###
+        def intern( value ):
+            """return the index of value in the string table (-1 for NULL)"""
+
+            if value == None:
+                return -1
+            if type( value ) == unicode:
+                value = value.encode( "utf-8" )
+            else:
+                value = str( value )
+            try:
+                return strings[ value ]
+            except KeyError:
+                strings[ value ] = len( strings )
+                return strings[ value ]
+
+        # eligible tables are interaction tables that take part in network building
+        dbi_defs = db_handler.getConfItem( "db_types" )[ "interactions" ]
+        query_dbs = db_handler.getConfItem( "query_dbs" )
+        tables = [ ]
+        for mol_type in sorted( dbi_defs ):
+            for role in sorted( dbi_defs[ mol_type ] ):
+                for db in dbi_defs[ mol_type ][ role ]:
+                    t = db_handler.getTableConf( db )
+                    if t and t[ "name" ] in query_dbs and db not in [ e[ "database" ] for e in tables ]:
+                        tables.append( dict( database = db, src = t[ "src" ], tgt = t[ "tgt" ], release = t[ "release" ], reldate = t[ "reldate" ] ) )
+
+        # edges
+        e_source, e_target, e_table, e_source_orig, e_target_orig, e_pmids = [ ], [ ], [ ], [ ], [ ], [ ]
+        for code, t in enumerate( tables ):
+            res = db_handler._select( "SELECT DISTINCT `source`, `target`, `source_orig`, `target_orig`, `PMIDs` FROM " + t[ "database" ] )
+            for r in res:
+                e_source.append( r[ 0 ] )
+                e_target.append( r[ 1 ] )
+                e_table.append( code )
+                e_source_orig.append( intern( r[ 2 ] ) )
+                e_target_orig.append( intern( r[ 3 ] ) )
+                e_pmids.append( intern( r[ 4 ] ) )
+            db_handler._spill( "Snapshot: {:d} interactions from {}." . format( len( res ), t[ "database" ] ) )
+
+        # nodes and their annotation
+        actors = db_handler._select( "SELECT `a_id`, `symbol`, `description`, `species` FROM `Actors`" )
+        nodes = numpy.unique( numpy.array( [ r[ 0 ] for r in actors ] + e_source + e_target, dtype = numpy.int64 ) )
+        symbol = numpy.full( len( nodes ), -1, dtype = numpy.int32 )
+        description = numpy.full( len( nodes ), -1, dtype = numpy.int32 )
+        species = numpy.full( len( nodes ), -1, dtype = numpy.int64 )
+        if actors:
+            pos = numpy.searchsorted( nodes, [ r[ 0 ] for r in actors ] )
+            symbol[ pos ] = [ intern( r[ 1 ] ) for r in actors ]
+            description[ pos ] = [ intern( r[ 2 ] ) for r in actors ]
+            species[ pos ] = [ -1 if r[ 3 ] == None else r[ 3 ] for r in actors ]
+        del actors
+
+        # CSR adjacency in both directions
+        arrays = dict( nodes = nodes, symbol = symbol, description = description, species = species )
+        e_source = numpy.searchsorted( nodes, numpy.array( e_source, dtype = numpy.int64 ) ).astype( numpy.int32 )
+        e_target = numpy.searchsorted( nodes, numpy.array( e_target, dtype = numpy.int64 ) ).astype( numpy.int32 )
+        for direction, ends in ( "out", e_source ), ( "in", e_target ):
+            arrays[ direction + "_edges" ] = numpy.argsort( ends, kind = "mergesort" ).astype( numpy.int64 )
+            arrays[ direction + "_ptr" ] = numpy.concatenate( ( [ 0 ], numpy.cumsum( numpy.bincount( ends, minlength = len( nodes ) ) ) ) ).astype( numpy.int64 )
+        arrays.update(
+                e_source = e_source,
+                e_target = e_target,
+                e_table = numpy.array( e_table, dtype = numpy.int16 ),
+                e_source_orig = numpy.array( e_source_orig, dtype = numpy.int32 ),
+                e_target_orig = numpy.array( e_target_orig, dtype = numpy.int32 ),
+                e_pmids = numpy.array( e_pmids, dtype = numpy.int32 ),
+                )
+
+        # aliases, sorted by their lower-cased spelling for binary search
+        aliases = db_handler._select( "SELECT `ref`, `type`, `Alias` FROM `Actor_aliases`" )
+        aliases = sorted( [ ( str( r[ 2 ] ) . lower( ), intern( r[ 2 ] ), r[ 0 ], r[ 1 ] ) for r in aliases ] )
+        arrays.update(
+                al_key = numpy.array( [ intern( r[ 0 ] ) for r in aliases ], dtype = numpy.int32 ),
+                al_alias = numpy.array( [ r[ 1 ] for r in aliases ], dtype = numpy.int32 ),
+                al_ref = numpy.array( [ r[ 2 ] for r in aliases ], dtype = numpy.int64 ),
+                al_type = numpy.array( [ r[ 3 ] for r in aliases ], dtype = numpy.int32 ),
+                )
+        del aliases
+        xrefs = db_handler._select( "SELECT `x_id`, `namespace` FROM `Actor_xrefs`" )
+        arrays.update(
+                x_id = numpy.array( [ r[ 0 ] for r in xrefs ], dtype = numpy.int32 ),
+                x_namespace = numpy.array( [ intern( r[ 1 ] ) for r in xrefs ], dtype = numpy.int32 ),
+                )
+
+        # string table
+        ordered = sorted( strings, key = strings.get )
+        arrays[ "str_offsets" ] = numpy.concatenate( ( [ 0 ], numpy.cumsum( [ len( s ) for s in ordered ] ) ) ).astype( numpy.int64 )
+        arrays[ "str_blob" ] = numpy.array( bytearray( "" . join( ordered ) ), dtype = numpy.uint8 )
+
+        if not os.path.isdir( path ):
+            os.makedirs( path )
+        for name in _arrays:
+            numpy.save( os.path.join( path, name + ".npy" ), arrays[ name ] )
+        stream = open( os.path.join( path, "meta.json" ), "w" )
+        json.dump( dict( version = _version, created = time.strftime( "%Y-%m-%d %H:%M:%S" ), tables = tables ), stream, indent = 1 )
+        stream.close( )
+
+        db_handler._spill( "Snapshot: {:d} nodes, {:d} edges, {:d} aliases written to {!r} in {:.1f} s." . format(
+                len( nodes ), len( e_source ), len( arrays[ "al_ref" ] ), path, time.time( ) - start ) )
+        return len( e_source )
+
+
+    ############################################################
+    #### lookups                                            ####
+    ############################################################
+
+    def string( self, i ):
+        """return string i of the string table (None for -1)"""
+
+        if i < 0:
+            return None
+        return self.str_blob[ self.str_offsets[ i ] : self.str_offsets[ i + 1 ] ].tobytes( )
+
+
+    def positions( self, a_ids ):
+        """return the node positions of the given a_ids (unknown ids are dropped)"""
+
+        a_ids = numpy.unique( numpy.array( list( a_ids ), dtype = numpy.int64 ) )
+        pos = numpy.searchsorted( self.nodes, a_ids )
+        found = pos < len( self.nodes )
+        found[ found ] = self.nodes[ pos[ found ] ] == a_ids[ found ]
+        return pos[ found ]
+
+
+    def edges( self, positions, direction ):
+        """return the ids of all edges leaving ("out") or entering ("in") the nodes at positions"""
+
+        ptr = getattr( self, direction + "_ptr" )
+        starts = ptr[ positions ]
+        lengths = ptr[ positions + 1 ] - starts
+        total = lengths.sum( )
+        if not total:
+            return numpy.zeros( 0, dtype = numpy.int64 )
+        # concatenate the ranges [ start, start + length ) without a Python loop
+        steps = numpy.arange( total ) + numpy.repeat( starts - ( numpy.cumsum( lengths ) - lengths ), lengths )
+        return getattr( self, direction + "_edges" )[ steps ]
+
+
+    def annotation( self, position ):
+        """return the annotation dictionary of the node at position, or None if it is not annotated"""
+
+        if self.symbol[ position ] < 0:
+            return None
+        species = int( self.species[ position ] )
+        return dict( symbol = self.string( self.symbol[ position ] ), description = self.string( self.description[ position ] ), species = None if species < 0 else species )
+
+
+    def aliases( self, lalias ):
+        """return ( ref, Alias, type ) triples for the lower-cased alias"""
+
+        lo = bisect_left( self._alias_keys, lalias )
+        hi = bisect_right( self._alias_keys, lalias, lo )
+        return [  ( int( self.al_ref[ i ] ), self.string( self.al_alias[ i ] ), int( self.al_type[ i ] ) ) for i in xrange( lo, hi )  ]
+
+
+    def xref_ids( self, namespaces ):
+        """return the alias type ids of the given namespaces"""
+
+        namespaces = set( namespaces )
+        return set( [  int( self.x_id[ i ] ) for i in xrange( len( self.x_id ) ) if self.string( self.x_namespace[ i ] ) in namespaces  ] )
+
+
+
+class SnapshotHandler( mWBBaseClass ):
+    """answer the network building queries of a DatabaseHandler from a graph snapshot; everything else is passed on to the handler"""
+
+    def __init__( self, db_handler, path ):
+        """initialize values"""
+
+        self._db = db_handler
+        start = time.time( )
+        self._snapshot = GraphSnapshot( path )
+        self._spill( "Loaded graph snapshot {!r} ({:d} nodes, {:d} edges) in {:.3f} s." . format(
+                path, len( self._snapshot.nodes ), len( self._snapshot.e_table ), time.time( ) - start ) )
+
+
+    def __getattr__( self, name ):
+        """fall back to the wrapped DatabaseHandler"""
+        return getattr( self._db, name )
+
+
+    def getSnapshotStamp( self ):
+        """return the identity of the loaded snapshot (directory, creation time and meta.json modification time), which distinguishes its networks from those built from the database"""
+        return dict( path = os.path.abspath( self._snapshot.path ), created = self._snapshot.meta[ "created" ],
+                     mtime = os.path.getmtime( os.path.join( self._snapshot.path, "meta.json" ) ) )
+
+
+    @RunProfile.timed( "methods", "query_for_references (snapshot)" )
+    def query_for_references( self, candidates, restrict = { "alias_types" : None }, invert = False, silent = True ):
+        """retrieve shared identifiers for the given aliases (see DatabaseHandler)"""
+
+        if type( candidates ) not in ( tuple, list, dict, set ):
+            self._exalert( "Wrong parameter syntax, aborting: expected iterable for parameter 'candidates'" )
+            return 1
+        if type( restrict ) != dict or "alias_types" not in restrict:
+            restrict = { "alias_types" : None }
+        elif type( restrict[ "alias_types" ] ) == str:
+            restrict = { "alias_types" : set( [ restrict[ "alias_types" ] ] ) }
+
+        requested = {  str( e ).lower( ) for e in candidates  }
+        if not requested:
+            return ( { }, set( ), { } )
+
+        snap = self._snapshot
+        types = snap.xref_ids( restrict[ "alias_types" ] ) if restrict[ "alias_types" ] else None
+        allowed = set( self._db._allowed_species ) if self._db._allowed_species else None
+        res = [ ]
+        for a in requested:
+            for ref, alias, x in snap.aliases( a ):
+                if types != None and x not in types:
+                    continue
+                if allowed != None:
+                    pos = snap.positions( [ ref ] )
+                    if not len( pos ) or snap.species[ pos[ 0 ] ] not in allowed:
+                        continue
+                res.append( ( alias, ref, a ) if invert else ( ref, alias, a ) )
+
+        return self._db._classify_references( candidates, requested, res, invert, silent )
+
+
+    @RunProfile.timed( "methods", "query_for_annotations (snapshot)" )
+    def query_for_annotations( self, candidates, silent = False ):
+        """retrieve annotation data for the given identifiers (see DatabaseHandler)"""
+
+        helper = { }
+        if type( candidates ) not in ( tuple, list, dict, set ):
+            self._exalert( "Wrong parameter syntax, returning empty result." )
+            return helper
+
+        snap = self._snapshot
+        for pos in snap.positions( candidates ):
+            a = snap.annotation( pos )
+            if a != None:
+                helper[ int( snap.nodes[ pos ] ) ] = a
+
+        if not silent and len( helper ) < len( set( candidates ) ):
+            self._spill( "Unable to annotate {:d} identifier(s) (out of {:d})." . format( len( set( candidates ) ) - len( helper ), len( set( candidates ) ) ) )
+
+        return helper
+
+
+    @RunProfile.timed( "methods", "query_for_interactions (snapshot)" )
+    def query_for_interactions( self, candidates, restrict = {  "hooks" : None, "fish" : None, "ints" : None, "dbs" : None, "go" : None, "role" : None  } ):
+        """retrieve interactions for the given identifiers, according to set of restrictions (see DatabaseHandler)"""
+
+        rows, annot = self.expand_shell( candidates, restrict )
+        return [ list( r ) for r in rows ]
+
+
+    @RunProfile.timed( "methods", "expand_shell (snapshot)" )
+    def expand_shell( self, candidates, restrict = {  "hooks" : None, "fish" : None, "ints" : None, "dbs" : None, "go" : None, "role" : None  } ):
+        """retrieve interactions and partner annotations for the given identifiers by array lookups (see DatabaseHandler)"""
+
+        if type( candidates ) not in ( tuple, list, dict, set ):
+            self._exalert( "Wrong parameter syntax, returning empty result." )
+            return ( ), { }
+        elif not candidates:
+            return ( ), { }
+
+        tables = self._db._eligible_tables( restrict )
+        if not tables:
+            return ( ), { }
+
+        snap = self._snapshot
+        positions = snap.positions( set( candidates ) - set( [ self._db.unknown_entity ] ) )
+        edges = dict( [ ( d, snap.edges( positions, d ) ) for d in ( "out", "in" ) ] )
+        rows = [ ]
+        annot = { }
+        for db, t, pos in tables:
+            try:
+                code = snap.tables[ db ]
+            except KeyError:
+                self._extalert( "Warning: Table {!r} is not part of the graph snapshot." . format( db ) )
+                continue
+            selected = numpy.unique( numpy.concatenate( [  edges[ d ] for p, d in ( "001", "out" ), ( "002", "in" ) if p in pos  ] ) )
+            selected = selected[ snap.e_table[ selected ] == code ]
+            for e in selected:
+                s, g = snap.e_source[ e ], snap.e_target[ e ]
+                k1, k2 = int( snap.nodes[ s ] ), int( snap.nodes[ g ] )
+                rows.append( ( k1, k2, t[ "src" ], t[ "tgt" ], dict(
+                        source_alias = snap.string( snap.e_source_orig[ e ] ),
+                        target_alias = snap.string( snap.e_target_orig[ e ] ),
+                        database = db, release = t[ "release" ], reldate = t[ "reldate" ],
+                        PMIDs = snap.string( snap.e_pmids[ e ] ),
+                        ) ) )
+                for k, n in ( k1, s ), ( k2, g ):
+                    if k not in annot:
+                        a = snap.annotation( n )
+                        if a != None:
+                            annot[ k ] = a
+
+        return tuple( rows ), annot
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+# this module opens (possibly compressed) database files for reading
+
+import os, errno
+import signal
+import subprocess
+from glob import glob
+
+# suffix -> ( external decompression program, name of the Python fallback module )
+Compressions = {
+    ".gz" : ( "gzip", "gzip" ),
+    ".bz2" : ( "bzip2", "bz2" ),
+    ".xz" : ( "xz", "lzma" ),
+}
+
+
+class _PipedInput( object ):
+    """read-only file object for the output of a decompression process running alongside the parser"""
+
+    def __init__( self, path, program ):
+        self.name = path
+        self._proc = subprocess.Popen( [ program, "-dc", path ], stdout = subprocess.PIPE, bufsize = 2 ** 20 )
+        self._stream = self._proc.stdout
+
+    def __iter__( self ):
+        return iter( self._stream )
+
+    def next( self ):
+        return self._stream.next( )
+
+    def readline( self, *args ):
+        return self._stream.readline( *args )
+
+    def read( self, *args ):
+        return self._stream.read( *args )
+
+    def close( self ):
+        """close the pipe and reap the decompression process (which is killed if it has not finished yet)
+
+        Raises IOError if the process failed on its own, e.g. on a truncated or corrupt file,
+        since the stream then ended early.
+"""
+
+        killed = self._proc.poll( ) is None
+        if killed:
+            self._proc.kill( )
+        self._stream.close( )
+        self._proc.wait( )
+        if killed and self._proc.returncode == -signal.SIGKILL:
+            return  # the parser stopped reading early
+        if self._proc.returncode != 0:  # also if the process was exiting on its own when it was killed
+            raise IOError( errno.EIO, "Decompression failed with exit status {:d}, the input is incomplete" . format( self._proc.returncode ), self.name )
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *args ):
+        self.close( )
+
+
+def strip_compression( path ):
+    """return path without a compression suffix, e.g. for matching file names"""
+
+    for suffix in Compressions:
+        if path.endswith( suffix ):
+            return path[ :-len( suffix ) ]
+    return path
+
+
+def find_inputs( pattern ):
+    """return the files matching the glob pattern, or the pattern followed by a compression suffix
+    - of files that differ only by a compression suffix, only one is returned (the uncompressed one, if present), so that no source is read twice
+"""
+
+    result = [ ]
+    bases = set( )
+    for p in [ pattern ] + [  pattern + suffix for suffix in sorted( Compressions )  ]:
+        for f in sorted( glob( p ), key = lambda f: ( strip_compression( f ), f != strip_compression( f ), f ) ):
+            if strip_compression( f ) not in bases:
+                bases.add( strip_compression( f ) )
+                result.append( f )
+    return result
+
+
+def open_input( path ):
+    """open a database file for reading; .gz, .bz2, and .xz files are decompressed on the fly
+
+    Decompression runs in a separate process where the program is available, so it
+    overlaps with parsing; otherwise the corresponding Python module is used.
+    - path: the file to open
+"""
+
+    try:
+        program, module = Compressions[ os.path.splitext( path )[ 1 ] ]
+    except KeyError:
+        return open( path, "r" )
+
+    if not os.path.isfile( path ):  # the decompression process would only fail silently
+        raise IOError( errno.ENOENT, os.strerror( errno.ENOENT ), path )
+    try:
+        return _PipedInput( path, program )
+    except OSError:  # program not installed
+        pass
+    if module == "gzip":
+        import gzip
+        return gzip.open( path, "rb" )
+    elif module == "bz2":
+        import bz2
+        return bz2.BZ2File( path, "r" )
+    try:
+        import lzma
+    except ImportError:
+        try:
+            from backports import lzma
+        except ImportError:
+            raise IOError( errno.EPROTONOSUPPORT, "Neither the xz program nor an lzma module is available", path )
+    return lzma.open( path, "rb" )
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+
+import sys
+import threading
+from collections import OrderedDict
+from miRNexpander.mWBBase import mWBBaseClass
+
+
+def _sizeof( obj ):
+    """estimate the memory footprint of obj, including the elements of (nested) tuples, lists, sets, and dicts"""
+
+    size = sys.getsizeof( obj )
+    if type( obj ) in ( tuple, list, set, frozenset ):
+        size += sum( [ _sizeof( e ) for e in obj ] )
+    elif type( obj ) == dict:
+        size += sum( [ _sizeof( k ) + _sizeof( v ) for k, v in obj.iteritems( ) ] )
+    return size
+
+
+class LRUCache( mWBBaseClass ):
+    """keep key-value pairs up to a memory budget, evicting the least recently used entries first"""
+
+    def __init__( self, max_bytes ):
+        """initialize values"""
+
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict( )  # key -> ( value, size ), least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock( )  # handlers cloned for concurrent requests share the cache
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def __len__( self ):
+        return len( self._entries )
+
+
+    def __contains__( self, key ):
+        return key in self._entries
+
+
+    def get( self, key, default = None ):
+        """return the value stored for key (and mark it as recently used), or default"""
+
+        with self._lock:
+            try:
+                entry = self._entries.pop( key )
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries[ key ] = entry  # re-insert as most recently used
+            self.hits += 1
+            return entry[ 0 ]
+
+
+    def put( self, key, value ):
+        """store value for key, then evict old entries until the memory budget is met again"""
+
+        size = _sizeof( key ) + _sizeof( value )
+        if size > self._max_bytes:  # would evict everything else and still not fit
+            return
+        with self._lock:
+            try:
+                self._bytes -= self._entries.pop( key )[ 1 ]
+            except KeyError:
+                pass
+            self._entries[ key ] = ( value, size )
+            self._bytes += size
+
+            while self._bytes > self._max_bytes:
+                self._bytes -= self._entries.popitem( last = False )[ 1 ][ 1 ]
+                self.evictions += 1
+
+
+    def clear( self ):
+        """drop all entries (counters are kept)"""
+
+        with self._lock:
+            self._entries.clear( )
+            self._bytes = 0
+
+
+    def stats( self ):
+        """return a dictionary describing usage and effectiveness of the cache"""
+
+        return dict( entries = len( self._entries ), bytes = self._bytes, max_bytes = self._max_bytes,
+                     hits = self.hits, misses = self.misses, evictions = self.evictions )
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+
+import os
+import json
+import time
+import numpy
+from miRNexpander.mWBBase import mWBBaseClass
+
+# arrays that make up a neighbourhood index (stored together, compressed, in 'index.npz')
+_arrays = (
+        "nodes",  # sorted a_ids of all actors and interaction partners; a node's position is its index in the following arrays
+        "symbol", "description", "species",  # actor annotation per node (string indices, -1 if not annotated; species -1 for NULL)
+        "e_source", "e_target", "e_source_orig", "e_target_orig", "e_pmids",  # interactions (node positions and string indices), grouped by table
+        "out_ptr", "out_edges", "in_ptr", "in_edges",  # 1-hop: interactions of node i in table t are *_edges[ *_ptr[ t * N + i ] : *_ptr[ t * N + i + 1 ] ]
+        "hop2_ptr", "hop2_nodes", "hop2_stored",  # 2-hop: neighbours of node i within two interactions of type k are hop2_nodes[ hop2_ptr[ k * N + i ] : hop2_ptr[ k * N + i + 1 ] ], if hop2_stored[ k * N + i ]
+        "str_blob", "str_offsets",  # string table: string i is str_blob[ str_offsets[ i ] : str_offsets[ i + 1 ] ]
+)
+_version = 1
+
+
+def _ranges( lo, hi ):
+    """return the concatenation of the ranges [ lo[ i ], hi[ i ] )"""
+
+    lengths = hi - lo
+    total = lengths.sum( )
+    if not total:
+        return numpy.zeros( 0, dtype = numpy.int64 )
+    return numpy.arange( total ) + numpy.repeat( lo - ( numpy.cumsum( lengths ) - lengths ), lengths )
+
+
+def _csr( keys, size ):
+    """return ( ptr, order ) of a compressed sparse row layout: the items with key j are order[ ptr[ j ] : ptr[ j + 1 ] ]"""
+
+    order = numpy.argsort( keys, kind = "mergesort" ).astype( numpy.int64 )
+    ptr = numpy.concatenate( ( [ 0 ], numpy.cumsum( numpy.bincount( keys, minlength = size ) ) ) ).astype( numpy.int64 )
+    return ptr, order
+
+
+class NeighbourhoodIndex( mWBBaseClass ):
+    """read-only, compressed copy of the queryable interaction tables, arranged by neighbourhood, for network building without interaction queries
+
+    For every actor, the index holds its interactions per table (the 1-hop neighbourhood, with
+    everything 'expand_shell' returns) and, per interaction type (see interdefs, plus "all"
+    for the tables of any type), the set of actors within two interactions. 2-hop sets larger
+    than the configured limit are not stored, but computed from the 1-hop neighbourhoods.
+    The index is written by update_db after the interaction tables or Actors changed, and is
+    stamped with the update manifest of these tables, so that an outdated index is not used
+    (see DatabaseHandler.writeNeighbourhoodIndex).
+"""
+
+    def __init__( self, path ):
+        """load the neighbourhood index stored in directory path"""
+
+        self.path = path
+        try:
+            stream = open( os.path.join( path, "meta.json" ) )
+        except IOError:
+            raise IOError( "No neighbourhood index found in {!r}." . format( path ) )
+        self.meta = json.load( stream )
+        stream.close( )
+        if self.meta[ "version" ] != _version:
+            raise IOError( "Neighbourhood index in {!r} has version {}, expected {}." . format( path, self.meta[ "version" ], _version ) )
+
+        # compressed archives cannot be memory-mapped, so the arrays are read once: those of the 2-hop sets only when first needed
+        self._load( [  name for name in _arrays if not name.startswith( "hop2_" )  ] )
+        self._blob = buffer( self.str_blob )
+        self.tables = dict( [  ( str( db ), code ) for code, db in enumerate( self.meta[ "tables" ] )  ] )  # database -> table code
+        self.types = dict( [  ( str( k ), ( code, v ) ) for code, ( k, v ) in enumerate( self.meta[ "types" ] )  ] )  # interaction type -> ( type code, table codes )
+
+
+    def _load( self, names ):
+        """read the given arrays from the archive"""
+
+        archive = numpy.load( os.path.join( self.path, "index.npz" ) )
+        try:
+            for name in names:
+                setattr( self, name, archive[ name ] )
+        finally:
+            archive.close( )
+
+
+    ############################################################
+    #### export                                             ####
+    ############################################################
+
+    @staticmethod
+    def export( db_handler, path, tables, digest = None, two_hop_max = 10000 ):
+        """write a neighbourhood index of the given interaction tables and Actors to directory path
+    - db_handler: connected DatabaseHandler
+    - path: target directory (created if missing, an existing index is replaced)
+    - tables: databases (interaction table keys) to index
+    - digest: update manifest digest of the indexed tables and Actors, stored to recognize an outdated index
+    - two_hop_max: largest 2-hop set that is stored
+    - returns the number of interactions written
+"""
+
+        start = time.time( )
+        strings = { }  # string -> index in the string table
+
+        ### internal subroutine ###
+        def intern( value ):
+            """return the index of value in the string table (-1 for NULL)"""
+
+            if value == None:
+                return -1
+            value = value.encode( "utf-8" ) if type( value ) == unicode else str( value )
+            try:
+                return strings[ value ]
+            except KeyError:
+                strings[ value ] = len( strings )
+                return strings[ value ]
+
+        # interactions, grouped by table
+        source, target, source_orig, target_orig, pmids, e_table = [ ], [ ], [ ], [ ], [ ], [ ]
+        for code, db in enumerate( tables ):
+            count = len( source )
+            for r in db_handler._select_iter( "SELECT DISTINCT `source`, `target`, `source_orig`, `target_orig`, `PMIDs` FROM `{}`" . format( db ) ):
+                source.append( r[ 0 ] )
+                target.append( r[ 1 ] )
+                source_orig.append( intern( r[ 2 ] ) )
+                target_orig.append( intern( r[ 3 ] ) )
+                pmids.append( intern( r[ 4 ] ) )
+            e_table.extend( [ code ] * ( len( source ) - count ) )
+
+        # nodes and their annotation
+        actors = db_handler._select( "SELECT `a_id`, `symbol`, `description`, `species` FROM `Actors`" )
+        nodes = numpy.unique( numpy.array( [  r[ 0 ] for r in actors  ] + source + target, dtype = numpy.int64 ) )
+        n = len( nodes )
+        arrays = dict(
+                nodes = nodes,
+                symbol = numpy.full( n, -1, dtype = numpy.int32 ),
+                description = numpy.full( n, -1, dtype = numpy.int32 ),
+                species = numpy.full( n, -1, dtype = numpy.int64 ),
+                )
+        if actors:
+            pos = numpy.searchsorted( nodes, [  r[ 0 ] for r in actors  ] )
+            arrays[ "symbol" ][ pos ] = [  intern( r[ 1 ] ) for r in actors  ]
+            arrays[ "description" ][ pos ] = [  intern( r[ 2 ] ) for r in actors  ]
+            arrays[ "species" ][ pos ] = [  -1 if r[ 3 ] == None else r[ 3 ] for r in actors  ]
+        del actors
+
+        # 1-hop: interactions per ( table, node ), in both directions
+        e_source = numpy.searchsorted( nodes, numpy.array( source, dtype = numpy.int64 ) ).astype( numpy.int32 )
+        e_target = numpy.searchsorted( nodes, numpy.array( target, dtype = numpy.int64 ) ).astype( numpy.int32 )
+        e_table = numpy.array( e_table, dtype = numpy.int64 )
+        del source, target
+        arrays.update(
+                e_source = e_source,
+                e_target = e_target,
+                e_source_orig = numpy.array( source_orig, dtype = numpy.int32 ),
+                e_target_orig = numpy.array( target_orig, dtype = numpy.int32 ),
+                e_pmids = numpy.array( pmids, dtype = numpy.int32 ),
+                )
+        for direction, ends in ( "out", e_source ), ( "in", e_target ):
+            arrays[ direction + "_ptr" ], arrays[ direction + "_edges" ] = _csr( e_table * n + ends, len( tables ) * n )
+
+        # 2-hop: neighbours within two interactions per interaction type
+        int_defs = db_handler.getConfItem( "interdefs" )
+        types = [ ]
+        for name in sorted( int_defs ):
+            codes = [  code for code, db in enumerate( tables )
+                    if db_handler.getTableConf( db )[ "src" ] in int_defs[ name ][ "src" ] and db_handler.getTableConf( db )[ "tgt" ] in int_defs[ name ][ "tgt" ]  ]
+            if codes:
+                types.append( ( name, codes ) )
+        types.insert( 0, ( "all", sorted( set( [  c for name, codes in types for c in codes  ] ) ) ) )  # tables of no interaction type are never queried
+        hop2_ptr = [ numpy.zeros( 1, dtype = numpy.int64 ) ]
+        hop2_nodes = [ ]
+        hop2_stored = [ ]
+        stored = 0
+        for name, codes in types:
+            selected = numpy.in1d( e_table, codes )
+            a, b = e_source[ selected ].astype( numpy.int64 ), e_target[ selected ].astype( numpy.int64 )
+            pairs = numpy.unique( numpy.concatenate( ( a * n + b, b * n + a ) ) )  # undirected, without duplicates
+            pairs = pairs[ pairs // n != pairs % n ]  # without self-interactions
+            adj_ptr = numpy.concatenate( ( [ 0 ], numpy.cumsum( numpy.bincount( pairs // n, minlength = n ) ) ) )
+            adj = ( pairs % n ).astype( numpy.int32 )
+            lengths = numpy.zeros( n, dtype = numpy.int64 )
+            keep = numpy.ones( n, dtype = bool )
+            for i in numpy.flatnonzero( adj_ptr[ 1: ] - adj_ptr[ :-1 ] ):
+                first = adj[ adj_ptr[ i ] : adj_ptr[ i + 1 ] ]
+                two = numpy.unique( numpy.concatenate( ( first, adj[ _ranges( adj_ptr[ first ], adj_ptr[ first + 1 ] ) ] ) ) )
+                two = two[ two != i ]
+                if len( two ) > two_hop_max:
+                    keep[ i ] = False
+                    continue
+                hop2_nodes.append( two.astype( numpy.int32 ) )
+                lengths[ i ] = len( two )
+            hop2_ptr.append( stored + numpy.cumsum( lengths ) )
+            hop2_stored.append( keep )
+            stored += lengths.sum( )
+        arrays.update(
+                hop2_ptr = numpy.concatenate( hop2_ptr ).astype( numpy.int64 ),
+                hop2_nodes = numpy.concatenate( hop2_nodes ) if hop2_nodes else numpy.zeros( 0, dtype = numpy.int32 ),
+                hop2_stored = numpy.concatenate( hop2_stored ),
+                )
+
+        ordered = sorted( strings, key = strings.get )
+        strings.clear( )
+        arrays[ "str_offsets" ] = numpy.concatenate( ( [ 0 ], numpy.cumsum( [  len( s ) for s in ordered  ] ) ) ).astype( numpy.int64 )
+        arrays[ "str_blob" ] = numpy.array( bytearray( "" . join( ordered ) ), dtype = numpy.uint8 )
+
+        if not os.path.isdir( path ):
+            os.makedirs( path )
+        numpy.savez_compressed( os.path.join( path, "index.npz" ), **dict( [  ( name, arrays[ name ] ) for name in _arrays  ] ) )
+        stream = open( os.path.join( path, "meta.json" ), "w" )
+        json.dump( dict( version = _version, created = time.strftime( "%Y-%m-%d %H:%M:%S" ), digest = digest, tables = list( tables ),
+                         types = [  ( name, list( codes ) ) for name, codes in types  ], two_hop_max = two_hop_max ), stream, indent = 1 )
+        stream.close( )
+
+        db_handler._spill( "Neighbourhood index: {:d} nodes, {:d} interactions from {:d} table(s), {:d} 2-hop neighbours written to {!r} in {:.1f} s." . format(
+                n, len( e_source ), len( tables ), stored, path, time.time( ) - start ) )
+        return len( e_source )
+
+
+    ############################################################
+    #### lookups                                            ####
+    ############################################################
+
+    def _strings( self, indices ):
+        """return the strings with the given indices of the string table as unicode, like the database (None for -1)"""
+
+        blob = self._blob
+        return [  unicode( blob[ s : e ], "utf-8" ) if i >= 0 else None for i, s, e in zip( indices.tolist( ), self.str_offsets[ indices ].tolist( ), self.str_offsets[ indices + 1 ].tolist( ) )  ]
+
+
+    def positions( self, a_ids ):
+        """return the node positions of the given a_ids (unknown ids are dropped)"""
+
+        a_ids = numpy.unique( numpy.array( list( a_ids ), dtype = numpy.int64 ) )
+        pos = numpy.searchsorted( self.nodes, a_ids )
+        found = pos < len( self.nodes )
+        found[ found ] = self.nodes[ pos[ found ] ] == a_ids[ found ]
+        return pos[ found ]
+
+
+    def _edges( self, positions, code, direction ):
+        """return the interactions of table code that leave ("out") or enter ("in") the nodes at positions"""
+
+        ptr = getattr( self, direction + "_ptr" )
+        keys = positions + code * len( self.nodes )
+        return getattr( self, direction + "_edges" )[ _ranges( ptr[ keys ], ptr[ keys + 1 ] ) ]
+
+
+    def expand_shell( self, candidates, tables ):
+        """return the interactions and partner annotations of the candidates in the format of DatabaseHandler.expand_shell
+    - tables: ( database, table configuration, candidate column numbers ) triples as returned by DatabaseHandler._eligible_tables, all of them indexed
+"""
+
+        positions = self.positions( candidates )
+        rows = [ ]
+        seen = set( )  # an interaction may be selected by more than one triple, the database path returns it once (distinct)
+        ends = [ ]
+        for db, t, pos in tables:
+            code = self.tables[ db ]
+            selected = numpy.unique( numpy.concatenate( [  self._edges( positions, code, d ) for p, d in ( "001", "out" ), ( "002", "in" ) if p in pos  ] ) )
+            s, g = self.e_source[ selected ], self.e_target[ selected ]
+            ends.extend( ( s, g ) )
+            for k1, k2, a1, a2, pmids in zip( self.nodes[ s ].tolist( ), self.nodes[ g ].tolist( ), self._strings( self.e_source_orig[ selected ] ),
+                                              self._strings( self.e_target_orig[ selected ] ), self._strings( self.e_pmids[ selected ] ) ):
+                row = ( k1, k2, t[ "src" ], t[ "tgt" ], a1, a2, db, pmids )
+                if row in seen:
+                    continue
+                seen.add( row )
+                rows.append( ( k1, k2, t[ "src" ], t[ "tgt" ], dict( source_alias = a1, target_alias = a2, database = db, release = t[ "release" ], reldate = t[ "reldate" ], PMIDs = pmids ) ) )
+
+        annot = { }
+        if ends:
+            ends = numpy.unique( numpy.concatenate( ends ) )
+            ends = ends[ self.symbol[ ends ] >= 0 ]  # no annotation: not in Actors
+            for a_id, symbol, description, species in zip( self.nodes[ ends ].tolist( ), self._strings( self.symbol[ ends ] ),
+                                                           self._strings( self.description[ ends ] ), self.species[ ends ].tolist( ) ):
+                annot[ a_id ] = dict( symbol = symbol, description = description, species = None if species < 0 else species )
+
+        return tuple( rows ), annot
+
+
+    def neighbours( self, a_ids, hops = 1, kind = "all" ):
+        """return { a_id : set of a_ids within hops (1 or 2) interactions of type kind } for the given a_ids (those not in the index are left out)"""
+
+        code, tables = self.types[ kind ]
+        n = len( self.nodes )
+
+        ### internal subroutine ###
+        def one_hop( p ):
+            """return the positions of the interaction partners of the node at position p"""
+
+            found = [  self.e_target[ self._edges( numpy.array( [ p ] ), t, "out" ) ] for t in tables  ]
+            found += [  self.e_source[ self._edges( numpy.array( [ p ] ), t, "in" ) ] for t in tables  ]
+            found = numpy.unique( numpy.concatenate( found ) )
+            return found[ found != p ]
+
+        if hops > 1 and not hasattr( self, "hop2_ptr" ):
+            self._load( [  name for name in _arrays if name.startswith( "hop2_" )  ] )
+        result = { }
+        for p in self.positions( a_ids ).tolist( ):
+            first = one_hop( p )
+            if hops < 2:
+                found = first
+            elif self.hop2_stored[ code * n + p ]:
+                found = self.hop2_nodes[ self.hop2_ptr[ code * n + p ] : self.hop2_ptr[ code * n + p + 1 ] ]
+            else:  # too large to be stored
+                found = numpy.unique( numpy.concatenate( [ first ] + [  one_hop( q ) for q in first.tolist( )  ] ) )
+                found = found[ found != p ]
+            result[ int( self.nodes[ p ] ) ] = set( self.nodes[ found ].tolist( ) )
+        return result
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+
+from string import Formatter
+
+
+# statements of the query_for_* methods of DatabaseHandler
+# The {name} slots are filled when a template is compiled:
+# - names that are passed as parameters become placeholders (%s for MySQL, ? for SQLite; lists and sets become one placeholder per element),
+#   the values are bound by the driver when the statement is executed
+# - all other names are identifiers (tables, columns), taken from the static arguments or the SQL mapping of the configuration
+TEMPLATES = {
+        "references" : """SELECT
+	`ref`, {alias_select}
+FROM
+	`Actor_aliases`
+WHERE
+	{alias_match} IN ( {aliases} )""",
+
+        "references_typed" : """SELECT
+	`ref`, {alias_select}
+FROM
+	`Actor_aliases`
+WHERE
+	`type` IN ( SELECT `x_id` FROM `Actor_xrefs` WHERE `namespace` IN ( {alias_types} ) )
+	AND {alias_match} IN ( {aliases} )""",
+
+        "references_species" : """SELECT
+	`a`.`ref`, {alias_select}
+FROM
+	`Actor_aliases` AS `a`
+	JOIN `Actors` AS `g` ON `a`.`ref` = `g`.`a_id`
+WHERE
+	{alias_match} IN ( {aliases} )
+	AND `g`.`species` IN ( {species} )""",
+
+        "references_typed_species" : """SELECT
+	`a`.`ref`, {alias_select}
+FROM
+	`Actor_aliases` AS `a`
+	JOIN `Actors` AS `g` ON `a`.`ref` = `g`.`a_id`
+WHERE
+	`a`.`type` IN ( SELECT `x_id` FROM `Actor_xrefs` WHERE `namespace` IN ( {alias_types} ) )
+	AND {alias_match} IN ( {aliases} )
+	AND `g`.`species` IN ( {species} )""",
+
+        "xref_ids" : """SELECT
+	`x_id`, `namespace`
+FROM
+	`Actor_xrefs`
+WHERE
+	`namespace` IN ( {namespaces} )""",
+
+        "xrefs" : """SELECT
+	`x_id`, `namespace`
+FROM
+	`Actor_xrefs`""",
+
+        "aliases" : """SELECT
+	`ref`, `type`, `Alias`
+FROM
+	`Actor_aliases`
+WHERE
+	`ref` IN ( {refs} )""",
+
+        "aliases_typed" : """SELECT
+	`ref`, `type`, `Alias`
+FROM
+	`Actor_aliases`
+WHERE
+	`ref` IN ( {refs} )
+	AND `type` IN ( {types} )""",
+
+        "annotations" : """SELECT
+	`a_id`, 'symbol', `symbol`, 'description', `description`, 'species', `species`
+FROM
+	`Actors`
+WHERE
+	`a_id` IN ( {ids} )""",
+
+        "interactions" : """SELECT DISTINCT
+	`source`, `target`, {src}, {tgt},
+	'source_alias', `source_orig`, 'target_alias', `target_orig`,
+	'database', {database}, 'release', {release}, 'reldate', {reldate}, 'PMIDs', `PMIDs`
+FROM
+	`{table}`
+WHERE
+	`{column}` IN ( {ids} )""",
+
+        "interactions_two_way" : """SELECT DISTINCT
+	`source`, `target`, {src}, {tgt},
+	'source_alias', `source_orig`, 'target_alias', `target_orig`,
+	'database', {database}, 'release', {release}, 'reldate', {reldate}, 'PMIDs', `PMIDs`
+FROM
+	`{table}`
+WHERE
+	`{column}` IN ( {ids} )
+	OR `{column2}` IN ( {ids} )""",
+
+        "shell" : """SELECT DISTINCT
+	i.`source`, i.`target`, {src}, {tgt},
+	i.`source_orig`, i.`target_orig`, {database}, {release}, {reldate}, i.`PMIDs`,
+	sa.`symbol`, sa.`description`, sa.`species`, ta.`symbol`, ta.`description`, ta.`species`
+FROM
+	`{table}` AS i
+	LEFT JOIN `Actors` AS sa ON sa.`a_id` = i.`source`
+	LEFT JOIN `Actors` AS ta ON ta.`a_id` = i.`target`
+WHERE
+	i.`{column}` IN ( {ids} )""",
+
+        "shell_two_way" : """SELECT DISTINCT
+	i.`source`, i.`target`, {src}, {tgt},
+	i.`source_orig`, i.`target_orig`, {database}, {release}, {reldate}, i.`PMIDs`,
+	sa.`symbol`, sa.`description`, sa.`species`, ta.`symbol`, ta.`description`, ta.`species`
+FROM
+	`{table}` AS i
+	LEFT JOIN `Actors` AS sa ON sa.`a_id` = i.`source`
+	LEFT JOIN `Actors` AS ta ON ta.`a_id` = i.`target`
+WHERE
+	i.`{column}` IN ( {ids} )
+	OR i.`{column2}` IN ( {ids} )""",
+        }
+
+
+class SQLTemplates( object ):
+    """compile statement templates once and bind parameters to them
+
+    Compiled statements are kept per template, identifiers, and parameter shape. List
+    parameters are padded (by repeating their last element) to the next power of two, so
+    that IN ( ... ) lists of varying length share a handful of compiled statements.
+"""
+
+    def __init__( self, mapping, placeholder = "%s", templates = TEMPLATES ):
+        """initialize values
+    - mapping: the SQL mapping of the configuration (see DatabaseConnector.getSQLMapping)
+    - placeholder: parameter marker of the database driver
+    - templates: dictionary of named templates
+"""
+
+        self._mapping = mapping
+        self._placeholder = placeholder
+        self._templates = templates
+        self._compiled = { }  # ( name, identifiers, parameter shapes ) -> ( statement, parameter names in placeholder order )
+
+
+    def bind( self, name, params, **static ):
+        """return the compiled statement and its argument list, ready for cursor.execute
+    - name: template name
+    - params: dictionary of values for the placeholders; lists, tuples, and sets fill IN ( ... ) lists
+    - static: identifiers for the remaining slots (e.g. table = ..., column = ...)
+"""
+
+        shapes = tuple( sorted( [  ( k, self._shape( v ) ) for k, v in params.iteritems( )  ] ) )
+        key = ( name, tuple( sorted( static.items( ) ) ), shapes )
+        try:
+            statement, slots = self._compiled[ key ]
+        except KeyError:
+            statement, slots = self._compiled[ key ] = self._compile( name, static, dict( shapes ) )
+
+        args = [ ]
+        for s in slots:
+            v = params[ s ]
+            if isinstance( v, ( list, tuple, set, frozenset ) ):
+                v = list( v ) or [ None ]  # IN ( NULL ) matches nothing
+                args.extend( v + v[ -1: ] * ( self._shape( v ) - len( v ) ) )
+            else:
+                args.append( v )
+
+        return statement, args
+
+
+    def compiled( self ):
+        """return the number of compiled statements"""
+        return len( self._compiled )
+
+
+    def _shape( self, value ):
+        """return the number of placeholders for a list parameter (None for single values)"""
+
+        if not isinstance( value, ( list, tuple, set, frozenset ) ):
+            return None
+        n = 1
+        while n < len( value ):
+            n *= 2
+        return n
+
+
+    def _compile( self, name, static, shapes ):
+        """turn a template into a statement with placeholders"""
+
+        parts = [ ]
+        slots = [ ]
+        for literal, field, spec, conversion in Formatter( ).parse( self._templates[ name ] ):
+            if self._placeholder == "%s":
+                literal = literal.replace( "%", "%%" )  # the driver interpolates with the % operator
+            parts.append( literal )
+            if field == None:
+                continue
+            if field in shapes:
+                parts.append( self._placeholder if shapes[ field ] == None else ", " . join( [ self._placeholder ] * shapes[ field ] ) )
+                slots.append( field )
+            elif field in static:
+                parts.append( static[ field ] )
+            elif field in self._mapping:
+                parts.append( self._mapping[ field ] )
+            else:
+                raise KeyError( "No parameter or identifier for slot {!r} of SQL template {!r}." . format( field, name ) )
+
+        return "" . join( parts ), tuple( slots )
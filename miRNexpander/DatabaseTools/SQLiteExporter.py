@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+
+import time
+from miRNexpander.mWBBase import mWBBaseClass
+from miRNexpander.DatabaseTools.Backends import SQLiteBackend, DatabaseError, translate_ddl
+
+
+class SQLiteExporter( mWBBaseClass ):
+    """copy the tables of a MySQL database into an SQLite database file, e.g. for use with the sqlite backend on nodes without a MySQL server
+
+    Each table is recreated from its SHOW CREATE TABLE statement (see translate_ddl), filled
+    with the rows streamed from the server, and indexed afterwards, which is faster than
+    maintaining the indexes row by row. Tables of the same name in the file are replaced,
+    others are left alone.
+"""
+
+    def __init__( self, db_handler ):
+        """initialize values
+    - db_handler: DatabaseHandler connected to MySQL
+"""
+        self._db = db_handler
+
+
+    def export( self, path, tables = None ):
+        """export the given tables (default: all) to the SQLite file at path, return the number of failed tables"""
+
+        db = self._db
+        if db._backend.name != "mysql":
+            self._alert( "Exporting to SQLite requires a connection to MySQL (backend: mysql)." )
+            return 1
+
+        tables = tables or db._backend.tables( db._execute )
+        target = SQLiteBackend( path )
+        conn = target.checkout( )
+        failed = 0
+        try:
+            for table in tables:
+                start = time.time( )
+                try:
+                    count = self._copy( conn, table )
+                except DatabaseError as e:
+                    conn.rollback( )
+                    self._alert( "Exporting table {} failed.\nDescription: {}\n" . format( table, e ) )
+                    failed += 1
+                    continue
+                self._spill( "\t-> {}: {:d} rows in {:.1f} s." . format( table, count, time.time( ) - start ) )
+            conn.execute( "ANALYZE" )  # statistics for the query planner
+            conn.commit( )
+        finally:
+            target.checkin( conn )
+
+        self._spill( "Exported {:d} of {:d} tables to {}." . format( len( tables ) - failed, len( tables ), path ) )
+        return failed
+
+
+    def _copy( self, conn, table ):
+        """recreate one table in the SQLite connection and copy its rows, return the number of rows"""
+
+        db = self._db
+        create = db._execute( "SHOW CREATE TABLE `{}`" . format( table ) ).fetchone( )[ 1 ]
+        statements = translate_ddl( "DROP TABLE IF EXISTS `{}`;\n{};" . format( table, create ) )
+        indexes = [  s for s in statements if s.startswith( ( "CREATE INDEX", "CREATE UNIQUE INDEX" ) )  ]
+        for s in statements:
+            if s not in indexes:
+                conn.execute( s )
+
+        # generated columns are computed by SQLite (or left out, if it is too old to support them)
+        columns = [  c for c, generated in db._backend.columns( db._execute, table ) if not generated  ]
+        query = "INSERT INTO `{}` ( {} ) VALUES ( {} )" . format( table, ", " . join( [  "`{}`" . format( c ) for c in columns  ] ), ", " . join( [ "?" ] * len( columns ) ) )
+        count = 0
+        batch = [ ]
+        for row in db._execute_iter( "SELECT {} FROM `{}`" . format( ", " . join( [  "`{}`" . format( c ) for c in columns  ] ), table ) ):
+            batch.append( row )
+            if len( batch ) >= db._fetch_batch:
+                conn.executemany( query, batch )
+                count += len( batch )
+                batch = [ ]
+        if batch:
+            conn.executemany( query, batch )
+            count += len( batch )
+
+        for s in indexes:
+            conn.execute( s )
+        conn.commit( )
+
+        return count
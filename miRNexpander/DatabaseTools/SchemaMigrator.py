@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+
+from miRNexpander.mWBBase import mWBBaseClass
+from miRNexpander.DatabaseTools.Backends import DatabaseError
+
+
+class SchemaMigrator( mWBBaseClass ):
+    """add the columns and composite indexes that the query paths rely on to an existing database, and check their use with EXPLAIN
+
+    The migrations only add to the schema (see database_schema.sql for a fresh setup), so they
+    can be applied to a filled database and repeated safely (generated columns need MySQL 5.7,
+    MariaDB 10.2, or SQLite 3.31; the statements are written for MySQL and translated by the
+    SQLite backend):
+    - Actor_aliases gets Alias_lc, the lower-cased alias as a stored generated column with a
+      binary collation; query_for_references matches on it and takes its values instead of
+      lower-casing every row
+    - Actor_aliases gets the covering indexes ( Alias_lc, type, ref, Alias ) for alias
+      resolution and ( ref, type, Alias ) for query_for_aliases
+    - each interaction table gets ( source, target, source_orig, target_orig ) and
+      ( target, source, source_orig, target_orig ), which cover everything the interaction
+      queries read except PMIDs (TEXT columns cannot be part of an index)
+"""
+
+    def __init__( self, db_handler ):
+        """initialize values
+    - db_handler: connected DatabaseHandler
+"""
+        self._db = db_handler
+
+
+    def _interaction_tables( self ):
+        """return ( table, source column, target column ) for all configured interaction tables"""
+
+        mapping = self._db.getSQLMapping( )
+        tables = [ ]
+        for t in self._db.getTablesConf( ).values( ):
+            if "src" in t and "tgt" in t and "affix" in t:
+                tables.append( ( t[ "name" ], mapping.get( t[ "affix" ] + "_i001", "source" ), mapping.get( t[ "affix" ] + "_i002", "target" ) ) )
+        return sorted( tables )
+
+
+    def _existing( self ):
+        """return the existing tables (lower-cased) and, per table, its column and index names"""
+
+        backend = self._db._backend
+        tables = set( )
+        columns = { }
+        indexes = { }
+        try:
+            for name in backend.tables( self._db._execute ):
+                t = name.lower( )
+                tables.add( t )
+                columns[ t ] = set( [  c[ 0 ] for c in backend.columns( self._db._execute, name )  ] )
+                indexes[ t ] = backend.indexes( self._db._execute, name )
+        except DatabaseError as e:
+            self._alert( "Reading the database schema failed.\nDescription: {}\n" . format( e ) )
+        return tables, columns, indexes
+
+
+    def plan( self ):
+        """return the pending migrations as ( table, description, statement ) triples"""
+
+        tables, columns, indexes = self._existing( )
+        index_name = self._db._backend.index_name
+        pending = [ ]
+
+        t = "actor_aliases"
+        if t in tables:
+            if "Alias_lc" not in columns[ t ]:
+                pending.append( ( "Actor_aliases", "add lower-cased alias column Alias_lc",
+                        "ALTER TABLE `Actor_aliases` ADD COLUMN `Alias_lc` VARCHAR(200) CHARACTER SET utf8 COLLATE utf8_bin AS ( LOWER( `Alias` ) ) STORED" ) )
+            if index_name( "Actor_aliases", "alias_lookup" ) not in indexes[ t ]:
+                pending.append( ( "Actor_aliases", "add covering index alias_lookup ( Alias_lc, type, ref, Alias )",
+                        "ALTER TABLE `Actor_aliases` ADD INDEX `alias_lookup` ( `Alias_lc`, `type`, `ref`, `Alias` )" ) )
+            if index_name( "Actor_aliases", "alias_refs" ) not in indexes[ t ]:
+                pending.append( ( "Actor_aliases", "add covering index alias_refs ( ref, type, Alias )",
+                        "ALTER TABLE `Actor_aliases` ADD INDEX `alias_refs` ( `ref`, `type`, `Alias` )" ) )
+
+        for name, source, target in self._interaction_tables( ):
+            t = name.lower( )
+            if t not in tables:
+                continue
+            for key, first, second in ( name + "_source_cover", source, target ), ( name + "_target_cover", target, source ):
+                if index_name( name, key ) not in indexes[ t ]:
+                    pending.append( ( name, "add covering index {} ( {}, {}, source_orig, target_orig )" . format( key, first, second ),
+                            "ALTER TABLE `{}` ADD INDEX `{}` ( `{}`, `{}`, `source_orig`, `target_orig` )" . format( name, key, first, second ) ) )
+
+        return pending
+
+
+    def migrate( self, dry_run = False ):
+        """apply all pending migrations (or only list them if dry_run is set), return the number of failed ones"""
+
+        pending = self.plan( )
+        if not pending:
+            self._spill( "The database schema is up to date." )
+            return 0
+
+        failed = 0
+        for table, description, statement in pending:
+            if dry_run:
+                self._spill( "{}: {}\n\t{};" . format( table, description, statement ) )
+                continue
+            self._spill( "{}: {}..." . format( table, description ) )
+            try:
+                for s in self._db._backend.ddl( statement ):
+                    self._db._execute( s )
+            except DatabaseError as e:
+                self._alert( "Migration failed.\nDescription: {}\nAffected SQL Query:\n{}\n" . format( e, statement ) )
+                failed += 1
+        self._db._alias_lc = None  # have the handler look for Alias_lc again
+
+        return failed
+
+
+    def explain( self ):
+        """run EXPLAIN on the statements of the hot query paths and report the indexes they use
+    - returns a list of ( query, table, used index, expected index, ok ) tuples
+"""
+
+        db = self._db
+        templates = db._templates
+        checks = [ ]  # ( query name, statement, args, { table (alias) : expected index } )
+        if db._has_alias_lc( ):
+            static = dict( alias_select = "`Alias`, `Alias_lc`", alias_match = "`Alias_lc`" )
+        else:
+            static = dict( alias_select = "`Alias`", alias_match = "`Alias`" )
+        checks.append( ( "query_for_references" , ) + templates.bind( "references", dict( aliases = [ "tp53", "mir-21" ] ), **static ) + ( { "Actor_aliases" : "alias_lookup" }, ) )
+        checks.append( ( "query_for_aliases", ) + templates.bind( "aliases", dict( refs = [ 1, 2 ] ) ) + ( { "Actor_aliases" : "alias_refs" }, ) )
+        for name, source, target in self._interaction_tables( ):
+            if name not in db._db_restriction:
+                continue
+            for column, key in ( source, name + "_source_cover" ), ( target, name + "_target_cover" ):
+                statement, args = templates.bind( "interactions", dict( ids = [ 1, 2 ], src = "", tgt = "", database = name, release = "", reldate = "" ), table = name, column = column )
+                checks.append( ( "query_for_interactions", statement, args, { name : key } ) )
+
+        report = [ ]
+        for query, statement, args, expected in checks:
+            try:
+                plan = db._backend.explain( db._execute, statement, args )
+            except DatabaseError as e:
+                self._alert( "EXPLAIN failed.\nDescription: {}\nAffected SQL Query:\n{}\n" . format( e, statement ) )
+                continue
+            for table, key, covering in plan:
+                if table not in expected:
+                    continue
+                wanted = db._backend.index_name( table, expected[ table ] )
+                ok = key == wanted
+                report.append( ( query, table, key, wanted, ok ) )
+                self._spill( "{:<24} {:<20} {:<28} {}{}" . format( query, table, key, "ok" if ok else "expected " + wanted, ", covering" if covering else "" ) )
+
+        return report
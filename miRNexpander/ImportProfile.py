@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+# this module measures how long module imports take, to keep the startup of the command-line tools in check
+
+from __future__ import print_function
+
+import sys, time
+import atexit
+import __builtin__
+
+_original_import = None
+_timings = [ ]  # ( name, seconds including nested imports, seconds for the module itself, nesting depth ) in import order
+_nested = [ ]  # accumulates the time spent in nested imports for each active import
+
+
+def _timed_import( name, *args, **kwargs ):
+    """wrapper around __import__ that records imports which loaded new modules"""
+
+    known = len( sys.modules )
+    _nested.append( 0.0 )
+    start = time.time( )
+    try:
+        return _original_import( name, *args, **kwargs )
+    finally:
+        elapsed = time.time( ) - start
+        nested = _nested.pop( )
+        if _nested:
+            _nested[ -1 ] += elapsed
+        if len( sys.modules ) > known:
+            _timings.append( ( name, elapsed, elapsed - nested, len( _nested ) ) )
+
+
+def install( report_at_exit = True ):
+    """start recording imports (optionally printing the report when the interpreter exits)"""
+
+    global _original_import
+    if _original_import != None:
+        return
+    _original_import = __builtin__.__import__
+    __builtin__.__import__ = _timed_import
+    if report_at_exit:
+        atexit.register( report )
+
+
+def report( stream = sys.stderr, limit = 25 ):
+    """print the slowest imports, with their cumulative and own time in ms"""
+
+    total = sum( [ t[ 1 ] for t in _timings if t[ 3 ] == 0 ] )
+    print( "Import profile: {:.1f} ms for {:d} imports that loaded new modules; slowest:" . format( 1000 * total, len( _timings ) ), file = stream )
+    print( "{:>10} {:>10}  {}" . format( "cum. ms", "self ms", "module" ), file = stream )
+    for name, cumulative, own, depth in sorted( _timings, key = lambda t: -t[ 1 ] )[ :limit ]:
+        print( "{:10.1f} {:10.1f}  {}{}" . format( 1000 * cumulative, 1000 * own, "  " * depth, name ), file = stream )
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+
+import time
+from multiprocessing import Pool
+from miRNexpander.mWBBase import mWBBaseClass
+from miRNexpander.DatabaseTools.DatabaseHandler import DatabaseHandler
+from miRNexpander.NetworkTools.NetworkCreator import NetworkCreator
+
+
+_builder = None  # NetworkCreator of a process pool worker, see _init_builder( )
+
+def _init_builder( conf, snapshot ):
+    """connect a process pool worker to the database (or snapshot) and set up its NetworkCreator"""
+
+    global _builder
+    db = DatabaseHandler( )
+    db.connect( conf )
+    if snapshot:
+        from miRNexpander.DatabaseTools.GraphSnapshot import SnapshotHandler
+        db = SnapshotHandler( db, snapshot )
+    _builder = NetworkCreator( db )
+
+
+def _run_builder( job ):
+    """build a network in a process pool worker"""
+    return _build_network( _builder, job )
+
+
+def _build_network( nc, job ):
+    """build and write the network described by job, return a summary dictionary"""
+
+    start = time.time( )
+    summary = dict( name = job[ "name" ], seeds = len( job[ "seeds" ] ), nodes = 0, edges = 0, seconds = 0.0, error = "" )
+    try:
+        nc.setName( job[ "name" ] )
+        # set directly on the handler, since setSpeciesRestriction would exit the (worker) process on failure
+        if type( nc._db.setAllowedSpecies( job[ "species" ] ) ) == int:
+            summary[ "error" ] = "Failed to set species restriction."
+        else:
+            ids = nc.unalias( job[ "seeds" ] )
+            if not ids:
+                summary[ "error" ] = "No database entries for specified seeds list."
+            elif nc.createNetwork( set( [  ( ref, "unknown" ) for ref in ids  ] ), job[ "depth" ], gfilter = job[ "filter" ] ) == True:
+                for f in job[ "formats" ]:
+                    getattr( nc, "write" + f )( job[ "output" ] )
+                summary.update( nodes = nc.getGraph( ).number_of_nodes( ), edges = nc.getGraph( ).number_of_edges( ) )
+            else:
+                summary[ "error" ] = "Network creation failed."
+    except Exception as e:  # one broken network must not end the whole batch
+        summary[ "error" ] = "{}: {}" . format( e.__class__.__name__, e )
+    summary[ "seconds" ] = time.time( ) - start
+    return summary
+
+
+
+class BatchBuilder( mWBBaseClass ):
+    """build many networks from a manifest, sharing one configuration and one database connection per worker process"""
+
+    formats = ( "SBML", "XGMML", "GML" )  # written through NetworkCreator's write* methods
+
+    def __init__( self, db_handler, workers = None, snapshot = None ):
+        """initialize values
+    - db_handler: connected DatabaseHandler; its configuration is handed to the workers
+    - workers: number of processes (default: the [database] workers setting); 1 builds in this process
+    - snapshot: optional graph snapshot directory to build from
+"""
+
+        self._db = db_handler
+        self._workers = workers or db_handler._workers
+        self._snapshot = snapshot
+
+
+    def readManifest( self, path ):
+        """read build jobs from a tab-separated manifest
+
+    Columns: name, seeds, depth, species, filter; seeds, species and filter files are
+    comma-separated lists, all columns after seeds are optional. Empty lines and lines
+    starting with '#' are skipped, as is a header line starting with 'name'.
+    - path: the manifest file
+    - returns a list of job dictionaries, or None if the manifest cannot be read
+"""
+
+        try:
+            stream = open( path )
+        except IOError:
+            self._extalert( "Unable to read manifest {!r}." . format( path ) )
+            return None
+
+        jobs = [ ]
+        filters = { }  # filter file -> set of gene symbols, read only once
+        linecounter = 0
+        for line in stream:
+            linecounter += 1
+            fields = [ f.strip( ) for f in line.rstrip( "\r\n" ).split( "\t" ) ]
+            if not fields[ 0 ] or fields[ 0 ].startswith( "#" ) or ( linecounter == 1 and fields[ 0 ].lower( ) == "name" ):
+                continue
+            fields += [ "" ] * ( 5 - len( fields ) )
+            name, seeds, depth, species, gfilter = fields[ :5 ]
+            seeds = [ s for s in seeds.split( "," ) if s ]
+            if not seeds:
+                self._extalert( "Skipping line {:d} in {!r}: no seeds." . format( linecounter, path ) )
+                continue
+            try:
+                depth = int( depth ) if depth else 1
+            except ValueError:
+                self._extalert( "Skipping line {:d} in {!r}: depth is not an integer." . format( linecounter, path ) )
+                continue
+            gf = None
+            for f in [ f for f in gfilter.split( "," ) if f ]:
+                if f not in filters:
+                    try:
+                        filters[ f ] = set( open( f ).read( ).splitlines( ) )
+                    except IOError:
+                        self._spill( "Unable to read file {!r}, skipping." . format( f ) )
+                        filters[ f ] = set( )
+                gf = ( gf or set( ) ) | filters[ f ]
+            jobs.append( dict( name = name, seeds = seeds, depth = depth, species = [ s for s in species.split( "," ) if s ] or None, filter = gf ) )
+        stream.close( )
+
+        return jobs
+
+
+    def build( self, jobs, output = None, formats = None ):
+        """build and write all networks, return their summaries in job order
+    - jobs: job dictionaries as returned by readManifest
+    - output: output directory (default: the configured output_path)
+    - formats: names of NetworkCreator.write* methods to call (default: SBML, XGMML, GML)
+"""
+
+        if output == None:
+            output = self._db.getConfItem( "output_path" )
+        for job in jobs:
+            job.update( output = output, formats = formats or self.formats )
+
+        self._spill( "Building {:d} networks in up to {:d} processes..." . format( len( jobs ), self._workers ) )
+        start = time.time( )
+        if self._workers < 2 or len( jobs ) < 2:
+            db = self._db
+            if self._snapshot:
+                from miRNexpander.DatabaseTools.GraphSnapshot import SnapshotHandler
+                db = SnapshotHandler( db, self._snapshot )
+            nc = NetworkCreator( db )
+            results = [ _build_network( nc, job ) for job in jobs ]
+        else:
+            pool = Pool( min( self._workers, len( jobs ) ), _init_builder, ( self._db._config, self._snapshot ) )
+            try:
+                results = pool.map( _run_builder, jobs, chunksize = 1 )
+            finally:
+                pool.close( )
+                pool.join( )
+        self._spill( "Built {:d} networks in {:.1f} s." . format( len( jobs ), time.time( ) - start ) )
+
+        return results
+
+
+    def writeSummary( self, results, path = None ):
+        """print a summary table of the build results, and also write it to path if given"""
+
+        lines = [ "\t" . join( [ "name", "seeds", "nodes", "edges", "seconds", "error" ] ) ]
+        lines.extend( [  "\t" . join( [ r[ "name" ], str( r[ "seeds" ] ), str( r[ "nodes" ] ), str( r[ "edges" ] ), "{:.2f}" . format( r[ "seconds" ] ), r[ "error" ] ] ) for r in results  ] )
+        self._spill( "\n" . join( lines ) )
+        if path:
+            try:
+                stream = open( path, "w" )
+            except IOError:
+                self._spill( "Unable to open {} for writing." . format( path ) )
+            else:
+                stream.write( "\n" . join( lines ) + "\n" )
+                stream.close( )
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+
+import os
+import json
+import hashlib
+import tempfile
+import cPickle
+from miRNexpander.mWBBase import mWBBaseClass
+from miRNexpander import RunProfile
+
+_version = 1  # part of every key, so that entries of an older layout are not read
+_suffix = ".pkl"
+
+
+def _canonical( value ):
+    """return value with sets and tuples as sorted lists and dictionary keys as strings, so that equal inputs serialize equally"""
+
+    if type( value ) == dict:
+        return dict( [  ( str( k ), _canonical( v ) ) for k, v in value.iteritems( )  ] )
+    elif type( value ) in ( set, frozenset, tuple, list ):
+        items = [  _canonical( v ) for v in value  ]
+        if type( value ) in ( set, frozenset ):
+            items.sort( key = lambda v: json.dumps( v, sort_keys = True ) )
+        return items
+    return value
+
+
+class BuildCache( mWBBaseClass ):
+    """content-addressed on-disk cache of built networks, bounded in size by evicting the least recently used entries
+
+    Entries are named by the SHA-1 of the canonical build inputs (see 'key'), which include the
+    update manifest of the database, and hold the pickled (protocol 2) node and edge store of a
+    NetworkCreator. Reading an entry renews its modification time, which orders the eviction.
+    Entries are written to temporary files and renamed into place, so that processes building
+    at the same time (e.g. with --batch) can share the directory.
+"""
+
+    def __init__( self, path, max_bytes ):
+        """initialize values (path: cache directory, created on first use; max_bytes: size budget of all entries)"""
+
+        self.path = path
+        self._max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    @staticmethod
+    def key( inputs ):
+        """return the cache key of a dictionary of build inputs"""
+        return hashlib.sha1( json.dumps( _canonical( dict( inputs, cache_version = _version ) ), sort_keys = True ) ).hexdigest( )
+
+
+    @RunProfile.timed( "network", "build cache get" )
+    def get( self, key ):
+        """return the entry stored under key, or None"""
+
+        path = os.path.join( self.path, key + _suffix )
+        try:
+            stream = open( path, "rb" )
+        except IOError:
+            self.misses += 1
+            return None
+        try:
+            value = cPickle.load( stream )
+        except ( EOFError, ValueError, TypeError, AttributeError, ImportError, cPickle.UnpicklingError ) as e:
+            self._alert( "Dropping unreadable build cache entry {!r}: {}" . format( path, e ) )
+            self._remove( path )
+            self.misses += 1
+            return None
+        finally:
+            stream.close( )
+        try:
+            os.utime( path, None )  # most recently used
+        except OSError:
+            pass  # evicted by another process in the meantime
+        self.hits += 1
+        return value
+
+
+    @RunProfile.timed( "network", "build cache put" )
+    def put( self, key, value ):
+        """store value under key, then evict the least recently used entries beyond the size budget"""
+
+        try:
+            if not os.path.isdir( self.path ):
+                os.makedirs( self.path )
+            handle, temp = tempfile.mkstemp( dir = self.path, suffix = ".tmp" )
+            with os.fdopen( handle, "wb" ) as stream:
+                cPickle.dump( value, stream, 2 )
+            os.rename( temp, os.path.join( self.path, key + _suffix ) )
+        except ( IOError, OSError ) as e:
+            self._alert( "Network not stored in the build cache {!r}: {}" . format( self.path, e ) )
+            return False
+        self._evict( )
+        return True
+
+
+    def _evict( self ):
+        """remove the least recently used entries until the rest fits into the size budget"""
+
+        entries = [ ]
+        for name in os.listdir( self.path ):
+            if not name.endswith( _suffix ):
+                continue
+            try:
+                stat = os.stat( os.path.join( self.path, name ) )
+            except OSError:
+                continue
+            entries.append( ( stat.st_mtime, stat.st_size, name ) )
+        total = sum( [  e[ 1 ] for e in entries  ] )
+        for mtime, size, name in sorted( entries ):
+            if total <= self._max_bytes:
+                break
+            self._remove( os.path.join( self.path, name ) )
+            total -= size
+            self.evictions += 1
+
+
+    def _remove( self, path ):
+        """remove an entry, unless another process did already"""
+
+        try:
+            os.remove( path )
+        except OSError:
+            pass
@@ -637,11 +637,11 @@ class CellDesignerIO( NetworkCreator ):
             query_input = {  str( n[ 1 ][ t ] ) for n in self.graph.nodes_iter( data = True ) if t in n[ 1 ] } - { "" }
             # make sure to convert u'' to normal strings above because there seems to be no sql escape conversion for utf-8 strings
             ref_query = "SELECT `Alias`, `ref` FROM `Actor_aliases` WHERE ref < 1e9 AND type = {} AND Alias IN ({})" . format( xrefs[ t ], self._db._sqllist( query_input ) )
-            ref_result = self._db._sql( ref_query )
-            if type( ref_result ) == int:
+            ref_result = dict( self._db._sql_iter( ref_query ) )  # streamed, the mapping is the only copy held in memory
+            if not ref_result:
                 self._spill( "No recognizable annotation found for identifiers in attribute {}." . format( t ) )
                 continue
-            refs[ t ] = dict( ref_result )
+            refs[ t ] = ref_result
 
         # assemble mapped identifiers and requery with them to get mappings
         all_refs = {  v for k in refs for v in refs[ k ].values( )  }
@@ -654,8 +654,7 @@ class CellDesignerIO( NetworkCreator ):
             query = "SELECT Alias, ref FROM Actor_aliases WHERE type = {} AND ref IN ({})" . format( xrefs[ t ], self._db._sqllist( all_refs ) )
             if t == "ensembl":
                 query += " AND SUBSTR( Alias, 1, 3 ) = \"ENS\""  # skip old ENSEMBL identifiers
-            res = self._db._sql( query )
-            for r in res:
+            for r in self._db._sql_iter( query ):
                 aliases[ r[ 1 ] ][ t ].add( r[ 0 ].strip( ) )
 
         # update each node with potentially novel annotation
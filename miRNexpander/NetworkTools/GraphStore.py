@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+
+import gc
+import networkx
+from array import array
+
+class _Absent( object ):
+    """value of attributes that an edge does not have (a single instance, which stays the same when pickled)"""
+
+    __slots__ = ( )
+
+    def __reduce__( self ):
+        return "_absent"  # pickled as a reference to the module attribute
+
+_absent = _Absent( )
+
+
+class NodeRecord( object ):
+    """attributes of one network node while the network is built (see 'attributes' for the networkx node attributes)"""
+
+    __slots__ = ( "tag", "name", "cls", "shell", "frontier", "seed", "homodimer", "hgnc_symbol", "members", "subunits" )
+
+    def __init__( self, tag, name, cls, shell, seed = 0, homodimer = 1, hgnc_symbol = None, members = None, subunits = None ):
+        """initialize values (new nodes are on the frontier of the network)"""
+
+        self.tag = tag
+        self.name = name
+        self.cls = cls  # the node class ("class" attribute), e.g. PROTEIN or COMPLEX
+        self.shell = shell
+        self.frontier = True
+        self.seed = seed
+        self.homodimer = homodimer
+        self.hgnc_symbol = hgnc_symbol  # None for complexes, which have members and subunits instead
+        self.members = members
+        self.subunits = subunits
+
+
+    def attributes( self, graphics ):
+        """return the node attributes as stored in the networkx graph (graphics: default node graphics, shared by all nodes)"""
+
+        d = dict( label = self.tag, tag = self.tag, name = self.name, shell = self.shell, frontier = self.frontier, seed = self.seed,
+                  homodimer = self.homodimer, graphics = graphics, compartment = "nucleus" )  # TODO: quick'n'dirty hack to accomodate TRANSFAC expansion
+        d[ "class" ] = self.cls
+        if self.hgnc_symbol != None:
+            d[ "hgnc_symbol" ] = self.hgnc_symbol
+        if self.members != None:
+            d.update( members = self.members, subunits = self.subunits )
+        return d
+
+
+class _Category( object ):
+    """column of repeated values, stored as codes into a list of the distinct values"""
+
+    __slots__ = ( "codes", "values", "_lookup" )
+
+    def __init__( self, rows ):
+        """initialize values (rows: number of rows that do not have the attribute, code 0)"""
+
+        self.codes = array( "i", [ 0 ] ) * rows
+        self.values = [ _absent ]
+        self._lookup = { }  # value (or identity, for unhashable values) -> code
+
+
+    def __getstate__( self ):
+        return self.codes, self.values
+
+
+    def __setstate__( self, state ):
+        """restore a pickled column (unpickled values have new identities, so the lookup is rebuilt)"""
+
+        self.codes, self.values = state
+        self._lookup = { }
+        for code in xrange( 1, len( self.values ) ):
+            try:
+                self._lookup[ self.values[ code ] ] = code
+            except TypeError:
+                self._lookup[ ( _absent, id( self.values[ code ] ) ) ] = code
+
+
+    def code( self, value ):
+        """return the code of value, adding it to the distinct values if it is new"""
+
+        try:
+            return self._lookup[ value ]
+        except KeyError:
+            key = value
+        except TypeError:  # e.g. graphics dictionaries, which are shared by many edges
+            key = ( _absent, id( value ) )
+            try:
+                return self._lookup[ key ]
+            except KeyError:
+                pass
+        self._lookup[ key ] = len( self.values )
+        self.values.append( value )
+        return self._lookup[ key ]
+
+
+class EdgeTable( object ):
+    """edges of a network under construction, stored column by column instead of as one attribute dictionary per edge
+
+    End points are coded as integers into the node tags, attributes with repeated values (see
+    'categorical') as integer codes into their distinct values, and all other attributes in
+    one list per attribute. Attribute dictionaries are only built when the edges are read,
+    see 'edges_iter'.
+"""
+
+    # attributes with repeated values: the interaction database and release, the edge type and graphics, and the aliases of the
+    # interaction partners (the query results carry a new string for every interaction); unhashable values such as graphics
+    # dictionaries are told apart by identity
+    categorical = frozenset( ( "type", "database", "release", "reldate", "polarity", "graphics", "source_alias", "target_alias" ) )
+
+    def __init__( self ):
+        """initialize values"""
+
+        self._rows = { }  # ( source, target, key ) -> row
+        self._tags = [ ]  # node tags of the end points
+        self._tag_codes = { }  # tag -> index in _tags
+        self._source = array( "i" )
+        self._target = array( "i" )
+        self._key = [ ]
+        self._plain = { }  # attribute name -> list of values (_absent for edges without the attribute)
+        self._categories = { }  # attribute name -> _Category
+
+
+    def __len__( self ):
+        return len( self._key )
+
+
+    def add_edge( self, source, target, key, attr ):
+        """add an edge with the attributes in dictionary attr, or update the attributes of an existing edge"""
+
+        edge = ( source, target, key )
+        if edge in self._rows:
+            row = self._rows[ edge ]
+            for name, value in attr.iteritems( ):
+                if name not in self._plain and name not in self._categories:
+                    self._add_column( name )
+                if name in self._plain:
+                    self._plain[ name ][ row ] = value
+                else:
+                    column = self._categories[ name ]
+                    column.codes[ row ] = column.code( value )
+            return
+
+        for name in attr:
+            if name not in self._plain and name not in self._categories:
+                self._add_column( name )
+        self._rows[ edge ] = len( self._key )
+        self._source.append( self._tag_code( source ) )
+        self._target.append( self._tag_code( target ) )
+        self._key.append( key )
+        for name, column in self._plain.iteritems( ):
+            column.append( attr.get( name, _absent ) )
+        for name, column in self._categories.iteritems( ):
+            column.codes.append( column.code( attr[ name ] ) if name in attr else 0 )
+
+
+    def edges_iter( self, data = False ):
+        """iterate over the edges as ( source, target, key ) triples, or ( source, target, key, attribute dictionary ) with data set"""
+
+        tags = self._tags
+        plain = self._plain.items( )
+        categories = [  ( name, column.codes, column.values ) for name, column in self._categories.iteritems( )  ]
+        for row in xrange( len( self._key ) ):
+            if not data:
+                yield tags[ self._source[ row ] ], tags[ self._target[ row ] ], self._key[ row ]
+                continue
+            d = { }
+            for name, column in plain:
+                if column[ row ] is not _absent:
+                    d[ name ] = column[ row ]
+            for name, codes, values in categories:
+                if codes[ row ]:
+                    d[ name ] = values[ codes[ row ] ]
+            yield tags[ self._source[ row ] ], tags[ self._target[ row ] ], self._key[ row ], d
+
+
+    def _add_column( self, name ):
+        """add an attribute column, with all existing edges lacking the attribute"""
+
+        if name in EdgeTable.categorical:
+            self._categories[ name ] = _Category( len( self._key ) )
+        else:
+            self._plain[ name ] = [ _absent ] * len( self._key )
+
+
+    def _tag_code( self, tag ):
+        """return the index of a node tag in _tags"""
+
+        try:
+            return self._tag_codes[ tag ]
+        except KeyError:
+            self._tag_codes[ tag ] = len( self._tags )
+            self._tags.append( tag )
+            return self._tag_codes[ tag ]
+
+
+class GraphStore( object ):
+    """nodes and edges of a network under construction, turned into a networkx MultiDiGraph only when the network is written
+
+    Nodes are kept as slotted NodeRecords instead of attribute dictionaries, and edges in an
+    EdgeTable, which saves networkx's nested adjacency and attribute dictionaries while the
+    network grows. Adding a node or an edge that is already present replaces or updates it,
+    just as in networkx.
+"""
+
+    # default node graphics (x, y, fill, outline width); the writers replace the graphics of each node rather than changing them
+    node_graphics = dict( x = 0, y = 0, fill = '#000000', outline_width = 1.0 )
+
+    def __init__( self, **attr ):
+        """initialize values (attr: graph attributes, e.g. name)"""
+
+        self.graph = dict( attr )  # graph attributes, as in networkx
+        self.node = { }  # tag -> NodeRecord
+        self.edges = EdgeTable( )
+
+
+    def __contains__( self, tag ):
+        return tag in self.node
+
+
+    def __len__( self ):
+        return len( self.node )
+
+
+    def add_node( self, record ):
+        """add a node (replacing the node with the same tag)"""
+        self.node[ record.tag ] = record
+
+
+    def add_edge( self, source, target, key, attr ):
+        """add an edge with the attributes in dictionary attr, or update the attributes of an existing edge"""
+        self.edges.add_edge( source, target, key, attr )
+
+
+    def number_of_nodes( self ):
+        return len( self.node )
+
+
+    def number_of_edges( self ):
+        return len( self.edges )
+
+
+    def materialize( self ):
+        """return the network as a networkx MultiDiGraph"""
+
+        collecting = gc.isenabled( )
+        gc.disable( )  # the graph is made of many new (acyclic) dictionaries, which would trigger collections over the whole heap again and again
+        try:
+            g = networkx.MultiDiGraph( **self.graph )
+            graphics = dict( GraphStore.node_graphics )
+            g.add_nodes_from( [  ( tag, r.attributes( graphics ) ) for tag, r in self.node.iteritems( )  ] )
+            g.add_edges_from( self.edges.edges_iter( data = True ) )
+        finally:
+            if collecting:
+                gc.enable( )
+        return g
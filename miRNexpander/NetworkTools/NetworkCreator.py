@@ -2,9 +2,9 @@
 
 from __future__ import print_function
 
-import MySQLdb
 import os, sys
 import re
+import time
 import networkx
 from collections import defaultdict  # for easier handling of dictionaries with nested entries
 from copy import deepcopy  # for copying nested types by value
@@ -13,10 +13,12 @@ from itertools import chain  # for selecting any element from a group of iterabl
 #import matplotlib.pyplot as plt
 from networkx.readwrite import json_graph  # for json export
 import json  # for json export
+from miRNexpander import RunProfile
 from miRNexpander.NetworkTools.AliasResolver import AliasResolver
+from miRNexpander.NetworkTools.GraphStore import GraphStore, NodeRecord
+from miRNexpander.NetworkTools.BuildCache import BuildCache
 from miRNexpander.DatabaseTools.DatabaseHandler import DatabaseHandler
 from miRNexpander.SBMLTools.SBMLTools import NetworkWriter
-from miRNexpander.QueryTemplates.QT import query_templ
 
 
 
@@ -34,15 +36,19 @@ class NetworkCreator( AliasResolver ):
     )
     __mirna_regexp = re.compile( "mir(let)?[0-9]+[a-z]?(-[0-9]+)?" )
     __hostgene_regexp = re.compile( "mir(let)?[0-9]+[a-z]?(-[0-9]+)?hg" )
+    budget_keys = ( "nodes", "edges", "shell_nodes", "shell_edges", "max_degree" )  # see createNetwork
 
     def __init__( self, db_handler ):
         """initialize instance variables"""
 
-        self.graph = networkx.MultiDiGraph( )
+        self.graph = None  # the network as networkx MultiDiGraph, see getGraph( )
+        self._store = GraphStore( )  # nodes and edges while the network is built
         self.Name = None
 
         # declare the use copy of the class variable dictionary
         self._symbol_mapper = deepcopy( NetworkCreator.__symbol_mapper )
+        self._tag_ids = dict( )  # maps node tags to database ids, which saves looking them up again for each shell
+        self._build_cache = None  # BuildCache, set up on first use (False if no directory is configured)
 
         self._db = db_handler
         self._moltypes = self._db.getConfItem( "moltypes" )
@@ -59,11 +65,21 @@ class NetworkCreator( AliasResolver ):
         """set the network's name"""
         if type( name ) == str:
             self.Name = name
-            self.graph.graph[ 'name' ] = name
-
-
-    def createNetwork( self, seeds, depth = 1, restrict = { "fish" : None }, cfilter = "any" ):
-        """query the database to build a network"""
+            self._store.graph[ 'name' ] = name
+            if self.graph != None:
+                self.graph.graph[ 'name' ] = name
+
+
+    def createNetwork( self, seeds, depth = 1, restrict = { "fish" : None }, cfilter = "any", gfilter = None, budget = None, cache = True ):
+        """query the database to build a network
+    - gfilter: gene symbols that new nodes must match
+    - budget: dictionary with (any of) the keys in 'budget_keys', bounding the expansion:
+      nodes and edges cap the whole network, shell_nodes and shell_edges each shell, and
+      frontier nodes with more than max_degree interactions (hubs, seeds excepted) are linked
+      to the network, but not expanded; once a cap is reached, the expansion stops
+    - cache: take the network from the build cache (see build_cache in the [database] section)
+      if it was built before from the same parameters and database contents, and store it there otherwise
+"""
 
         if not seeds or type( seeds ) not in ( tuple, list, dict, set ):
             self._extalert( "Parameter 1 is empty or not an iterable." )
@@ -73,18 +89,163 @@ class NetworkCreator( AliasResolver ):
         except ValueError:
             self._extalert( "Parameter 2 is not an integer value." )
             return False
+        budget = self._check_budget( budget )
+        if budget == None:
+            return False
+
+        key = self._cache_key( seeds, depth, restrict, cfilter, gfilter, budget ) if cache else None
+        if key != None:
+            entry = self._build_cache.get( key )
+            if entry != None:
+                self._reset( )
+                self._store = entry[ "store" ]
+                self._store.graph[ "name" ] = self.Name
+                self._tag_ids = entry[ "tag_ids" ]
+                for symbol, levels in entry[ "symbols" ].iteritems( ):
+                    self._symbol_mapper[ "node" ][ symbol ].update( levels )
+                self._spill( "Network taken from the build cache ({:d} nodes, {:d} edges)." . format( self._store.number_of_nodes( ), self._store.number_of_edges( ) ) )
+                return True
 
         self._reset( )
-        self.graph.graph[ "name" ] = self.Name
+        self._store.graph[ "name" ] = self.Name
         # ToDo: check logic of species restriction
         self._add( seeds, seeds = True, complex_filter = cfilter )
-        self._connect( add_shells = depth, cfilter = cfilter, restrict = restrict )
+        self._connect( add_shells = depth, cfilter = cfilter, restrict = restrict, gfilter = gfilter, budget = budget )
+        if key != None:
+            self._build_cache.put( key, dict( store = self._store, tag_ids = self._tag_ids,
+                    symbols = dict( [  ( symbol, dict( levels ) ) for symbol, levels in self._symbol_mapper[ "node" ].iteritems( )  ] ) ) )
+        return True
+
+
+    def connectSeeds( self, seeds, targets, depth = 3, restrict = { "fish" : None }, cfilter = "any", gfilter = None, budget = None ):
+        """build the network of the shortest connections between two seed groups, found by bidirectional breadth-first search
+    - seeds, targets: the two groups, as sets of ( database id, type ) like the seeds of createNetwork
+    - depth: maximal length of a connection, in interactions
+    - restrict, cfilter, gfilter: as for createNetwork, applied to each search step and to the final network
+    - budget: as for createNetwork; max_degree keeps hubs from being passed through, nodes and
+      shell_nodes bound the nodes visited in total and per step, edges and shell_edges the final network
+    - returns True if the groups are connected, False otherwise (the network then holds only the seeds)
+
+    Each step expands the smaller frontier of the two groups, and the search stops after the first
+    step that reaches the other group, so only the neighbourhoods up to about half the distance
+    are queried. Of the connections found in that step, only those of minimal length are kept;
+    the network consists of them, linked like the outermost shell of createNetwork.
+"""
+
+        if not seeds or not targets or type( seeds ) != set or type( targets ) != set:
+            self._extalert( "Parameters 1 and 2 must be non-empty sets." )
+            return False
+        try:
+            depth = int( depth )
+        except ValueError:
+            self._extalert( "Parameter 3 is not an integer value." )
+            return False
+        budget = self._check_budget( budget )
+        if budget == None:
+            return False
+        if gfilter != None:
+            gfilter = set( gfilter )
+        s = self.getSpeciesRestriction( )
+
+        ### internal subroutine ###
+        def admit( k, annot ):
+            """decide whether the search may pass through node k (by species and gene filter, as '_add' does)"""
+
+            try:
+                a = annot[ k ]
+            except KeyError:
+                return False
+            if s and a[ "species" ] not in s:
+                return False
+            if gfilter:
+                symbols = set( a[ "symbol" ].split( ":" ) )
+                if cfilter in ( "all", True ):
+                    return symbols <= gfilter
+                return bool( symbols & gfilter )
+            return True
+
+        groups = ( dict( seeds ), dict( targets ) )  # database id -> type
+        types = dict( groups[ 0 ] )
+        types.update( groups[ 1 ] )
+        parents = [  dict( [  ( k, set( ) ) for k in group  ] ) for group in groups  ]  # per group: visited id -> ids it was reached from
+        distance = [  dict( [  ( k, 0 ) for k in group  ] ) for group in groups  ]
+        frontier = [  set( group ) for group in groups  ]
+        meeting = set( [  ( k, k ) for k in frontier[ 0 ] & frontier[ 1 ]  ] )  # ( id reached from seeds, id reached from targets )
+        steps = 0
+        while not meeting and steps < depth and frontier[ 0 ] and frontier[ 1 ]:
+            side = 0 if len( frontier[ 0 ] ) <= len( frontier[ 1 ] ) else 1
+            seen, other = parents[ side ], parents[ 1 - side ]
+            res, annot = self._db.expand_shell( frontier[ side ], restrict = restrict )
+            steps += 1
+            hubs = self._hubs( budget, res, frontier[ side ] - set( groups[ side ] ) )
+            reached = defaultdict( set )  # newly visited id -> ids it was reached from
+            meets = defaultdict( set )  # length of the connection -> meeting points found in this step
+            for r in res:
+                for u, v, t in ( r[ 0 ], r[ 1 ], r[ 3 ] ), ( r[ 1 ], r[ 0 ], r[ 2 ] ):
+                    if u not in frontier[ side ] or v in seen:
+                        continue
+                    elif v in other:
+                        meets[ distance[ side ][ u ] + 1 + distance[ 1 - side ][ v ] ].add( ( u, v ) if side == 0 else ( v, u ) )
+                    elif u not in hubs and admit( v, annot ):
+                        reached[ v ].add( u )
+                        types[ v ] = "complex" if v > 1e9 else t
+            self._spill( "Search step {:d}: {:d} frontier node(s) of group {:d}, {:d} interaction(s), {:d} newly reached node(s){}." . format(
+                    steps, len( frontier[ side ] ), side + 1, len( res ), len( reached ), ", connected" if meets else "" ) )
+            if meets:
+                meeting = meets[ min( meets ) ]  # the whole step is searched first, as a meeting point reached early need not lie on a shortest connection
+                break
+
+            left = self._budget_left( budget, "shell_nodes", "nodes", len( parents[ 0 ] ) + len( parents[ 1 ] ) )
+            if left != None and len( reached ) > left:
+                reached = dict( sorted( reached.iteritems( ), key = lambda x: ( -len( x[ 1 ] ), x[ 0 ] ) )[ :left ] )
+                if not left:
+                    self._spill( "Node budget exhausted after {:d} step(s)." . format( steps ) )
+            seen.update( reached )
+            for k in reached:
+                distance[ side ][ k ] = steps
+            frontier[ side ] = set( reached )
+
+        self._reset( )
+        self._store.graph[ "name" ] = self.Name
+        self._add( seeds | targets, seeds = True, complex_filter = cfilter )
+        if not meeting:
+            self._spill( "No connection of at most {:d} interaction(s) found." . format( depth ) )
+            return False
+
+        # collect the nodes on the connections, walking back from the meeting points to both groups
+        shells = defaultdict( set )
+        done = set( )
+        for ends in meeting:
+            for side, k in enumerate( ends ):
+                stack = [ k ]
+                while stack:
+                    k = stack.pop( )
+                    if ( side, k ) in done:
+                        continue
+                    done.add( ( side, k ) )
+                    stack.extend( parents[ side ][ k ] )
+                    if k not in groups[ 0 ] and k not in groups[ 1 ]:
+                        shells[ distance[ side ][ k ] ].add( ( k, types[ k ] ) )
+        for shell in sorted( shells ):
+            self._add( shells[ shell ], shell = shell, complex_filter = cfilter )
+        self._store.graph[ "shells" ] = max( shells ) if shells else 0
+        self._connect( add_shells = 0, cfilter = cfilter, restrict = restrict, gfilter = gfilter, budget = budget )
         return True
 
 
+    def getGraph( self ):
+        """return the network as networkx MultiDiGraph (built from the node and edge store on the first call after createNetwork)"""
+
+        if self.graph == None:
+            self.graph = self._store.materialize( )
+        return self.graph
+
+
     def create_filterlist( self, means = { "GO.leafs" } ):
         """create a gene list for filtering"""
 
+        from miRNexpander.QueryTemplates.QT import query_templ  # only needed here
+
         gfilter = dict( )
 
         # prepare species
@@ -125,7 +286,7 @@ class NetworkCreator( AliasResolver ):
         """generate and write a basic CSV format"""
 
         if not self._output_handler:
-            self._output_handler = NetworkWriter( self.graph )
+            self._output_handler = NetworkWriter( self.getGraph( ) )
             if path == None:
                 path = os.path.join( self._db.getConfItem( "output_path" ) )
             self._output_handler.setOutputDir( path )
@@ -136,7 +297,7 @@ class NetworkCreator( AliasResolver ):
         """generate and write the SBML format"""
 
         if not self._output_handler:
-            self._output_handler = NetworkWriter( self.graph )
+            self._output_handler = NetworkWriter( self.getGraph( ) )
             if path == None:
                 path = os.path.join( self._db.getConfItem( "output_path" ) )
             self._output_handler.setOutputDir( path )
@@ -147,7 +308,7 @@ class NetworkCreator( AliasResolver ):
         """generate and write the GML format"""
 
         if not self._output_handler:
-            self._output_handler = NetworkWriter( self.graph )
+            self._output_handler = NetworkWriter( self.getGraph( ) )
             if path == None:
                 path = os.path.join( self._db.getConfItem( "output_path" ) )
             self._output_handler.setOutputDir( path )
@@ -158,7 +319,7 @@ class NetworkCreator( AliasResolver ):
         """generate and write the XGMML format"""
 
         if not self._output_handler:
-            self._output_handler = NetworkWriter( self.graph )
+            self._output_handler = NetworkWriter( self.getGraph( ) )
             if path == None:
                 path = os.path.join( self._db.getConfItem( "output_path" ) )
             self._output_handler.setOutputDir( path )
@@ -169,7 +330,7 @@ class NetworkCreator( AliasResolver ):
         """take a picture of the network"""
 
         if not self._output_handler:
-            self._output_handler = NetworkWriter( self.graph )
+            self._output_handler = NetworkWriter( self.getGraph( ) )
             if path == None:
                 path = os.path.join( self._db.getConfItem( "output_path" ) )
             self._output_handler.setOutputDir( path )
@@ -219,7 +380,7 @@ class NetworkCreator( AliasResolver ):
             return
 
         if graph == None:
-            graph = self.graph
+            graph = self.getGraph( )
 
         if "gml" in f:  # Graph Markup Language
             fn = path + ".gml"
@@ -375,8 +536,35 @@ class NetworkCreator( AliasResolver ):
 
     def _reset( self ):
         """reset internal storages"""
-        self.graph = networkx.MultiDiGraph( shells = 0 )
+        self.graph = None
+        self._store = GraphStore( shells = 0 )
         self._symbol_mapper = deepcopy( NetworkCreator.__symbol_mapper )
+        self._tag_ids = dict( )
+        self._output_handler = None  # the writer holds the previous graph
+
+
+    def _cache_key( self, seeds, depth, restrict, cfilter, gfilter, budget ):
+        """return the build cache key of the parameters of createNetwork, or None if there is no build cache or the database contents are unknown
+
+    Besides the parameters, the key covers the completed restrictions (with the configured
+    defaults and allowed databases), the species restriction, the digest of the update
+    manifest, which changes whenever the database is updated, and the graph snapshot that
+    answers the queries instead of the database, if any (see SnapshotHandler).
+"""
+
+        if self._build_cache is None:
+            self._build_cache = False
+            if self._db._build_cache_path and self._db._build_cache_mb > 0:
+                self._build_cache = BuildCache( self._db._build_cache_path, int( self._db._build_cache_mb * 2 ** 20 ) )
+        if not self._build_cache:
+            return None
+        digest = self._db.getManifestDigest( )
+        restrict = dict( restrict )  # completed in place
+        if digest == None or self._db._eligible_tables( restrict ) == None:
+            return None
+        return BuildCache.key( dict( seeds = seeds, depth = int( depth ), restrict = restrict,
+                cfilter = cfilter, gfilter = gfilter, budget = budget, species = self.getSpeciesRestriction( ), manifest = digest,
+                snapshot = self._db.getSnapshotStamp( ) if hasattr( self._db, "getSnapshotStamp" ) else None ) )
 
 
     def _resort_mapper( self ):
@@ -386,8 +574,9 @@ class NetworkCreator( AliasResolver ):
                 self._symbol_mapper[ "node" ][ s ][ k ] = sorted( set( l ) )
 
 
-    def _add( self, node_def, g = None, shell = None, seeds = False, gfilter = None, complex_filter = "all" ):
-        """unalias and annotate input, then add nodes"""
+    @RunProfile.timed( "network" )
+    def _add( self, node_def, g = None, shell = None, seeds = False, gfilter = None, complex_filter = "all", annotations = None ):
+        """unalias and annotate input, then add nodes (annotations may be given if already known, e.g. from 'expand_shell')"""
 
         if not node_def:
             return dict( )
@@ -395,7 +584,7 @@ class NetworkCreator( AliasResolver ):
             self._alert( "Wrong type for parameter(s) {:s}, {!r} expected." . format( " and " . join( [ "1" ] ), set.__name__ ) )
             return False
         if g == None:
-            g = self.graph
+            g = self._store
         if shell == None:
             shell = 0
         else:
@@ -419,6 +608,10 @@ class NetworkCreator( AliasResolver ):
             g.graph[ "psre" ] = 0
 
         db_ids = zip( *node_def )[ 0 ]
+        if annotations == None:
+            annotations = self._db.query_for_annotations( db_ids )
+        else:
+            annotations = dict( [  ( k, annotations[ k ] ) for k in db_ids if k in annotations  ] )
 
         # we filter out nodes that are not wanted here, which means not adding them to the to graph
         if gfilter:
@@ -427,11 +620,10 @@ class NetworkCreator( AliasResolver ):
                 _decide = lambda s, gf: len( set( s ) ) == len( set( s ) & gf )  # must match all subunits
             else:
                 _decide = lambda s, gf: set( s ) & gf  # must match any subunit
-            annot = dict( [ ( k, v ) for k, v in self._db.query_for_annotations( db_ids ).iteritems( ) if _decide( v[ "symbol" ].split( ":" ), gfilter ) ] )
+            annot = dict( [ ( k, v ) for k, v in annotations.iteritems( ) if _decide( v[ "symbol" ].split( ":" ), gfilter ) ] )
         else:
-            annot = self._db.query_for_annotations( db_ids )
+            annot = annotations
 
-        grpn = dict( x = 0, y = 0, fill = '#000000', outline_width = 1.0 )  # default node graphics
         e = { "type" : "COMPLEX_ASSOCIATION", "polarity" : 0, "graphics" : dict(  target_arrow = 9, type = "line", width = 4, fill = '#880088' ) }
         s = self.getSpeciesRestriction( )  # second filter - does the species match the set restriction?
         for k, t in node_def:
@@ -444,26 +636,20 @@ class NetworkCreator( AliasResolver ):
                 if s and annot[ k ][ "species" ] not in s:
                     del annot[ k ]
                     continue
-                d = dict( shell = shell, frontier = True, seed = int( seeds ), homodimer = 1, graphics = grpn,
-                            compartment = "nucleus" )  # TODO: quick'n'dirty hack to accomodate TRANSFAC expansion
-                acc_d = deepcopy( d )
-                acc_d[ "class" ] = "PROTEIN"
                 if t == "mirna" or ( NetworkCreator.__mirna_regexp.match( symbol.lower( ) ) and not NetworkCreator.__hostgene_regexp.match( symbol.lower( ) ) ):
                     tag += "#mir"
-                    d[ "class" ] = "ANTISENSE_RNA"
-                    d.update( hgnc_symbol = symbol )
+                    node = NodeRecord( tag, symbol, "ANTISENSE_RNA", shell, int( seeds ), hgnc_symbol = symbol )
                 elif t == "complex":
                     tag += "#com"
-                    d[ "class" ] = "COMPLEX"
                     components = sorted( symbol.split( ":" ) )
-                    d.update( members = "|" . join( components ), subunits = ":" . join( components ) )
+                    node = NodeRecord( tag, symbol, "COMPLEX", shell, int( seeds ), members = "|" . join( components ), subunits = ":" . join( components ) )
                     if len( set( components ) ) < len( components ) and len( set( components ) ) == 1:
-                        d[ "homodimer" ] = len( components )
+                        node.homodimer = len( components )
                 else:
                     tag += "#pro"
-                    d[ "class" ] = "PROTEIN"
-                    d.update( hgnc_symbol = symbol )
-                g.add_node( tag, label = tag, tag = tag, name = symbol, **d )
+                    node = NodeRecord( tag, symbol, "PROTEIN", shell, int( seeds ), hgnc_symbol = symbol )
+                g.add_node( node )
+                self._tag_ids[ tag ] = k
                 self._symbol_mapper[ "node" ][ symbol.lower( ) ][ "base" ].append( tag )
 
                 # add supplementary complex subunits (and track reactions with pseudoreaction counter)
@@ -474,27 +660,93 @@ class NetworkCreator( AliasResolver ):
                             acc = self._symbol_mapper[ "node" ][ c.lower( ) ][ "base" ][ 0 ]
                         except IndexError:
                             acc = c  + "#pro"
-                            acc_d.update( label = acc, tag = acc, hgnc_symbol = c, name = c )
-                            g.add_node( acc, **acc_d )
+                            g.add_node( NodeRecord( acc, c, "PROTEIN", shell, int( seeds ), hgnc_symbol = c ) )
                             self._symbol_mapper[ "node" ][ c.lower( ) ][ "base" ].append( acc )
                         e.update( instance = "{} -- {}" . format( acc, tag ), r_id = "psre{}" . format( g.graph[ "psre" ] ) )
-                        g.add_edge( acc, tag, e[ "instance" ], **e )
+                        g.add_edge( acc, tag, e[ "instance" ], e )
 
         self._resort_mapper( )
 
         return annot
 
 
-    def _connect( self, restrict = { "fish" : None }, final = { }, add_shells = 1, g = None, gfilter = None, cfilter = None ):
-        """link nodes, optionally expanding the network with the given type(s) of molecule, working only on frontier nodes"""
+    def _check_budget( self, budget ):
+        """return the expansion budget as dictionary of non-negative integers (empty for None), or None if it is malformed"""
+
+        if budget == None:
+            return { }
+        elif type( budget ) != dict:
+            self._alert( "Wrong type for parameter {!r}, {!r} expected." . format( "budget", dict.__name__ ) )
+            return None
+        unknown = set( budget ) - set( NetworkCreator.budget_keys )
+        if unknown:
+            self._alert( "Unknown budget key(s) {}, expected any of {}." . format( ", " . join( sorted( unknown ) ), ", " . join( NetworkCreator.budget_keys ) ) )
+            return None
+        try:
+            budget = dict( [  ( str( k ), int( v ) ) for k, v in budget.iteritems( ) if v != None  ] )  # JSON keys arrive as unicode
+        except ( TypeError, ValueError ):
+            self._alert( "Budget values must be integers." )
+            return None
+        if [  v for v in budget.values( ) if v < 0  ]:
+            self._alert( "Budget values must not be negative." )
+            return None
+        return budget
+
+
+    def _budget_left( self, budget, shell_key, total_key, used ):
+        """return how many nodes or edges the budget leaves for the next shell, given the number already used (None if unlimited)"""
+
+        left = budget.get( shell_key )
+        if budget.get( total_key ) != None:
+            total = max( budget[ total_key ] - used, 0 )
+            left = total if left == None else min( left, total )
+        return left
+
+
+    def _hubs( self, budget, res, candidates ):
+        """return the candidates (frontier nodes other than seeds, which are always expanded) with more interactions in res than the budget's max_degree"""
+
+        if budget.get( "max_degree" ) == None:
+            return set( )
+        frontier = set( candidates )
+        degree = defaultdict( int )
+        for r in res:
+            if r[ 0 ] in frontier:
+                degree[ r[ 0 ] ] += 1
+            if r[ 1 ] in frontier and r[ 1 ] != r[ 0 ]:
+                degree[ r[ 1 ] ] += 1
+        return set( [  k for k, n in degree.iteritems( ) if n > budget[ "max_degree" ] ]  )
+
+
+    def _trim_shell( self, budget, g, new_nodes, new_edges, support, node_set ):
+        """cut the new nodes and edges of a shell down to what the budget leaves, keeping the nodes with the most interactions into the network and the edges between present nodes first"""
+
+        left = self._budget_left( budget, "shell_nodes", "nodes", g.number_of_nodes( ) )
+        if left != None and len( new_nodes ) > left:
+            new_nodes = set( sorted( new_nodes, key = lambda m: ( -support[ m ], m[ 0 ] ) )[ :left ] )
+            kept = node_set | set( [  m[ 0 ] for m in new_nodes  ] )
+            new_edges = dict( [  ( e, i ) for e, i in new_edges.iteritems( ) if e[ 0 ] in kept and e[ 1 ] in kept  ] )
+        left = self._budget_left( budget, "shell_edges", "edges", g.number_of_edges( ) )
+        if left != None and len( new_edges ) > left:
+            new_edges = dict( sorted( new_edges.iteritems( ), key = lambda x: ( not ( x[ 0 ][ 0 ] in node_set and x[ 0 ][ 1 ] in node_set ), x[ 1 ] ) )[ :left ] )
+            linked = set( chain( *[  e[ :2 ] for e in new_edges  ] ) )
+            new_nodes = set( [  m for m in new_nodes if m[ 0 ] in linked  ] )
+        return new_nodes, new_edges
+
+
+    @RunProfile.timed( "network" )
+    def _connect( self, restrict = { "fish" : None }, final = { }, add_shells = 1, g = None, gfilter = None, cfilter = None, budget = None ):
+        """link nodes, optionally expanding the network with the given type(s) of molecule, working only on frontier nodes (budget: see createNetwork)"""
 
         if add_shells < 0:
             return None
+        if budget == None:
+            budget = { }
 
         if g == None:
-            g = self.graph
-        elif g.__class__ != networkx.MultiDiGraph:
-            self._extalert( "Wrong type of argument at position {:d}: expected 'MultiDiGraph' instead of {!r}." . format( 1, g.__class__.__name__ ) )
+            g = self._store
+        elif g.__class__ != GraphStore:
+            self._extalert( "Wrong type of argument at position {:d}: expected 'GraphStore' instead of {!r}." . format( 1, g.__class__.__name__ ) )
             return False
 
         # check restrict skeletons
@@ -505,17 +757,12 @@ class NetworkCreator( AliasResolver ):
         if "fish" not in final:
             final[ "fish" ] = None
 
-        # prepare graph
+        # prepare graph (node records always have a shell and a frontier flag)
         if "shells" not in g.graph:
             if not g.node:
                 g.graph[ "shells" ] = 0
             else:
                 g.graph[ "shells" ] = 1
-        for n in g.nodes_iter( ):
-            if "frontier" not in g.node[ n ]:
-                g.node[ n ][ "frontier" ] = True
-            if "shell" not in g.node[ n ]:
-                g.node[ n ][ "shell" ] = g.graph[ "shells" ]
 
         annot = { }
         node_set = set( )
@@ -525,11 +772,16 @@ class NetworkCreator( AliasResolver ):
         grpe_n = dict( target_arrow = 15, type = "line", width = 4, fill = '#00cccc' )
         while add_shells > -1:
             # The outer_shell computation assumes that all complex subunits are also available as monomeric nodes (that have an hgnc_symbol attribute).
-            outer_shell = dict( [ ( n, a[ "hgnc_symbol" ] ) for n, a in g.nodes_iter( data = True ) if a[ "frontier" ] and "hgnc_symbol" in a ] )
-            ref = self._db.query_for_references( outer_shell.values( ), { "alias_types" : [ "hgnc.symbol" ] }, invert = True )[ 0 ]
-            ref.update( unmappable_identifier = int( 1e9 ) )  # introduce unmappable identifier for complex subunits
-            # The condition in next comprehension excludes non-annotated nodes in mixed species sources from raising an exception.
-            ref = dict( [  ( ref[ v.lower( ) ], k ) for k, v in outer_shell.iteritems( ) if v.lower( ) in ref  ] )
+            t_start = time.time( )
+            outer_shell = dict( [ ( n, r.hgnc_symbol ) for n, r in g.node.iteritems( ) if r.frontier and r.hgnc_symbol != None ] )
+            # Nodes added by '_add' know their database id, only the others (e.g. supplementary complex subunits) are looked up by symbol.
+            ref = dict( [  ( self._tag_ids[ k ], k ) for k in outer_shell if k in self._tag_ids  ] )
+            unknown = dict( [  ( k, v ) for k, v in outer_shell.iteritems( ) if k not in self._tag_ids  ] )
+            if unknown:
+                found = self._db.query_for_references( unknown.values( ), { "alias_types" : [ "hgnc.symbol" ] }, invert = True )[ 0 ]
+                found.update( unmappable_identifier = int( 1e9 ) )  # introduce unmappable identifier for complex subunits
+                # The condition in next comprehension excludes non-annotated nodes in mixed species sources from raising an exception.
+                ref.update( [  ( found[ v.lower( ) ], k ) for k, v in unknown.iteritems( ) if v.lower( ) in found  ] )
 
             if add_shells == 0:  # in the last round, ...
                 restrict = final  # ... stop adding new nodes, but loop once more to interconnect the outermost layer
@@ -540,8 +792,11 @@ class NetworkCreator( AliasResolver ):
 
             new_nodes = set( )
             new_edges = dict( )
-            res = self._db.query_for_interactions( ref, restrict = restrict )
+            res, shell_annot = self._db.expand_shell( ref, restrict = restrict )  # interactions and partner annotations in one go
+            t_query = time.time( )
             node_set |= set( ref )
+            hubs = self._hubs( budget, res, [  k for k, tag in ref.iteritems( ) if not g.node[ tag ].seed  ] )
+            support = defaultdict( int )  # new node -> number of its interactions with the network
             for i in xrange( len( res ) ):
                 k1, k2, t1, t2 = res[ i ][ :4 ]
                 edge = k1, k2, res[ i ][ 4 ][ "database" ], res[ i ][ 4 ][ "PMIDs" ]
@@ -553,25 +808,40 @@ class NetworkCreator( AliasResolver ):
                     continue
                 elif k1 in node_set:
                     missing = ( k2, t2 )
+                    hook = k1
                 else:
                     missing = ( k1, t1 )
+                    hook = k2
+                if hook in hubs:  # hubs are linked to the nodes present, but not expanded
+                    continue
 
                 m = missing
                 if m[ 0 ] > 1e9:
                     m = m[ 0 ], "complex"
                 new_nodes.add( m )
+                support[ m ] += 1
                 if edge not in edge_set:
                     new_edges[ edge ] = i
 
+            trimmed = False
+            if budget:
+                found = len( new_nodes ), len( new_edges )
+                new_nodes, new_edges = self._trim_shell( budget, g, new_nodes, new_edges, support, node_set )
+                trimmed = bool( hubs ) or found != ( len( new_nodes ), len( new_edges ) )
+                if trimmed:
+                    self._spill( "Shell {:d}: budget kept {:d} of {:d} new node(s) and {:d} of {:d} new edge(s), {:d} hub(s) not expanded." . format(
+                            g.graph[ "shells" ], len( new_nodes ), found[ 0 ], len( new_edges ), found[ 1 ], len( hubs ) ) )
+
 
-            annot.update( self._add( new_nodes, shell = g.graph[ "shells" ], gfilter = gfilter, complex_filter = cfilter ) )
-            if add_shells > 0 and not annot:
+            annot.update( self._add( new_nodes, shell = g.graph[ "shells" ], gfilter = gfilter, complex_filter = cfilter, annotations = shell_annot ) )
+            t_add = time.time( )
+            if add_shells > 0 and not annot and not trimmed:
                 self._alert( "Something went wrong while adding new nodes." )
                 return -1
 
             # make connections
             for i in new_edges.values( ):
-                r = res[ i ]
+                r = list( res[ i ] )
                 for j in ( 0, 1 ):
                     try:
                         symbol = annot[ r[ j ] ][ "symbol" ].lower( )
@@ -596,17 +866,29 @@ class NetworkCreator( AliasResolver ):
                     e.update( instance = "{} -o {}" . format( r[ 0 ], r[ 1 ] ), polarity = 1, graphics = grpe_p )
                 else:
                     e.update( instance = "{} -D {}" . format( r[ 0 ], r[ 1 ] ), polarity = 0, graphics = grpe_0 )
-                g.add_edge( r[ 0 ], r[ 1 ], e[ "instance" ], **e )
+                g.add_edge( r[ 0 ], r[ 1 ], e[ "instance" ], e )
             edge_set |= set( new_edges )
+            t_link = time.time( )
+            self._spill( "Shell {:d}: {:d} frontier node(s), {:d} interaction(s), {:d} new node(s); {:.3f} s querying, {:.3f} s adding nodes, {:.3f} s linking." . format(
+                    g.graph[ "shells" ], len( ref ), len( res ), len( new_nodes ), t_query - t_start, t_add - t_query, t_link - t_add ) )
+            if RunProfile.enabled:
+                RunProfile.record( "shells", "shell {:d} querying" . format( g.graph[ "shells" ] ), t_query - t_start, len( res ) )
+                RunProfile.record( "shells", "shell {:d} adding nodes" . format( g.graph[ "shells" ] ), t_add - t_query, len( new_nodes ) )
+                RunProfile.record( "shells", "shell {:d} linking" . format( g.graph[ "shells" ] ), t_link - t_add, len( new_edges ) )
 
             # unset frontier property
             for key in outer_shell:
-                g.node[ key ][ "frontier" ] = False
+                g.node[ key ].frontier = False
 
             if not new_nodes:
                 add_shells = -1  # no new nodes -> stop iterating
             else:
                 add_shells -= 1  # next shell
+            if budget and add_shells > -1:
+                if self._budget_left( budget, None, "edges", g.number_of_edges( ) ) == 0:
+                    add_shells = -1  # edge budget exhausted -> stop
+                elif self._budget_left( budget, None, "nodes", g.number_of_nodes( ) ) == 0:
+                    add_shells = min( add_shells, 0 )  # node budget exhausted -> only interconnect the outermost layer
 
         return
 
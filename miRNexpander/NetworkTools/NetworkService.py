@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+
+import json
+import time
+import traceback
+import Queue
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from networkx.readwrite import json_graph
+from miRNexpander.mWBBase import mWBBaseClass
+from miRNexpander.NetworkTools.NetworkCreator import NetworkCreator
+from miRNexpander.NetworkTools.ServiceClient import ServiceError
+
+
+class _Worker( object ):
+    """database connection and tools that serve one request at a time"""
+
+    def __init__( self, db_handler ):
+        self.db = db_handler
+        self.nc = NetworkCreator( db_handler )
+        self.il = None  # created on first use, see NetworkService._createExcel( )
+        self.requests = 0
+
+
+class _ServiceServer( ThreadingMixIn, HTTPServer ):
+    """HTTP server that handles each request in its own thread"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _RequestHandler( BaseHTTPRequestHandler ):
+    """translate HTTP requests with JSON payloads into NetworkService calls"""
+
+    def do_GET( self ):
+        self._respond( self.path.strip( "/" ), { } )
+
+
+    def do_POST( self ):
+        try:
+            params = json.loads( self.rfile.read( int( self.headers.getheader( "content-length", 0 ) ) ) or "{}" )
+        except ValueError as e:
+            self._send( 400, dict( error = "Invalid JSON payload: {}" . format( e ) ) )
+            return
+        self._respond( self.path.strip( "/" ), params )
+
+
+    def _respond( self, method, params ):
+        try:
+            result = self.server.service.call( method, params )
+        except ServiceError as e:
+            self._send( 400, dict( error = str( e ) ) )
+        except Exception as e:
+            self.server.service._spill( traceback.format_exc( ) )
+            self._send( 500, dict( error = "{}: {}" . format( e.__class__.__name__, e ) ) )
+        else:
+            self._send( 200, dict( result = result ) )
+
+
+    def _send( self, code, payload ):
+        body = json.dumps( payload )
+        self.send_response( code )
+        self.send_header( "Content-Type", "application/json" )
+        self.send_header( "Content-Length", str( len( body ) ) )
+        self.end_headers( )
+        self.wfile.write( body )
+
+
+    def log_message( self, fmt, *args ):
+        self.server.service._spill( "{} - {}" . format( self.address_string( ), fmt % args ) )
+
+
+
+class NetworkService( mWBBaseClass ):
+    """keep database connections and their caches warm and answer network building requests over localhost HTTP
+
+    Requests are POSTed to /<method> with a JSON object of parameters, e.g. /createNetwork,
+    and answered with { "result" : ... } or { "error" : ... }. Each request borrows one of
+    the workers, which hold their own database connection; at most as many requests as
+    there are workers are served at the same time, the others wait.
+"""
+
+    methods = ( "createNetwork", "unalias", "annotate", "createExcel", "status" )
+
+    def __init__( self, db_handler, workers = None, snapshot = None ):
+        """initialize values
+    - db_handler: connected DatabaseHandler; it becomes the first worker, the others are clones with their own pooled connection
+    - workers: number of concurrent requests (default: the [database] workers setting)
+    - snapshot: optional graph snapshot directory to build networks from
+"""
+
+        self._started = time.time( )
+        self._workers = Queue.Queue( )
+        n = workers or db_handler._workers
+        size = db_handler.getPoolStats( ).get( "size" )  # only pooled (MySQL) connections are limited
+        if size and n > size:
+            raise ServiceError( "{:d} workers need {:d} database connections, but pool_size is {:d}; lower workers or raise pool_size." . format( n, n, size ) )
+        for i in xrange( n ):
+            if i == 0:
+                db = db_handler
+            else:
+                db = db_handler.clone( )  # shares configuration and caches
+            if snapshot:
+                from miRNexpander.DatabaseTools.GraphSnapshot import SnapshotHandler
+                db = SnapshotHandler( db, snapshot )
+            self._workers.put( _Worker( db ) )
+        self._size = n
+
+
+    def serve( self, host = "localhost", port = 8765 ):
+        """answer requests until interrupted"""
+
+        server = _ServiceServer( ( host, port ), _RequestHandler )
+        server.service = self
+        self._spill( "Serving {} on http://{}:{:d}/ with {:d} worker(s)." . format( ", " . join( self.methods ), host, port, self._size ) )
+        try:
+            server.serve_forever( )
+        except KeyboardInterrupt:
+            self._spill( "Shutting down." )
+        finally:
+            server.server_close( )
+
+
+    def call( self, method, params ):
+        """run method with a dictionary of parameters on the next free worker and return its (JSON-compatible) result"""
+
+        if method not in self.methods:
+            raise ServiceError( "Unknown method {!r}, expected one of: {}." . format( method, ", " . join( self.methods ) ) )
+        if type( params ) != dict:
+            raise ServiceError( "Parameters must be given as a JSON object." )
+
+        worker = self._workers.get( )
+        try:
+            worker.requests += 1
+            return getattr( self, "_" + method )( worker, params )
+        finally:
+            self._workers.put( worker )
+
+
+    ############################################################
+    #### methods                                            ####
+    ############################################################
+
+    def _restrict_species( self, worker, params ):
+        """apply (or lift) the species restriction of a request"""
+
+        if type( worker.db.setAllowedSpecies( params.get( "species" ) ) ) == int:
+            raise ServiceError( "Failed to set species restriction {!r}." . format( params.get( "species" ) ) )
+
+
+    def _status( self, worker, params ):
+        """report uptime and cache usage"""
+
+        return dict( uptime = time.time( ) - self._started, workers = self._size, alias_cache = worker.db.getAliasCacheStats( ), connections = worker.db.getPoolStats( ) )
+
+
+    def _unalias( self, worker, params ):
+        """params: aliases, species (optional); returns { reference : aliases }"""
+
+        if not params.get( "aliases" ):
+            raise ServiceError( "No aliases given." )
+        self._restrict_species( worker, params )
+        res = worker.nc.unalias( params[ "aliases" ], silent = params.get( "silent", True ) )
+        if type( res ) == int:
+            raise ServiceError( "Alias resolution failed with code {:d}." . format( res ) )
+        return res
+
+
+    def _annotate( self, worker, params ):
+        """params: aliases and/or ids, species (optional); returns { "annotations" : { reference : annotation }, "aliases" : { reference : aliases } }"""
+
+        self._restrict_species( worker, params )
+        aliases = { }
+        if params.get( "aliases" ):
+            aliases = worker.nc.unalias( params[ "aliases" ] )
+            if type( aliases ) == int:
+                raise ServiceError( "Alias resolution failed with code {:d}." . format( aliases ) )
+        res = worker.nc.annotate( {  "ids" : aliases.keys( ) + list( params.get( "ids", [ ] ) )  }, silent = params.get( "silent", True ) )
+        return dict( annotations = res, aliases = aliases )
+
+
+    def _createNetwork( self, worker, params ):
+        """params: seeds, name, depth, species, filter (gene symbols), budget (see NetworkCreator.createNetwork), targets (connect the seeds to these instead of expanding whole shells, see NetworkCreator.connectSeeds), write (names of NetworkCreator.write* methods), graph (whether to return the graph)"""
+
+        if not params.get( "seeds" ):
+            raise ServiceError( "No seeds given." )
+        start = time.time( )
+        nc = worker.nc
+        self._restrict_species( worker, params )
+        ids = nc.unalias( params[ "seeds" ] )
+        if not ids:
+            raise ServiceError( "No database entries for specified seeds list." )
+        nc.setName( str( params.get( "name" ) or "miRNA_centered_network" ) )  # JSON strings arrive as unicode
+        gfilter = set( params[ "filter" ] ) if params.get( "filter" ) else None
+        if params.get( "targets" ):
+            targets = nc.unalias( params[ "targets" ] )
+            if not targets:
+                raise ServiceError( "No database entries for specified targets list." )
+            if nc.connectSeeds( set( [  ( ref, "unknown" ) for ref in ids  ] ), set( [  ( ref, "unknown" ) for ref in targets  ] ), int( params.get( "depth", 1 ) ),
+                                gfilter = gfilter, budget = params.get( "budget" ) ) != True:
+                raise ServiceError( "No connection found between seeds and targets." )
+        elif nc.createNetwork( set( [  ( ref, "unknown" ) for ref in ids  ] ), int( params.get( "depth", 1 ) ), gfilter = gfilter, budget = params.get( "budget" ) ) != True:
+            raise ServiceError( "Network creation failed." )
+        for f in params.get( "write", [ ] ):
+            if f not in ( "SBML", "XGMML", "GML", "CSV" ):
+                raise ServiceError( "Unknown output format {!r}." . format( f ) )
+            getattr( nc, "write" + f )( params.get( "path" ) )
+
+        graph = nc.getGraph( )
+        result = dict( name = nc.Name, nodes = graph.number_of_nodes( ), edges = graph.number_of_edges( ), seconds = time.time( ) - start )
+        if params.get( "graph" ):
+            result[ "graph" ] = json_graph.node_link_data( graph )
+        return result
+
+
+    def _createExcel( self, worker, params ):
+        """params: files (interaction seed lists readable by the server), tdir, genefilter (gene symbols), species, merge_cells"""
+
+        if not params.get( "files" ) or not params.get( "tdir" ):
+            raise ServiceError( "Both 'files' and 'tdir' are required." )
+        if worker.il == None:
+            from miRNexpander.NetworkTools.InteractionLister import InteractionLister  # openpyxl is only needed here
+            worker.il = InteractionLister( worker.db )
+        self._restrict_species( worker, params )
+        intseeds = worker.il.readIntseeds( params[ "files" ] )
+        if not intseeds:
+            raise ServiceError( "Unable to read interaction seeds from {}." . format( ", " . join( params[ "files" ] ) ) )
+        gf = set( params[ "genefilter" ] ) if params.get( "genefilter" ) else None
+        worker.il.createExcel( *intseeds, tdir = params[ "tdir" ], genefilter = gf, merge_cells = params.get( "merge_cells", False ) )
+        return dict( tdir = params[ "tdir" ] )
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# thin client for NetworkService; it deliberately imports nothing but the standard library, so it starts fast
+
+from __future__ import print_function
+
+import json
+import urllib2
+
+
+class ServiceError( Exception ):
+    """error reported by (or while contacting) the network service"""
+    pass
+
+
+class ServiceClient( object ):
+    """call the methods of a running NetworkService"""
+
+    def __init__( self, url = "http://localhost:8765", timeout = None ):
+        self._url = url.rstrip( "/" )
+        if "://" not in self._url:
+            self._url = "http://" + self._url
+        self._timeout = timeout
+
+
+    def call( self, method, **params ):
+        """POST params to the service method and return its result"""
+
+        request = urllib2.Request( "{}/{}" . format( self._url, method ), json.dumps( params ), { "Content-Type" : "application/json" } )
+        try:
+            stream = urllib2.urlopen( request, timeout = self._timeout )
+        except urllib2.HTTPError as e:  # the service answers errors with a JSON message as well
+            try:
+                message = json.load( e )[ "error" ]
+            except ( ValueError, KeyError ):
+                message = str( e )
+            raise ServiceError( message )
+        except urllib2.URLError as e:
+            raise ServiceError( "Unable to reach network service at {}: {}" . format( self._url, e.reason ) )
+        try:
+            return json.load( stream )[ "result" ]
+        finally:
+            stream.close( )
+
+
+    def createNetwork( self, seeds, name = None, depth = 1, species = None, gfilter = None, write = ( ), graph = False, budget = None, targets = None ):
+        """build a network on the server (or the connections of the seeds to targets); returns name, node and edge counts, build time (and the node-link graph if requested)"""
+        return self.call( "createNetwork", seeds = list( seeds ), name = name, depth = depth, species = species,
+                          filter = list( gfilter ) if gfilter else None, write = list( write ), graph = graph, budget = budget,
+                          targets = list( targets ) if targets else None )
+
+
+    def unalias( self, aliases, species = None ):
+        """return { reference : aliases } (references are strings, as in all JSON object keys)"""
+        return self.call( "unalias", aliases = list( aliases ), species = species )
+
+
+    def annotate( self, aliases = ( ), ids = ( ), species = None ):
+        """return { "annotations" : { reference : annotation }, "aliases" : { reference : aliases } }"""
+        return self.call( "annotate", aliases = list( aliases ), ids = list( ids ), species = species )
+
+
+    def createExcel( self, files, tdir, genefilter = None, species = None, merge_cells = False ):
+        """write interaction lists on the server"""
+        return self.call( "createExcel", files = list( files ), tdir = tdir, genefilter = list( genefilter ) if genefilter else None,
+                          species = species, merge_cells = merge_cells )
+
+
+    def status( self ):
+        """return uptime and cache usage of the service"""
+        return self.call( "status" )
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+# this module collects timings of the hot paths of a run (database queries, query methods, network shells, writers), see miRwb.py --profile
+
+from __future__ import print_function
+
+import sys, time
+import re
+import json
+import atexit
+import threading
+from functools import wraps
+
+enabled = False  # checked by the instrumented code, so that nothing is recorded (or slowed down) unless install( ) was called
+_started = None
+_sections = { }  # section -> { name -> [ calls, seconds, rows (None if the calls do not return rows) ] }
+_lock = threading.Lock( )  # NetworkService answers requests in threads
+_cprofile = None  # cProfile.Profile of the whole run, if requested
+_literals = re.compile( r"\( [^()]* \)" )  # IN ( ... ) and VALUES ( ... ) lists, whose length varies from call to call
+_spaces = re.compile( r"\s+" )
+
+
+def install( path = None ):
+    """start recording, and write the report as JSON to path (STDERR if empty or None) when the interpreter exits"""
+
+    global enabled, _started
+    if enabled:
+        return
+    enabled = True
+    _started = time.time( )
+    atexit.register( write, path )
+
+
+def install_cprofile( path ):
+    """profile the whole run with cProfile and dump the statistics to path when the interpreter exits (read them with pstats)"""
+
+    global _cprofile
+    if _cprofile != None:
+        return
+    import cProfile  # only needed here
+    _cprofile = cProfile.Profile( )
+    _cprofile.enable( )
+    atexit.register( _dump_cprofile, path )
+
+
+def record( section, name, seconds, rows = None ):
+    """add one call (and the number of rows it returned, if any) to the totals of name in section"""
+
+    with _lock:
+        try:
+            entry = _sections[ section ][ name ]
+        except KeyError:
+            entry = _sections.setdefault( section, { } ).setdefault( name, [ 0, 0.0, None ] )
+        entry[ 0 ] += 1
+        entry[ 1 ] += seconds
+        if rows != None:
+            entry[ 2 ] = ( entry[ 2 ] or 0 ) + rows
+
+
+def timed( section, name = None ):
+    """decorator that records the calls of a function or method in section (under its own name, unless name is given)"""
+
+    def decorate( function ):
+        key = name or function.__name__
+
+        @wraps( function )
+        def wrapper( *args, **kwargs ):
+            if not enabled:
+                return function( *args, **kwargs )
+            start = time.time( )
+            try:
+                return function( *args, **kwargs )
+            finally:
+                record( section, key, time.time( ) - start )
+
+        return wrapper
+
+    return decorate
+
+
+def timed_rows( section, name, rows ):
+    """yield the rows of an iterable and record the time spent producing them, without the time the consumer spends between rows"""
+
+    elapsed = 0.0
+    count = 0
+    start = time.time( )
+    try:
+        for r in rows:
+            elapsed += time.time( ) - start
+            count += 1
+            yield r
+            start = time.time( )
+        elapsed += time.time( ) - start
+    finally:
+        record( section, name, elapsed, count )
+
+
+def label( statement ):
+    """return a short form of an SQL statement under which calls with different values are aggregated"""
+
+    return _literals.sub( "( ... )", _spaces.sub( " ", statement ).strip( ) )[ :160 ]
+
+
+def report( ):
+    """return the collected timings as a dictionary (entries of each section sorted by time, slowest first)"""
+
+    with _lock:
+        sections = dict( [  ( section, sorted( [  dict( name = name, calls = e[ 0 ], seconds = round( e[ 1 ], 4 ), rows = e[ 2 ] ) for name, e in entries.iteritems( )  ], key = lambda e: -e[ "seconds" ] ) )
+                for section, entries in _sections.iteritems( )  ] )
+    return dict( wall_seconds = round( time.time( ) - _started, 4 ) if _started else None, sections = sections )
+
+
+def write( path = None ):
+    """write the report as JSON to path (STDERR if empty or None)"""
+
+    if path:
+        with open( path, "w" ) as stream:
+            json.dump( report( ), stream, indent = 1, sort_keys = True, separators = ( ",", ": " ) )
+    else:
+        json.dump( report( ), sys.stderr, indent = 1, sort_keys = True, separators = ( ",", ": " ) )
+        print( file = sys.stderr )
+
+
+def _dump_cprofile( path ):
+    """stop cProfile and write its statistics"""
+
+    _cprofile.disable( )
+    _cprofile.dump_stats( path )
+    print( "cProfile statistics written to {} (e.g. python -m pstats {})." . format( path, path ), file = sys.stderr )
@@ -3,8 +3,8 @@
 from __future__ import print_function
 #from libsbml import SBMLDocument, SBMLWriter, LIBSBML_OPERATION_SUCCESS
 from miRNexpander.mWBBase import mWBBaseClass
+from miRNexpander import RunProfile
 import networkx as nx
-import matplotlib.pyplot as plt
 #import SBOTerms
 import os, sys
 import time
@@ -92,6 +92,7 @@ class NetworkWriter( mWBBaseClass ):
         return "{}_{}" . format( molType.upper( ), re.sub( self._id_replace, "_", molName ) )
 
 
+    @RunProfile.timed( "writers" )
     def saveImage( self, nrepr = "spring", ft = "png", filename = "", graph = None ):
         """store an image representation of the network"""
 
@@ -117,11 +118,13 @@ class NetworkWriter( mWBBaseClass ):
         else:
             pos = nx.spring_layout( graph )
 
+        import matplotlib.pyplot as plt  # slow to import and only needed here
         plt.figure( figsize = ( 8, 8 ) )
         nx.draw( graph, pos )
         plt.savefig( filename )
 
 
+    @RunProfile.timed( "writers" )
     def createSBML( self, filename = "" ):
         """store a network representation in SBML format"""
 
@@ -192,6 +195,7 @@ class NetworkWriter( mWBBaseClass ):
             self._extalert( "Cannot write SBML to file {!r}." . format( filename ) )
 
 
+    @RunProfile.timed( "writers" )
     def createCytoscape( self, filename = "" ):
         """store a network representation in Cytoscape-readable format"""
 
@@ -230,6 +234,7 @@ class NetworkWriter( mWBBaseClass ):
         self._spill( "Finished writing Cytoscape file {!r}." . format( filename ) )
 
 
+    @RunProfile.timed( "writers" )
     def createGML( self, filename = "", graph = None, gml_dict = None ):
         """store a network representation in GML format"""
 
@@ -294,6 +299,7 @@ class NetworkWriter( mWBBaseClass ):
         self._spill( "Finished writing GML file {!r}." . format( filename ) )
 
 
+    @RunProfile.timed( "writers" )
     def createXGMML( self, filename = "", xgmml_dict = None ):
         """store a network representation in XGMML format"""
 
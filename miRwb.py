@@ -2,10 +2,8 @@
 
 from __future__ import print_function
 
-from miRNexpander.DatabaseTools.DatabaseHandler import DatabaseHandler as DH
-from miRNexpander.NetworkTools.NetworkCreator import NetworkCreator as NC
-from miRNexpander.NetworkTools.CellDesignerIO import CellDesignerIO as CD
-from miRNexpander.NetworkTools.InteractionLister import InteractionLister as IL
+# The miRNexpander modules pull in heavy dependencies (networkx, numpy, openpyxl, MySQLdb), so
+# they are imported only where a subcommand needs them, which keeps e.g. -a and --remote fast.
 import argparse
 import ConfigParser
 import sys, os
@@ -22,10 +20,21 @@ clp = argparse.ArgumentParser( description = "high-level cli to miRNexpander; pr
 
 clp.add_argument( '-v', '--version', action = "version", version = "%(prog)s 1.1 (July 2014)" )
 clp.add_argument( '-c', '--config', metavar = "CONFIG_FILE", help = "read configuration from this file", default = "setup.cfg" )
+clp.add_argument( '--import-profile', action = "store_true", help = "report how long the module imports took (on exit)" )
+clp.add_argument( '--profile', metavar = "FILE", nargs = "?", const = "", help = "time the database queries, query methods, network shells and writers, and write a JSON report to FILE (STDERR if no FILE is given) on exit" )
+clp.add_argument( '--cprofile', metavar = "FILE", help = "profile the whole run with cProfile and write the statistics to FILE (read them with python -m pstats FILE)" )
 
 clp.add_argument( '-u', '--update', metavar = "DB", help = "try to update the local database; update all if no DB is specified", nargs = '*' )
 clp.add_argument( '-w', '--write', metavar = "TARGET", help = "write updated sql statements to these files; write to standard locations if TARGET is empty", nargs = '*' )
 clp.add_argument( '-r', '--read', metavar = "SOURCE_LIST", help = "read data from these files; one SOURCE_LIST per database, files must be separated with commas (,)", nargs = '+' )
+clp.add_argument( '-F', '--force', action = "store_true", help = "with -u, reload tables completely even if their database files are unchanged" )
+clp.add_argument( '--migrate', action = "store_true", help = "add the lower-cased alias column and the covering indexes of the query paths to an existing database" )
+clp.add_argument( '--explain', action = "store_true", help = "check with EXPLAIN which indexes the alias and interaction queries use" )
+clp.add_argument( '--export-sqlite', metavar = "FILE", help = "copy all tables of the MySQL database into the SQLite database FILE (see the backend option in the [database] section)" )
+clp.add_argument( '--export-alias-index', metavar = "DIR", nargs = "?", const = "", help = "write the memory-mapped alias index to DIR (default: alias_index in the [database] section; requires numpy)" )
+clp.add_argument( '--export-neighbourhood-index', metavar = "DIR", nargs = "?", const = "", help = "write the compressed neighbourhood index of the interaction tables to DIR (default: neighbourhood_index in the [database] section; requires numpy)" )
+clp.add_argument( '--export-snapshot', metavar = "DIR", help = "write a graph snapshot of all queryable interaction tables to DIR (requires numpy)" )
+clp.add_argument( '--snapshot', metavar = "DIR", help = "build networks from the graph snapshot in DIR instead of querying the interaction tables" )
 
 clpg2 = clp.add_mutually_exclusive_group( )
 clpg2.add_argument( '-a', '--alias', metavar = "MOL_ID | FILE", help = "print the reference ID(s) of the input MOL_ID(s)", nargs = '+' )
@@ -43,9 +52,21 @@ clp.add_argument( '-m', '--mirnas', metavar = "MIRNA_ID", help = "use these miRN
 #clp.add_argument( '-M', '--mirna-files', metavar = "FILE", help = "read miRNA seeds from these files", nargs = '+' )
 clp.add_argument( '-n', '--name', metavar = "NETWORK_NAME", help = "use this name for the network (in filenames, e.g.)" )
 clp.add_argument( '-d', '--depth', metavar = "DEPTH", help = "expand the network up to surrounding shell DEPTH", type = int, default = 1 )
+clp.add_argument( '--max-nodes', metavar = "N", help = "stop expanding the network once it has N nodes", type = int )
+clp.add_argument( '--max-edges', metavar = "N", help = "stop expanding the network once it has N edges", type = int )
+clp.add_argument( '--shell-nodes', metavar = "N", help = "add at most N new nodes per shell (those with the most interactions into the network first)", type = int )
+clp.add_argument( '--shell-edges', metavar = "N", help = "add at most N new edges per shell", type = int )
+clp.add_argument( '--max-degree', metavar = "N", help = "do not expand nodes (other than seeds) with more than N interactions in their shell", type = int )
+clp.add_argument( '--no-cache', help = "build the network even if the build cache holds it, and do not store it there (see build_cache in the [database] section)", action = "store_true" )
+clp.add_argument( '--connect', metavar = "MOL_ID", help = "instead of whole shells, build the shortest connections of at most DEPTH interactions between the seeds and these molecules", nargs = '+' )
 clp.add_argument( '-s', '--species', metavar = "SPECIES", help = "restrict the network components to the specified species", nargs = '+' )
 
 clp.add_argument( '-f', '--files', metavar = "FILE", help = "load seeds from these files and build a network", nargs = '+' )
+clp.add_argument( '--batch', metavar = "MANIFEST", help = "build all networks listed in MANIFEST (tab-separated: name, seeds, depth, species, filter files) in a process pool" )
+
+clpg4 = clp.add_mutually_exclusive_group( )
+clpg4.add_argument( '--serve', metavar = "[HOST:]PORT", help = "keep the database connection open and answer build, alias, annotation and list requests over HTTP (localhost by default)" )
+clpg4.add_argument( '--remote', metavar = "URL", help = "send -b/-m/-f, -a/-A and -l requests to a service started with --serve instead of connecting to the database" )
 clp.add_argument( '-g', '--filter', metavar = "FILE", help = "filter with gene Symbols from FILE", nargs = '+' )
 #clpg3 = clp.add_mutually_exclusive_group( )
 #clpg3.add_argument( '-i', '--include', metavar = "DB", help = "build only with the specified databases", default = "all" )
@@ -59,6 +80,73 @@ il = None
 # parse parameters and react accordingly
 parameters = clp.parse_args( )
 
+if parameters.import_profile:
+    from miRNexpander import ImportProfile
+    ImportProfile.install( )
+if parameters.profile != None:
+    from miRNexpander import RunProfile
+    RunProfile.install( parameters.profile )
+if parameters.cprofile:
+    from miRNexpander import RunProfile
+    RunProfile.install_cprofile( parameters.cprofile )
+
+
+# expansion budget of -b/-m/-f (unset limits are left out by NetworkCreator)
+budget = dict( nodes = parameters.max_nodes, edges = parameters.max_edges, shell_nodes = parameters.shell_nodes, shell_edges = parameters.shell_edges, max_degree = parameters.max_degree )
+
+# internal subroutine
+def _print_annotations( annotations, ids ):
+    """print the symbols (-a) or the aliases, symbols and descriptions (-A) of { reference : annotation }, ordered by reference
+    - ids: { reference : aliases } as returned by unalias
+"""
+
+    if not annotations:
+        print( "No valid reference IDs found.",  file = sys.stderr )
+    for ref in sorted( annotations, key = int ):  # references are strings when they come from the service (JSON object keys)
+        if parameters.alias:
+            print( annotations[ ref ][ "symbol" ] )
+        else:
+            print( "\t" . join( [  ids.get( ref, "" ), annotations[ ref ][ "symbol" ], annotations[ ref ][ "description" ] or ""  ] ) )
+
+
+### REMOTE (--remote)
+
+if parameters.remote:
+    from miRNexpander.NetworkTools.ServiceClient import ServiceClient, ServiceError
+    client = ServiceClient( parameters.remote )
+
+    # internal subroutine
+    def _read_list( items ):
+        """return the first column of the given files, or the comma-separated items of arguments that are not readable files"""
+
+        result = set( )
+        for f in items or [ ]:
+            try:
+                stream = open( f )
+            except IOError:
+                result |= {  e for e in f.split( "," ) if e  }
+            else:
+                result |= {  l.strip( ).split( "\t" )[ 0 ] for l in stream if l.strip( )  }
+                stream.close( )
+        return result
+
+    try:
+        if parameters.alias or parameters.annotate:
+            res = client.annotate( aliases = _read_list( parameters.alias or parameters.annotate ), species = parameters.species )
+            _print_annotations( res[ "annotations" ], res[ "aliases" ] )
+        if parameters.flist:
+            client.createExcel( parameters.flist, "/media/sf_VM_Backup/Pia_validation", genefilter = _read_list( parameters.filter ), species = parameters.species )
+        if parameters.build != None or parameters.mirnas != None or parameters.files != None:
+            seed_list = sorted( set( ( parameters.build or [ ] ) + ( parameters.mirnas or [ ] ) ) | _read_list( parameters.files ) )
+            name = parameters.name or ( seed_list[ 0 ] if len( seed_list ) == 1 else "miRNA_centered_network" )
+            res = client.createNetwork( seed_list, name, parameters.depth, parameters.species, _read_list( parameters.filter ), write = [ "SBML", "XGMML", "GML" ],
+                                        budget = budget, targets = parameters.connect )
+            print( "Built {} ({:d} nodes, {:d} edges) in {:.1f} s." . format( res[ "name" ], res[ "nodes" ], res[ "edges" ], res[ "seconds" ] ), file = sys.stderr )
+    except ServiceError as e:
+        sys.stderr.write( "Fatal: {}\n" . format( e ) )
+        sys.exit( 1 )
+    sys.exit( 0 )
+
 # initialize configuration parser
 conf = ConfigParser.ConfigParser( )
 try:
@@ -67,10 +155,11 @@ except IOError:
     sys.stderr.write( "Fatal: Could not read configuration file {!r}, quitting.\n" . format( parameters.config ) )
     sys.exit( 1 )
 
+from miRNexpander.DatabaseTools.DatabaseHandler import DatabaseHandler as DH
 dh = DH( )
 conn_error = dh.connect( conf )
 if conn_error:
-    sys.stderr.write( "Fatal: There's something wrong with the database connection: Error {:d}: {}\n" . format( conn_error.args[ 0 ], conn_error.args[ 1 ] ) )
+    sys.stderr.write( "Fatal: There's something wrong with the database connection: Error {}\n" . format( conn_error ) )
     sys.exit( 1 )
 
 
@@ -87,11 +176,78 @@ elif parameters.update:
 
 if parameters.update:
     if parameters.write == [ ]:
-        dh.update_db( parameters.update, True, parameters.read )
+        dh.update_db( parameters.update, True, parameters.read, force = parameters.force )
     elif parameters.write:
-        dh.update_db( parameters.update, parameters.write, parameters.read, type( parameters.update ) == list )
+        dh.update_db( parameters.update, parameters.write, parameters.read, type( parameters.update ) == list, force = parameters.force )
     else:
-        dh.update_db( parameters.update, source_list = parameters.read )
+        dh.update_db( parameters.update, source_list = parameters.read, force = parameters.force )
+
+
+### SCHEMA (--migrate/--explain)
+
+if parameters.migrate or parameters.explain:
+    from miRNexpander.DatabaseTools.SchemaMigrator import SchemaMigrator
+    sm = SchemaMigrator( dh )
+    if parameters.migrate and sm.migrate( ):
+        sys.stderr.write( "Fatal: Schema migration incomplete.\n" )
+        sys.exit( 1 )
+    if parameters.explain:
+        sm.explain( )
+
+
+### EXPORT (--export-sqlite)
+
+if parameters.export_sqlite:
+    from miRNexpander.DatabaseTools.SQLiteExporter import SQLiteExporter
+    if SQLiteExporter( dh ).export( parameters.export_sqlite ):
+        sys.stderr.write( "Fatal: Export to {} incomplete.\n" . format( parameters.export_sqlite ) )
+        sys.exit( 1 )
+
+
+### ALIAS INDEX (--export-alias-index)
+
+if parameters.export_alias_index != None and not dh.writeAliasIndex( parameters.export_alias_index or None ):
+    sys.stderr.write( "Fatal: No alias index written.\n" )
+    sys.exit( 1 )
+
+
+### NEIGHBOURHOOD INDEX (--export-neighbourhood-index)
+
+if parameters.export_neighbourhood_index != None and not dh.writeNeighbourhoodIndex( parameters.export_neighbourhood_index or None ):
+    sys.stderr.write( "Fatal: No neighbourhood index written.\n" )
+    sys.exit( 1 )
+
+
+### SNAPSHOT (--export-snapshot/--snapshot)
+
+qh = dh  # handler that answers the queries for network building
+if parameters.export_snapshot:
+    from miRNexpander.DatabaseTools.GraphSnapshot import GraphSnapshot
+    GraphSnapshot.export( dh, parameters.export_snapshot )
+if parameters.snapshot:
+    from miRNexpander.DatabaseTools.GraphSnapshot import SnapshotHandler
+    try:
+        qh = SnapshotHandler( dh, parameters.snapshot )
+    except IOError as e:
+        sys.stderr.write( "Fatal: {}\n" . format( e ) )
+        sys.exit( 1 )
+
+
+### SERVE (--serve)
+
+if parameters.serve:
+    from miRNexpander.NetworkTools.NetworkService import NetworkService
+    from miRNexpander.NetworkTools.ServiceClient import ServiceError
+    host, sep, port = parameters.serve.rpartition( ":" )
+    try:
+        NetworkService( dh, snapshot = parameters.snapshot ).serve( host or "localhost", int( port ) )
+    except ValueError:
+        sys.stderr.write( "Fatal: Invalid port {!r}.\n" . format( port ) )
+        sys.exit( 1 )
+    except ServiceError as e:
+        sys.stderr.write( "Fatal: {}\n" . format( e ) )
+        sys.exit( 1 )
+    sys.exit( 0 )
 
 
 ### ALIAS (-a) / Annotate (-A)
@@ -116,28 +272,23 @@ if al_in:
             alias |= {  e for e in f.split( "," )  }
 
 if alias:
-    if not nc:
-        nc = NC( dh )
-    nc.set_species_restriction( parameters.species )
-    ids = nc.unalias( alias, False )
-    res = nc.annotate( {  "ids" : ids.keys( )  }, silent = False )
+    from miRNexpander.NetworkTools.AliasResolver import AliasResolver as AR
+    ar = AR( qh )
+    if parameters.species:
+        ar.setSpeciesRestriction( parameters.species )
+    ids = ar.unalias( alias, False )
+    res = ar.annotate( {  "ids" : ids.keys( )  }, silent = False )
 
     if type( res ) == int:
         print( "An error occurred.", file = sys.stderr )
         sys.exit( res )
 
-    if not res:
-        print( "No valid reference IDs found.",  file = sys.stderr )
-    if parameters.alias:
-        for ref, alias in res.iteritems( ):
-            print( alias[ "symbol" ] )
-    else:
-        for ref, alias in res.iteritems( ):
-            print( "\t" . join( [  ids[ ref ]  ] + [  alias[ k ] for k in "symbol", "description"  ] ) )
+    _print_annotations( res, ids )
 
 
 ###  FLIST (-l)
 if parameters.flist:
+    from miRNexpander.NetworkTools.InteractionLister import InteractionLister as IL
     if not il:
         il = IL( dh )
     #print( il._db.getConfItem( "interdefs" ) )
@@ -202,8 +353,9 @@ if ( parameters.build != None
 #if parameters.build:
     #print( "Building network\n\tup to shell {}\n\tfor {}\n\nPlease wait..." . format( parameters.depth, ", " . join( seeds ) ) )
     #print( "Building network\n\tup to shell {}\nPlease wait..." . format( parameters.depth ) )
+    from miRNexpander.NetworkTools.NetworkCreator import NetworkCreator as NC
     if not nc:
-        nc = NC( dh )
+        nc = NC( qh )
     if not parameters.name:
         if len( seed_list ) == 1:
             parameters.name = seed_list[ 0 ]
@@ -212,20 +364,43 @@ if ( parameters.build != None
         else:
             parameters.name = "miRNA_centered_network"
     nc.setName( parameters.name )
-    nc.set_species_restriction( parameters.species )
+    nc.setSpeciesRestriction( parameters.species )
 #    seeds = {  "unknown" : parameters.build  }
-    nc._spill( "Building network\n\tup to shell {}\n\tfor {}\n\nPlease wait..." . format( parameters.depth, ", " . join( seed_list ) ) )
-    if nc.createNetwork( seeds, parameters.depth ) == True:
-        nc.writeSBML( )
-        nc.writeXGMML( )
-        nc.writeGML( )
-        #nc.snapshot( "png" )
-        #nc.writeCytoscape( )
+    if parameters.connect:
+        nc._spill( "Connecting\n\t{}\n\tto {}\n\twith at most {} interaction(s)\n\nPlease wait..." . format( ", " . join( seed_list ), ", " . join( parameters.connect ), parameters.depth ) )
+        sources = nc.unalias( seed_list )
+        targets = nc.unalias( parameters.connect )
+        if not sources or not targets:
+            print( "No database entries for specified seeds list." )
+        elif nc.connectSeeds( set( [  ( ref, "unknown" ) for ref in sources  ] ), set( [  ( ref, "unknown" ) for ref in targets  ] ), parameters.depth, budget = budget ) == True:
+            nc.writeSBML( )
+            nc.writeXGMML( )
+            nc.writeGML( )
+        else:
+            print( "No connection found between the seeds and {}." . format( ", " . join( parameters.connect ) ) )
     else:
-        print( "No database entries for specified seeds list." )
+        nc._spill( "Building network\n\tup to shell {}\n\tfor {}\n\nPlease wait..." . format( parameters.depth, ", " . join( seed_list ) ) )
+        if nc.createNetwork( seeds, parameters.depth, budget = budget, cache = not parameters.no_cache ) == True:
+            nc.writeSBML( )
+            nc.writeXGMML( )
+            nc.writeGML( )
+            #nc.snapshot( "png" )
+            #nc.writeCytoscape( )
+        else:
+            print( "No database entries for specified seeds list." )
 #else:
 #    print( "No network seeds specified, not building." )
 
+### BATCH (--batch)
+
+if parameters.batch:
+    from miRNexpander.NetworkTools.BatchBuilder import BatchBuilder
+    bb = BatchBuilder( dh, snapshot = parameters.snapshot )
+    jobs = bb.readManifest( parameters.batch )
+    if jobs == None:
+        sys.exit( 1 )
+    bb.writeSummary( bb.build( jobs ), os.path.join( dh.getConfItem( "output_path" ), "batch_summary.tsv" ) )
+
 ### CELLDESIGNER (-p)
 if parameters.celldesigner:
     if parameters.filter:
@@ -238,6 +413,7 @@ if parameters.celldesigner:
     else:
         gf = None
 
+    from miRNexpander.NetworkTools.CellDesignerIO import CellDesignerIO as CD
     f = parameters.celldesigner
     cd = CD( dh )
     cd._spill( "Will try to convert CellDesigner to GML, please be patient.\n\t-> Parsing {}..." . format( f ) )
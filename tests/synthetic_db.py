@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+# this module sets up a synthetic SQLite database for the tests and the benchmarks, so that they run without MySQL and without the real database files
+
+from __future__ import print_function
+
+import os, sys
+import random
+import ConfigParser
+
+root = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+if root not in sys.path:
+    sys.path.insert( 0, root )
+
+from miRNexpander.DatabaseTools.DatabaseHandler import DatabaseHandler
+
+template = os.path.join( root, "setup.cfg.template" )
+species = 9606
+namespaces = ( "ncbigene", "omim", "hgnc.symbol", "ensembl", "ncbigi", "uniprot", "refseq", "mirbase", "mirbase.mature", "drugbank", "cas", "kegg.compound",
+               "kegg.drug", "pubchem.compound", "pubchem.substance", "chebi", "pharmgkb.drug", "transfac" )  # MIRIAM namespaces the gene annotation reader needs
+
+
+def write_config( path, sqlite_file, source = template ):
+    """write a configuration for the SQLite database sqlite_file to path, based on the configuration file source, and return it
+    - the alias index, neighbourhood index and build cache are disabled, so that every query goes to the database
+"""
+
+    conf = ConfigParser.ConfigParser( )
+    conf.readfp( open( source ) )
+    if not conf.has_section( "miRNexpander" ):  # the template still names the section after the former project name
+        conf.add_section( "miRNexpander" )
+        for k, v in conf.items( "miRNAworkbench", raw = True ):
+            conf.set( "miRNexpander", k, v )
+    for k, v in ( "backend", "sqlite" ), ( "sqlite_file", sqlite_file ), ( "alias_index", "" ), ( "neighbourhood_index", "" ), ( "build_cache", "" ):
+        conf.set( "database", k, v )
+    stream = open( path, "w" )
+    conf.write( stream )
+    stream.close( )
+    return conf
+
+
+def create_database( conf, genes = 20000, mirnas = 1000, seed = 1 ):
+    """fill the (new) SQLite database of the configuration and return a connected DatabaseHandler
+    - genes, mirnas: numbers of actors (named GENE<n> and MIR<n>, numbered from 1 and from genes + 1), plus a complex and a homodimer
+    - seed: seed of the random interactions, whose partners are drawn with a skewed degree distribution (a few hubs)
+
+    The interaction tables hold 30 miRTarBase targets per miRNA and 3 HPRD and 1 HTRIdb
+    interactions per gene.
+"""
+
+    dh = DatabaseHandler( )
+    if dh.connect( conf ):
+        raise IOError( "Could not connect to {!r}." . format( conf.get( "database", "sqlite_file" ) ) )
+    if dh._sql( "SELECT `name` FROM `sqlite_master` WHERE `name` = 'Actors'" ):
+        return dh  # filled before
+    for statement in dh._backend.ddl( open( os.path.join( root, "database_schema.sql" ) ).read( ) ):
+        dh._sql( statement )
+
+    rng = random.Random( seed )
+    hub = lambda: int( genes * rng.random( ) ** 3 ) + 1
+    complex_id, dimer_id = genes + mirnas + 1, genes + mirnas + 2
+    actors = [  ( species, i, "GENE{:d}" . format( i ), "gene {:d}" . format( i ) ) for i in xrange( 1, genes + 1 )  ]
+    actors += [  ( species, genes + i, "MIR{:d}" . format( i ), "mir {:d}" . format( i ) ) for i in xrange( 1, mirnas + 1 )  ]
+    actors += [ ( species, complex_id, "GENE1:GENE2", "complex" ), ( species, dimer_id, "GENE3:GENE3", "dimer" ) ]
+
+    dh._sql( "INSERT INTO `Taxa` VALUES ( 1, {:d}, 'human' )" . format( species ) )
+    dh._sql( "INSERT INTO `Taxon_aliases` VALUES ( {:d}, 'hsa' )" . format( species ) )
+    dh._sql( "INSERT INTO `Actor_xrefs` VALUES ( 1, 'x1', 'hgnc', 'hgnc.symbol', 'd', 'urn', 'url' )" )
+    dh._insert_batches( "Actors", iter( actors ) )
+    dh._insert_batches( "Actor_aliases", iter( [  ( a[ 1 ], a[ 2 ], 1 ) for a in actors  ] ) )
+    dh._insert_batches( "miRTarBase", iter( [  ( genes + m, hub( ), "1|2", "MIR{:d}" . format( m ), "g" ) for m in xrange( 1, mirnas + 1 ) for _ in xrange( 30 )  ] ) )
+    dh._insert_batches( "HPRD", iter( [  ( hub( ), hub( ), "3", "a", "b" ) for _ in xrange( 3 * genes )  ] + [ ( complex_id, 5, "4", "c", "d" ), ( 7, dimer_id, "5", "e", "f" ) ] ) )
+    dh._insert_batches( "HTRIdb", iter( [  ( hub( ), rng.randint( 1, genes ), "6", "a", "b" ) for _ in xrange( genes )  ] ) )
+    dh._commit_db( )
+    return dh
+
+
+def seeds( genes = 20000, mirnas = 1000 ):
+    """return the standard build seeds of a database made by create_database: three miRNAs, a gene, and the complex"""
+    return set( [  ( genes + i, "unknown" ) for i in ( 1, 2, 3 )  ] + [ ( 5, "unknown" ), ( genes + mirnas + 1, "unknown" ) ] )
+
+
+def prepare_update( dh, directory ):
+    """prepare update_db runs from input files below directory (the configured paths are relative to the working directory, so change into it)
+    - the actor tables are emptied and Actor_xrefs holds the MIRIAM namespaces that the gene annotation reader needs
+"""
+
+    for table in "Actors", "Actor_aliases", "Actor_xrefs", "Complexes":
+        dh._sql( "DELETE FROM `{}`" . format( table ) )
+    dh._insert_batches( "Actor_xrefs", iter( [  ( i, "MIR:{:08d}" . format( i ), n, n, "d", "urn", "url" ) for i, n in enumerate( namespaces, 1 )  ] ) )
+    dh._commit_db( )
+    for d in "NCBI", "HTRIdb":
+        path = os.path.join( directory, "data", "db_files", d )
+        if not os.path.isdir( path ):
+            os.makedirs( path )
+    if not os.path.isdir( os.path.join( directory, "data", "sql" ) ):
+        os.makedirs( os.path.join( directory, "data", "sql" ) )
+
+
+def write_gene_info( directory, genes ):
+    """write the NCBI gene_info input of update_db below directory: one human gene per Entrez id in genes, named G<id>"""
+
+    stream = open( os.path.join( directory, "data", "db_files", "NCBI", "gene_info.txt" ), "w" )
+    for g in genes:
+        stream.write( "{:d}\t{:d}\tG{:d}\t-\t-\t-\t-\t-\tgene {:d}\n" . format( species, g, g, g ) )
+    stream.close( )
+
+
+def write_htridb( directory, interactions ):
+    """write the HTRIdb input of update_db below directory: ( source, target ) pairs of Entrez ids"""
+
+    stream = open( os.path.join( directory, "data", "db_files", "HTRIdb", "HTRIdb_data.txt" ), "w" )
+    stream.write( "ID\tGENEID_TF\tSYMBOL_TF\tGENEID_TG\tSYMBOL_TG\tTECHNIQUE\tPUBMED_ID\n" )
+    for i, ( s, t ) in enumerate( interactions ):
+        stream.write( "{:d}\t{:d}\tG{:d}\t{:d}\tG{:d}\tChIP\t{:d}\n" . format( i, s, s, t, t, 1000 + i ) )
+    stream.close( )
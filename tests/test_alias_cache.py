@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+# tests of the alias resolution cache of query_for_references (run from the repository root: python -m unittest discover -s tests -t .)
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from tests import synthetic_db
+
+
+class AliasCacheTest( unittest.TestCase ):
+    """resolve aliases twice, with the alias table changed in between"""
+
+    def setUp( self ):
+        self.workdir = tempfile.mkdtemp( prefix = "alias_cache_" )
+        conf = synthetic_db.write_config( os.path.join( self.workdir, "test.cfg" ), os.path.join( self.workdir, "test.sqlite" ) )
+        self.dh = synthetic_db.create_database( conf, genes = 50, mirnas = 5 )
+        self.dh._alias_cache.clear( )
+
+
+    def tearDown( self ):
+        self.dh.close( )
+        shutil.rmtree( self.workdir, True )
+
+
+    def rename( self ):
+        """rename GENE5 to TP53 in the alias table, as an update would"""
+
+        self.dh._sql( "DELETE FROM `Actor_aliases` WHERE `Alias` = 'GENE5'" )
+        self.dh._insert_batches( "Actor_aliases", iter( [ ( 5, "TP53", 1 ) ] ) )
+        self.dh._commit_db( )
+
+
+    def test_cached( self ):
+        self.assertEqual( self.dh.query_for_references( [ "GENE5", "TP53" ] ), ( { 5 : "GENE5" }, set( [ "TP53" ] ), { } ) )
+        self.rename( )
+        self.assertEqual( self.dh.query_for_references( [ "GENE5", "TP53" ] ), ( { 5 : "GENE5" }, set( [ "TP53" ] ), { } ) )  # served from the cache
+        self.assertGreater( self.dh.getAliasCacheStats( )[ "hits" ], 0 )
+
+
+    def test_invalidated( self ):
+        self.dh.query_for_references( [ "GENE5", "TP53" ] )
+        self.rename( )
+        for table in "HPRD", "miRTarBase":  # tables that aliases do not depend on keep the cache
+            self.dh._invalidate_caches( table )
+            self.assertGreater( len( self.dh._alias_cache ), 0 )
+        self.dh._invalidate_caches( "actor_aliases" )  # as update_db does after rewriting the table
+        self.assertEqual( len( self.dh._alias_cache ), 0 )
+        self.assertEqual( self.dh.query_for_references( [ "GENE5", "TP53" ] ), ( { 5 : "TP53" }, set( [ "GENE5" ] ), { } ) )
+
+
+    def test_disabled( self ):
+        conf = synthetic_db.write_config( os.path.join( self.workdir, "test.cfg" ), os.path.join( self.workdir, "test.sqlite" ) )
+        conf.set( "database", "alias_cache_mb", "0" )
+        dh = synthetic_db.create_database( conf )
+        dh.query_for_references( [ "GENE5" ] )
+        self.rename( )
+        self.assertEqual( dh.query_for_references( [ "GENE5", "TP53" ] ), ( { 5 : "TP53" }, set( [ "GENE5" ] ), { } ) )
+        self.assertEqual( dh.getAliasCacheStats( ), None )
+        dh.close( )
+
+
+if __name__ == "__main__":
+    unittest.main( )
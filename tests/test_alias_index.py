@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+# tests of the alias index against the alias queries in the database (run from the repository root: python -m unittest discover -s tests -t .)
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from tests import synthetic_db
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+extra = [ ( 10, "H3", 1 ), ( 11, "h3", 1 ), ( 12, "p53", 1 ), ( 12, "P53", 1 ), ( 13, "Dup", 1 ), ( 14, "DUP", 1 ), ( 15, "GENE16", 1 ), ( 16, "ENSG16", 2 ) ]
+candidates = [ "GENE1", "gene2", "Gene3", "H3", "h3", "p53", "DUP", "gene16", "ensg16", "MIR4", "NOPE" ]
+
+
+def spellings( result ):
+    """return the triple of query_for_references with the spellings of each reference sorted, which the database returns in no particular order"""
+
+    identified, orphans, ambiguous = result
+    return ( dict( [  ( k, sorted( v.split( " " ) ) if type( v ) == str else v ) for k, v in identified.iteritems( )  ] ), orphans, ambiguous )
+
+
+@unittest.skipIf( numpy is None, "the alias index requires numpy" )
+class AliasIndexTest( unittest.TestCase ):
+    """resolve the same aliases with the alias index and in the database"""
+
+    @classmethod
+    def setUpClass( cls ):
+        cls.workdir = tempfile.mkdtemp( prefix = "alias_index_" )
+        conf = synthetic_db.write_config( os.path.join( cls.workdir, "test.cfg" ), os.path.join( cls.workdir, "test.sqlite" ) )
+        conf.set( "database", "alias_cache_mb", "0" )  # every query goes to the index or the database
+        cls.dh = synthetic_db.create_database( conf, genes = 200, mirnas = 10 )
+        cls.dh._sql( "INSERT INTO `Actor_xrefs` VALUES ( 2, 'x2', 'ensembl', 'ensembl', 'd', 'urn', 'url' )" )
+        cls.dh._insert_batches( "Actor_aliases", iter( extra ) )
+        cls.dh._commit_db( )
+        cls.dh._alias_index_path = os.path.join( cls.workdir, "alias_index" )
+        cls.dh.writeAliasIndex( )
+
+
+    @classmethod
+    def tearDownClass( cls ):
+        cls.dh.close( )
+        shutil.rmtree( cls.workdir, True )
+
+
+    def tearDown( self ):
+        self.dh.setAllowedSpecies( None )
+
+
+    def both( self, method, *args, **kwargs ):
+        """return the results of method with the alias index and in the database"""
+
+        self.dh._alias_index = None  # loaded again
+        self.assertNotEqual( self.dh._get_alias_index( ), None )
+        indexed = getattr( self.dh, method )( *args, **kwargs )
+        self.dh._alias_index = False  # not used
+        queried = getattr( self.dh, method )( *args, **kwargs )
+        self.dh._alias_index = None
+        return indexed, queried
+
+
+    def test_references( self ):
+        for invert in False, True:
+            for restrict in { "alias_types" : None }, { "alias_types" : [ "hgnc.symbol" ] }, { "alias_types" : [ "ensembl" ] }:
+                indexed, queried = self.both( "query_for_references", candidates, restrict, invert )
+                self.assertEqual( spellings( indexed ), spellings( queried ) )
+        indexed, queried = self.both( "query_for_references", candidates )
+        self.assertEqual( set( indexed[ 2 ] ), set( [ "H3", "h3", "DUP", "gene16" ] ) )
+
+
+    def test_references_species( self ):
+        self.dh.setAllowedSpecies( "hsa" )
+        indexed, queried = self.both( "query_for_references", candidates )
+        self.assertEqual( spellings( indexed ), spellings( queried ) )
+
+
+    def test_aliases( self ):
+        for restrict in None, [ "hgnc.symbol" ], [ "ensembl" ]:
+            indexed, queried = self.both( "query_for_aliases", [ 1, 12, 16, 205, 999 ], restrict, True )
+            for res in indexed, queried:
+                for types in res[ 0 ].values( ):
+                    for aliases in types.values( ):
+                        aliases.sort( )
+            self.assertEqual( indexed, queried )
+
+
+    def test_outdated( self ):
+        self.dh._write_manifest( "Actor_aliases", { "aliases.txt" : ( 1, 2, "0" * 40, "", "" ) } )
+        self.dh._alias_index = None
+        try:
+            self.assertEqual( self.dh._get_alias_index( ), None )
+        finally:
+            self.dh._write_manifest( "Actor_aliases", { } )
+            self.dh._alias_index = None
+        self.assertNotEqual( self.dh._get_alias_index( ), None )
+
+
+if __name__ == "__main__":
+    unittest.main( )
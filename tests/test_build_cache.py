@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+# tests of the network build cache keys (run from the repository root: python -m unittest discover -s tests -t .)
+
+from __future__ import print_function
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from tests import synthetic_db
+from miRNexpander.NetworkTools.NetworkCreator import NetworkCreator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+genes, mirnas = 200, 10
+recorded = { "hprd.txt" : ( 1, 2, "0" * 40, "", "" ) }
+
+
+class BuildCacheTest( unittest.TestCase ):
+    """build networks twice, with the database or its snapshot changed in between"""
+
+    def setUp( self ):
+        self.workdir = tempfile.mkdtemp( prefix = "build_cache_" )
+        conf = synthetic_db.write_config( os.path.join( self.workdir, "test.cfg" ), os.path.join( self.workdir, "test.sqlite" ) )
+        self.dh = synthetic_db.create_database( conf, genes = genes, mirnas = mirnas )
+        self.dh._build_cache_path = os.path.join( self.workdir, "build_cache" )
+        self.dh._write_manifest( "HPRD", recorded )  # networks are only cached for databases with recorded input files
+
+
+    def tearDown( self ):
+        self.dh.close( )
+        shutil.rmtree( self.workdir, True )
+
+
+    def key( self, handler = None ):
+        """return the build cache key of the standard build on handler (default: the database)"""
+        return NetworkCreator( handler or self.dh )._cache_key( synthetic_db.seeds( genes, mirnas ), 1, { "fish" : None }, "any", None, { } )
+
+
+    def test_same_inputs( self ):
+        self.assertNotEqual( self.key( ), None )
+        self.assertEqual( self.key( ), self.key( ) )
+
+
+    def test_manifest_changed( self ):
+        before = self.key( )
+        self.dh._write_manifest( "HPRD", { "hprd.txt" : ( 1, 2, "1" * 40, "", "" ) } )  # as update_db records a new input file
+        self.assertNotEqual( self.key( ), before )
+        self.dh._write_manifest( "HPRD", recorded )
+        self.assertEqual( self.key( ), before )
+        self.dh._write_manifest( "HPRD", { } )
+        self.assertEqual( self.key( ), None )  # the database contents are unknown
+
+
+    @unittest.skipIf( numpy is None, "graph snapshots require numpy" )
+    def test_snapshot_changed( self ):
+        from miRNexpander.DatabaseTools.GraphSnapshot import GraphSnapshot, SnapshotHandler
+
+        path = os.path.join( self.workdir, "snapshot" )
+        GraphSnapshot.export( self.dh, path )
+        first = self.key( SnapshotHandler( self.dh, path ) )
+        self.assertNotEqual( first, self.key( ) )
+        self.assertEqual( first, self.key( SnapshotHandler( self.dh, path ) ) )
+        time.sleep( 1.1 )  # the creation time has a resolution of seconds
+        GraphSnapshot.export( self.dh, path )
+        self.assertNotEqual( self.key( SnapshotHandler( self.dh, path ) ), first )
+
+
+    def test_cached_build( self ):
+        seeds = synthetic_db.seeds( genes, mirnas )
+        nc = NetworkCreator( self.dh )
+        nc.setName( "first" )
+        self.assertTrue( nc.createNetwork( seeds, 1 ) )
+        built = ( nc._store.number_of_nodes( ), nc._store.number_of_edges( ) )
+        self.assertGreater( built[ 0 ], len( seeds ) )
+
+        nc = NetworkCreator( self.dh )
+        nc.setName( "second" )
+        nc.createNetwork( seeds, 1 )
+        self.assertEqual( ( nc._build_cache.hits, nc._build_cache.misses ), ( 1, 0 ) )
+        self.assertEqual( ( nc._store.number_of_nodes( ), nc._store.number_of_edges( ) ), built )
+
+        self.dh._write_manifest( "HPRD", { "hprd.txt" : ( 1, 2, "1" * 40, "", "" ) } )
+        nc = NetworkCreator( self.dh )
+        nc.setName( "third" )
+        nc.createNetwork( seeds, 1 )
+        self.assertEqual( ( nc._build_cache.hits, nc._build_cache.misses ), ( 0, 1 ) )
+
+
+if __name__ == "__main__":
+    unittest.main( )
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+# regression test for the startup of miRwb.py -a: the alias lookup must not load the network, plotting, or spreadsheet
+# modules, and must finish within a fixed time budget (run from the repository root: python -m unittest discover -s tests -t .)
+
+from __future__ import print_function
+
+import os, sys
+import time
+import shutil
+import tempfile
+import subprocess
+import unittest
+
+from tests import synthetic_db
+
+budget = float( os.environ.get( "COLD_START_BUDGET", 3.0 ) )  # seconds for the whole -a run, including the interpreter start
+heavy = ( "networkx", "numpy", "matplotlib", "openpyxl", "Bio", "libsbml" )  # modules that only other subcommands need
+
+
+class ColdStartTest( unittest.TestCase ):
+    """run miRwb.py -a on a small synthetic database in a fresh interpreter"""
+
+    @classmethod
+    def setUpClass( cls ):
+        cls.workdir = tempfile.mkdtemp( prefix = "cold_start_" )
+        cls.config = os.path.join( cls.workdir, "test.cfg" )
+        conf = synthetic_db.write_config( cls.config, os.path.join( cls.workdir, "test.sqlite" ) )
+        synthetic_db.create_database( conf, genes = 200, mirnas = 10 ).close( )
+
+
+    @classmethod
+    def tearDownClass( cls ):
+        shutil.rmtree( cls.workdir, True )
+
+
+    def run_alias( self, *options ):
+        """return the wall time, exit code, STDOUT and STDERR of miRwb.py -a GENE12,MIR3 with the given options"""
+
+        command = [ sys.executable, os.path.join( synthetic_db.root, "miRwb.py" ), "-c", self.config ] + list( options ) + [ "-a", "GENE12,MIR3" ]
+        start = time.time( )
+        process = subprocess.Popen( command, cwd = self.workdir, stdout = subprocess.PIPE, stderr = subprocess.PIPE )
+        out, err = process.communicate( )
+        return time.time( ) - start, process.returncode, out, err
+
+
+    def test_aliases_resolved( self ):
+        elapsed, code, out, err = self.run_alias( )
+        self.assertEqual( code, 0, err )
+        self.assertEqual( set( out.split( ) ) & set( [ "GENE12", "MIR3" ] ), set( [ "GENE12", "MIR3" ] ), out )
+
+
+    def test_no_heavy_imports( self ):
+        # the modules loaded by the end of the run are written to STDERR by an exit handler installed before miRwb.py runs
+        run = "import sys, os, atexit, runpy; atexit.register( lambda: sys.stderr.write( '\\nMODULES ' + ' ' . join( sys.modules ) ) ); sys.argv = sys.argv[ 1: ]; sys.path.insert( 0, os.path.dirname( sys.argv[ 0 ] ) ); runpy.run_path( sys.argv[ 0 ], run_name = '__main__' )"
+        command = [ sys.executable, "-c", run, os.path.join( synthetic_db.root, "miRwb.py" ), "-c", self.config, "-a", "GENE12,MIR3" ]
+        process = subprocess.Popen( command, cwd = self.workdir, stdout = subprocess.PIPE, stderr = subprocess.PIPE )
+        out, err = process.communicate( )
+        self.assertEqual( process.returncode, 0, err )
+        loaded = set( [  m.split( "." )[ 0 ] for m in err.rsplit( "MODULES ", 1 )[ -1 ].split( )  ] )
+        self.assertFalse( loaded & set( heavy ), "-a imported {}" . format( ", " . join( sorted( loaded & set( heavy ) ) ) ) )
+
+
+    def test_import_profile( self ):
+        elapsed, code, out, err = self.run_alias( "--import-profile" )
+        self.assertEqual( code, 0, err )
+        self.assertIn( "Import profile:", err )
+
+
+    def test_time_budget( self ):
+        elapsed, code, out, err = self.run_alias( )
+        self.assertEqual( code, 0, err )
+        self.assertLess( elapsed, budget, "-a took {:.2f} s (budget {:.2f} s, see COLD_START_BUDGET)" . format( elapsed, budget ) )
+
+
+if __name__ == "__main__":
+    unittest.main( )
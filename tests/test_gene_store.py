@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+
+# tests of the GeneStore used while the gene annotation is compiled (run from the repository root: python -m unittest discover -s tests -t .)
+
+from __future__ import print_function
+
+import unittest
+
+from tests import synthetic_db  # sets up the import path
+from miRNexpander.DatabaseTools.GeneStore import GeneStore
+
+
+class GeneStoreTest( unittest.TestCase ):
+
+    def setUp( self ):
+        self.store = GeneStore( batch_size = 2 )
+
+
+    def tearDown( self ):
+        self.store.close( )
+
+
+    def test_symbol_last_record_wins( self ):
+        # as in the dictionary of symbols that gene_info used to be read into, the gene read last wins, whatever its id
+        records = [  ( ( key, GeneStore.GENE, 9606, symbol, "" ), [ ] ) for key, symbol in ( 300, "A" ), ( 100, "A" ), ( 200, "B" ), ( 50, "C" ), ( 400, "C" )  ]
+        self.store.ingest( iter( records ) )
+        self.store.add_actor( 10, GeneStore.GENE, 9606, "B", "" )
+        self.store.add_actor( 20, GeneStore.COMPLEX, 9606, "A", "" )  # only genes are looked up by symbol
+        self.assertEqual( [  self.store.gene_by_symbol( 9606, s ) for s in "A", "B", "C", "D"  ], [ 100, 10, 400, None ] )
+        self.assertEqual( self.store.gene_by_symbol( 10090, "A" ), None )
+
+
+    def test_symbol_of_replaced_gene( self ):
+        # a gene read again under another symbol keeps its former symbol, too
+        self.store.ingest( iter( [ ( ( 1, GeneStore.GENE, 9606, "OLD", "" ), [ ] ), ( ( 1, GeneStore.GENE, 9606, "NEW", "" ), [ ] ) ] ) )
+        self.assertEqual( ( self.store.gene_by_symbol( 9606, "OLD" ), self.store.gene_by_symbol( 9606, "NEW" ) ), ( 1, 1 ) )
+
+
+if __name__ == "__main__":
+    unittest.main( )
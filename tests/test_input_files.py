@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+# tests of the compressed input handling of update_db (run from the repository root: python -m unittest discover -s tests -t .)
+
+from __future__ import print_function
+
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+
+from tests import synthetic_db  # sets up the import path
+from miRNexpander.DatabaseTools.InputFiles import open_input, find_inputs
+
+lines = [  "line {:d}\n" . format( i ) for i in xrange( 50000 )  ]
+
+
+class InputFilesTest( unittest.TestCase ):
+
+    def setUp( self ):
+        self.workdir = tempfile.mkdtemp( prefix = "input_files_" )
+        self.path = os.path.join( self.workdir, "input.txt.gz" )
+        stream = gzip.open( self.path, "wb" )
+        stream.writelines( lines )
+        stream.close( )
+
+
+    def tearDown( self ):
+        shutil.rmtree( self.workdir, True )
+
+
+    def test_complete( self ):
+        stream = open_input( self.path )
+        self.assertEqual( list( stream ), lines )
+        stream.close( )
+
+
+    def test_stopped_early( self ):
+        stream = open_input( self.path )
+        self.assertEqual( stream.readline( ), lines[ 0 ] )
+        stream.close( )  # the decompression process is killed, which is no error
+
+
+    def test_truncated( self ):
+        data = open( self.path, "rb" ).read( )
+        open( self.path, "wb" ).write( data[ :len( data ) // 2 ] )
+        stream = open_input( self.path )
+        read = list( stream )
+        self.assertLess( len( read ), len( lines ) )
+        self.assertRaises( IOError, stream.close )
+
+
+    def test_one_file_per_source( self ):
+        for name in "a.txt", "a.txt.gz", "b.txt.bz2", "b.txt.xz", "c.txt.gz":
+            open( os.path.join( self.workdir, name ), "w" ).close( )
+        found = [  os.path.basename( f ) for f in find_inputs( os.path.join( self.workdir, "*.txt" ) )  ]
+        self.assertEqual( found, [ "a.txt", "b.txt.bz2", "c.txt.gz", "input.txt.gz" ] )
+        self.assertEqual( [  os.path.basename( f ) for f in find_inputs( os.path.join( self.workdir, "a.txt" ) )  ], [ "a.txt" ] )
+
+
+if __name__ == "__main__":
+    unittest.main( )
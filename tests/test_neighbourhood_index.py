@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+# tests of the neighbourhood index against the interaction queries in the database (run from the repository root: python -m unittest discover -s tests -t .)
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from tests import synthetic_db
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+genes, mirnas = 200, 10
+
+
+@unittest.skipIf( numpy is None, "the neighbourhood index requires numpy" )
+class NeighbourhoodIndexTest( unittest.TestCase ):
+    """expand the same shells with the neighbourhood index and in the database"""
+
+    @classmethod
+    def setUpClass( cls ):
+        cls.workdir = tempfile.mkdtemp( prefix = "neighbourhood_index_" )
+        conf = synthetic_db.write_config( os.path.join( cls.workdir, "test.cfg" ), os.path.join( cls.workdir, "test.sqlite" ) )
+        cls.dh = synthetic_db.create_database( conf, genes = genes, mirnas = mirnas )
+        cls.dh._neighbourhood_index_path = os.path.join( cls.workdir, "neighbourhood_index" )
+        cls.dh.writeNeighbourhoodIndex( )
+
+
+    @classmethod
+    def tearDownClass( cls ):
+        cls.dh.close( )
+        shutil.rmtree( cls.workdir, True )
+
+
+    def both( self, method, *args ):
+        """return the results of method with the neighbourhood index and in the database"""
+
+        self.dh._neighbourhood_index = None  # loaded again
+        self.assertNotEqual( self.dh._get_neighbourhood_index( ), None )
+        indexed = getattr( self.dh, method )( *args )
+        self.dh._neighbourhood_index = False  # not used
+        queried = getattr( self.dh, method )( *args )
+        self.dh._neighbourhood_index = None
+        return indexed, queried
+
+
+    def test_expand_shell( self ):
+        frontier = [  a_id for a_id, kind in synthetic_db.seeds( genes, mirnas )  ] + [ 1, 7, genes + mirnas + 2, 99999 ]
+        for restrict in { }, { "ints" : "transcription" }, { "dbs" : [ "miRTarBase" ] }:
+            ( rows, annot ), ( q_rows, q_annot ) = self.both( "expand_shell", frontier, dict( restrict ) )
+            self.assertEqual( sorted( rows ), sorted( q_rows ) )  # in no particular order, but the same distinct rows
+            self.assertEqual( annot, q_annot )
+            self.assertGreater( len( rows ), 0 )
+
+
+    def test_neighbours( self ):
+        for hops in 1, 2:
+            indexed, queried = self.both( "query_for_neighbours", [ 1, 5, genes + 1 ], hops )
+            self.assertEqual( indexed, queried )
+
+
+    def test_outdated( self ):
+        self.dh._write_manifest( "HPRD", { "hprd.txt" : ( 1, 2, "0" * 40, "", "" ) } )
+        self.dh._neighbourhood_index = None
+        try:
+            self.assertEqual( self.dh._get_neighbourhood_index( ), None )
+        finally:
+            self.dh._write_manifest( "HPRD", { } )
+            self.dh._neighbourhood_index = None
+        self.assertNotEqual( self.dh._get_neighbourhood_index( ), None )
+
+
+if __name__ == "__main__":
+    unittest.main( )
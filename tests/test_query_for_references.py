@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+# tests of DatabaseHandler.query_for_references against its former implementation (run from the repository root: python -m unittest discover -s tests -t .)
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from tests import synthetic_db
+
+# aliases added to the synthetic database: ambiguous ones, and spellings that differ only in case
+extra = [ ( 10, "H3", 1 ), ( 11, "h3", 1 ), ( 12, "p53", 1 ), ( 12, "P53", 1 ), ( 13, "Dup", 1 ), ( 14, "DUP", 1 ), ( 14, "dup", 1 ), ( 15, "GENE16", 1 ) ]
+candidates = [ "GENE1", "gene2", "Gene3", "H3", "h3", "p53", "DUP", "gene16", "MIR4", "NOPE", "nope2" ]
+
+
+def former_classify( candidates, requested, res, invert = False ):
+    """return the ( identified, orphans, ambiguous ) triple as query_for_references computed it from the result rows before it indexed them
+    - res: ( ref, Alias ) rows, or ( Alias, ref ) rows if invert is set
+"""
+
+    identified = { }
+    ambiguous = { }
+    orphans = set( )
+    p = { "ref" : 1, "Alias" : 0 } if invert else { "ref" : 0, "Alias" : 1 }
+    if len( res ) == 0:
+        orphans = requested
+    else:
+        for alias in candidates:
+            lalias = alias.lower( )
+            s = {  t[ p[ "ref" ] ] for t in res if t[ p[ "Alias" ] ].lower( ) == lalias  }
+            if len( s ) > 1:
+                try:
+                    ambiguous[ alias ] |= s
+                except KeyError:
+                    ambiguous[ alias ] =  s
+            elif len( s ) == 0:
+                orphans.add( alias )
+
+        l = len( set( zip( *res )[ p[ "ref" ] ] ) )
+        if l < len( res ):
+            positions = { }
+            for r in res:
+                try:
+                    if r[ p[ "Alias" ] ].lower( ) not in {  a.lower( ) for a in positions[ r[ p[ "ref" ] ] ]  }:
+                        positions[ r[ p[ "ref" ] ] ].append( r[ p[ "Alias" ] ] )
+                except KeyError:
+                    positions[ r[ p[ "ref" ] ] ] = [ r[ p[ "Alias" ] ] ]
+            if invert:
+                for k, v in positions.items( ):
+                    identified.update( [ ( a.lower( ), k ) for a in v ] )
+            else:
+                for k, v in positions.items( ):
+                    identified[ k ] = " " . join( v )
+        else:
+            if invert:
+                identified = dict( [  ( e1.lower( ), e2 ) for e1, e2 in res  ] )
+            else:
+                identified = dict( res )
+    return ( identified, orphans, ambiguous )
+
+
+class ReferencesTest( unittest.TestCase ):
+    """resolve ambiguous and mixed-case aliases in the synthetic database"""
+
+    @classmethod
+    def setUpClass( cls ):
+        cls.workdir = tempfile.mkdtemp( prefix = "references_" )
+        conf = synthetic_db.write_config( os.path.join( cls.workdir, "test.cfg" ), os.path.join( cls.workdir, "test.sqlite" ) )
+        cls.dh = synthetic_db.create_database( conf, genes = 200, mirnas = 10 )
+        cls.dh._insert_batches( "Actor_aliases", iter( extra ) )
+        cls.dh._commit_db( )
+
+
+    @classmethod
+    def tearDownClass( cls ):
+        cls.dh.close( )
+        shutil.rmtree( cls.workdir, True )
+
+
+    def rows( self, invert ):
+        """return the alias rows of the candidates, matched without regard to case as MySQL does, in the column order of the former query"""
+
+        requested = set( [  c.lower( ) for c in candidates  ] )
+        res = [  r for r in self.dh._sql( "SELECT `ref`, `Alias` FROM `Actor_aliases`" ) if r[ 1 ].lower( ) in requested  ]
+        return [  ( a, r ) for r, a in res  ] if invert else res
+
+
+    def test_classification( self ):
+        # the same result rows, in several orders, give the same triple as before
+        requested = set( [  c.lower( ) for c in candidates  ] )
+        for invert in False, True:
+            res = self.rows( invert )
+            for rows in res, res[ ::-1 ], sorted( res ):
+                lowered = [  r + ( r[ 0 if invert else 1 ].lower( ), ) for r in rows  ]
+                self.assertEqual( self.dh._classify_references( candidates, requested, lowered, invert ), former_classify( candidates, requested, rows, invert ) )
+
+
+    def test_query( self ):
+        requested = set( [  c.lower( ) for c in candidates  ] )
+        for invert in False, True:
+            self.dh._alias_cache and self.dh._alias_cache.clear( )
+            identified, orphans, ambiguous = self.dh.query_for_references( candidates, invert = invert )
+            former = former_classify( candidates, requested, self.rows( invert ), invert )
+            if not invert:  # the spellings of a reference are joined in the order of the result rows, which SQL leaves open
+                identified = dict( [  ( k, sorted( v.split( " " ) ) ) for k, v in identified.iteritems( )  ] )
+                former = ( dict( [  ( k, sorted( v.split( " " ) ) ) for k, v in former[ 0 ].iteritems( )  ] ), ) + former[ 1: ]
+            self.assertEqual( ( identified, orphans, ambiguous ), former )
+            self.assertEqual( orphans, set( [ "NOPE", "nope2" ] ) )
+            self.assertEqual( set( ambiguous ), set( [ "H3", "h3", "DUP", "gene16" ] ) )
+
+
+if __name__ == "__main__":
+    unittest.main( )
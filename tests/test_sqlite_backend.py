@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+# tests of the DatabaseHandler queries on the SQLite backend (run from the repository root: python -m unittest discover -s tests -t .)
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from tests import synthetic_db
+
+genes, mirnas = 50, 5
+
+
+class SQLiteBackendTest( unittest.TestCase ):
+    """query the synthetic SQLite database without any of the indexes"""
+
+    @classmethod
+    def setUpClass( cls ):
+        cls.workdir = tempfile.mkdtemp( prefix = "sqlite_backend_" )
+        conf = synthetic_db.write_config( os.path.join( cls.workdir, "test.cfg" ), os.path.join( cls.workdir, "test.sqlite" ) )
+        cls.dh = synthetic_db.create_database( conf, genes = genes, mirnas = mirnas )
+        cls.dh._sql( "INSERT INTO `Taxa` VALUES ( 2, 10090, 'mouse' )" )
+        cls.dh._sql( "INSERT INTO `Taxon_aliases` VALUES ( 10090, 'mmu' )" )
+        cls.dh._commit_db( )
+
+
+    @classmethod
+    def tearDownClass( cls ):
+        cls.dh.close( )
+        shutil.rmtree( cls.workdir, True )
+
+
+    def tearDown( self ):
+        self.dh.setAllowedSpecies( None )
+        self.dh._alias_cache and self.dh._alias_cache.clear( )
+
+
+    def test_allowed_species( self ):
+        self.assertEqual( self.dh.setAllowedSpecies( "hsa" ), set( [ synthetic_db.species ] ) )
+        self.assertEqual( self.dh.getAllowedSpecies( ), set( [ synthetic_db.species ] ) )
+        self.assertEqual( self.dh.query_for_references( [ "GENE5" ] ), ( { 5 : "GENE5" }, set( ), { } ) )
+
+        self.assertEqual( self.dh.setAllowedSpecies( [ "mmu" ] ), set( [ 10090 ] ) )
+        self.dh._alias_cache and self.dh._alias_cache.clear( )
+        self.assertEqual( self.dh.query_for_references( [ "GENE5" ] ), ( { }, set( [ "gene5" ] ), { } ) )  # without any match, the orphans are the lower-cased candidates
+
+        self.assertEqual( self.dh.setAllowedSpecies( None ), None )
+        self.assertEqual( self.dh.getAllowedSpecies( ), [ ] )
+
+
+    def test_references( self ):
+        mir2 = genes + 2
+        self.assertEqual( self.dh.query_for_references( [ "GENE5", "mir2", "nope" ] ), ( { 5 : "GENE5", mir2 : "MIR2" }, set( [ "nope" ] ), { } ) )
+        self.assertEqual( self.dh.query_for_references( [ "GENE5", "mir2", "nope" ], invert = True ), ( { "gene5" : 5, "mir2" : mir2 }, set( [ "nope" ] ), { } ) )
+
+
+    def test_aliases( self ):
+        mir2 = genes + 2
+        self.assertEqual( self.dh.query_for_aliases( [ 5, mir2, 999 ], silent = True ), ( { 5 : { "hgnc.symbol" : [ "GENE5" ] }, mir2 : { "hgnc.symbol" : [ "MIR2" ] } }, set( [ 999 ] ) ) )
+        self.assertEqual( self.dh.query_for_aliases( [ 5 ], restrict = [ "hgnc.symbol" ] ), ( { 5 : { "hgnc.symbol" : [ "GENE5" ] } }, set( ) ) )
+
+
+    def test_annotations( self ):
+        self.assertEqual( self.dh.query_for_annotations( [ 5, 999 ], silent = True ), { 5 : { "symbol" : "GENE5", "description" : "gene 5", "species" : synthetic_db.species } } )
+
+
+    def test_interactions( self ):
+        mir2 = genes + 2
+        res = self.dh.query_for_interactions( [ mir2 ] )
+        expected = set( self.dh._sql( "SELECT `source`, `target` FROM `miRTarBase` WHERE `source` = {:d} OR `target` = {:d}" . format( mir2, mir2 ) ) )
+        self.assertEqual( sorted( [  ( r[ 0 ], r[ 1 ] ) for r in res  ] ), sorted( expected ) )  # distinct rows
+        self.assertEqual( set( [  r[ 4 ][ "database" ] for r in res  ] ), set( [ "miRTarBase" ] ) )
+        self.assertEqual( self.dh.query_for_neighbours( [ mir2 ] ), { mir2 : set( [  t for s, t in expected  ] ) } )
+
+
+if __name__ == "__main__":
+    unittest.main( )
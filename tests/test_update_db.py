@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+# tests of DatabaseHandler.update_db on the synthetic SQLite database (run from the repository root: python -m unittest discover -s tests -t .)
+
+from __future__ import print_function
+
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+
+from tests import synthetic_db
+
+links = "SELECT s.`symbol`, t.`symbol` FROM `HTRIdb` h JOIN `Actors` s ON s.`a_id` = h.`source` JOIN `Actors` t ON t.`a_id` = h.`target` ORDER BY 1, 2"
+
+
+class UpdateTest( unittest.TestCase ):
+    """load the gene annotation and HTRIdb from small input files"""
+
+    tables = [ "actors", "actor_aliases", "HTRIdb" ]  # as given to -u: the actor tables by their lower-cased names, the others by their section names
+
+    def setUp( self ):
+        self.cwd = os.getcwd( )
+        self.workdir = tempfile.mkdtemp( prefix = "update_db_" )
+        conf = synthetic_db.write_config( os.path.join( self.workdir, "test.cfg" ), os.path.join( self.workdir, "test.sqlite" ) )
+        self.dh = synthetic_db.create_database( conf, genes = 50, mirnas = 5 )
+        synthetic_db.prepare_update( self.dh, self.workdir )
+        os.chdir( self.workdir )
+
+
+    def tearDown( self ):
+        os.chdir( self.cwd )
+        self.dh.close( )
+        shutil.rmtree( self.workdir, True )
+
+
+    def test_interactions_follow_renumbered_actors( self ):
+        synthetic_db.write_gene_info( self.workdir, [ 100, 200, 300 ] )
+        synthetic_db.write_htridb( self.workdir, [ ( 200, 300 ) ] )
+        self.dh.update_db( self.tables )
+        self.assertEqual( self.dh._sql( links ), [ ( "G200", "G300" ) ] )
+
+        # a new gene renumbers the following ones, while the HTRIdb input stays the same
+        for table in "Actors", "Actor_aliases":  # update_db leaves clearing the actor tables to the schema setup
+            self.dh._sql( "DELETE FROM `{}`" . format( table ) )
+        self.dh._sql( "DELETE FROM `Actor_xrefs` WHERE `x_id` > {:d}" . format( len( synthetic_db.namespaces ) ) )
+        self.dh._commit_db( )
+        synthetic_db.write_gene_info( self.workdir, [ 100, 150, 200, 300 ] )
+        self.dh.update_db( self.tables )
+        self.assertEqual( self.dh._sql( "SELECT `a_id` FROM `Actors` WHERE `symbol` = 'G200'" ), [ ( 3, ) ] )
+        self.assertEqual( self.dh._sql( links ), [ ( "G200", "G300" ) ] )
+
+
+    def test_gene_annotation_loaded( self ):
+        synthetic_db.write_gene_info( self.workdir, [ 100, 200, 300 ] )
+        self.dh.update_db( self.tables[ :2 ] )
+        self.assertEqual( self.dh._sql( "SELECT `species`, `symbol`, `description` FROM `Actors` WHERE `species` = {:d} ORDER BY `a_id`" . format( synthetic_db.species ) ),
+                [  ( synthetic_db.species, "G{:d}" . format( g ), "gene {:d}" . format( g ) ) for g in ( 100, 200, 300 )  ] )
+        identified, orphans, ambiguous = self.dh.query_for_references( [ "G200", "g300", "G400" ] )
+        self.assertEqual( sorted( identified.values( ) ), [ "G200", "G300" ] )
+        self.assertEqual( orphans, set( [ "G400" ] ) )
+
+
+    def test_unchanged_input_skipped( self ):
+        synthetic_db.write_gene_info( self.workdir, [ 100, 200, 300 ] )
+        synthetic_db.write_htridb( self.workdir, [ ( 200, 300 ), ( 100, 300 ) ] )
+        self.dh.update_db( self.tables )
+        digest = self.dh.getManifestDigest( )
+        self.dh._sql( "DELETE FROM `HTRIdb` WHERE `source_orig` = '100'" )  # would be restored if HTRIdb were reloaded
+        self.dh._commit_db( )
+        self.dh.update_db( [ "HTRIdb" ] )
+        self.assertEqual( self.dh._sql( links ), [ ( "G200", "G300" ) ] )
+        self.assertEqual( self.dh.getManifestDigest( ), digest )
+
+
+    def test_truncated_input_not_recorded( self ):
+        synthetic_db.write_gene_info( self.workdir, [ 100, 200, 300 ] )
+        self.dh.update_db( self.tables[ :2 ] )
+        path = os.path.join( self.workdir, "data", "db_files", "HTRIdb", "HTRIdb_data.txt" )
+        synthetic_db.write_htridb( self.workdir, [ ( 200, 300 ) ] * 2000 )
+        data = open( path ).read( )
+        stream = gzip.open( path + ".gz", "wb" )
+        stream.write( data )
+        stream.close( )
+        os.remove( path )
+        data = open( path + ".gz", "rb" ).read( )
+        open( path + ".gz", "wb" ).write( data[ :len( data ) // 2 ] )
+
+        self.dh.update_db( [ "HTRIdb" ] )
+        self.assertEqual( self.dh._read_manifest( "HTRIdb" ), { } )
+
+
+if __name__ == "__main__":
+    unittest.main( )